@@ -0,0 +1,4 @@
+# your_bot_project/benchmarks/__init__.py
+
+# Offline benchmarks for the statistics, cache and formatters.
+# Run with `python -m benchmarks.run` from the project root.
@@ -0,0 +1,168 @@
+# your_bot_project/benchmarks/broadcast_test.py
+
+"""
+Scheduled subscription delivery against a fake Telegram bot.
+
+    python -m benchmarks.broadcast_test --subscribers 3000
+    python -m benchmarks.broadcast_test --subscribers 5000 --users 50 --blocked-rate 0.02 --output broadcast.json
+
+Registers the given number of subscriptions, spread over a handful of
+(asset, type, N) combinations, and runs one SubscriptionScheduler pass
+while simulated interactive users go through the normal flow. The fake bot
+enforces Telegram's limits (about 30 messages per second overall, one per
+second per chat) by raising RetryAfter, and some chats have blocked the bot.
+The report gives the delivery time, the number of distinct reports computed,
+limit violations and interactive latency during the broadcast.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from telegram.error import Forbidden, RetryAfter
+
+from config import ASSET_EXCHANGE_MAP, SUBSCRIPTION_TIMEZONE
+from bot.broadcast import Broadcaster
+from services.subscriptions import SubscriptionScheduler, SubscriptionStore
+from benchmarks.load_test import build_handlers, run_load
+
+
+class FakeBot:
+    """Accepts messages at Telegram's documented limits and raises RetryAfter beyond them."""
+    def __init__(self, blocked_chats: set, latency: float, global_per_second: int = 30, per_chat_seconds: float = 1.0):
+        self.blocked_chats = blocked_chats
+        self.latency = latency
+        self.global_per_second = global_per_second
+        self.per_chat_seconds = per_chat_seconds
+        self._recent = deque()
+        self._last_per_chat = {}
+        self.delivered = {}
+        self.flood_errors = 0
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        await asyncio.sleep(self.latency)
+        now = time.monotonic()
+        if chat_id in self.blocked_chats:
+            raise Forbidden("Forbidden: bot was blocked by the user")
+        while self._recent and now - self._recent[0] >= 1.0:
+            self._recent.popleft()
+        too_soon = now - self._last_per_chat.get(chat_id, float("-inf")) < self.per_chat_seconds
+        if len(self._recent) >= self.global_per_second or too_soon:
+            self.flood_errors += 1
+            raise RetryAfter(1)
+        self._recent.append(now)
+        self._last_per_chat[chat_id] = now
+        self.delivered.setdefault(chat_id, []).append(text)
+
+
+async def run_broadcast(handlers, store: SubscriptionStore, bot: FakeBot, args) -> dict:
+    rng = random.Random(args.seed)
+    assets = list(ASSET_EXCHANGE_MAP)
+    combos = [(rng.choice(assets), rng.choice(('daily', 'weekly')), rng.choice((10, 20, 30))) for _ in range(args.combos)]
+    for i in range(args.subscribers):
+        asset, kind, n_value = rng.choice(combos)
+        await store.add(500000 + i, asset, kind, n_value, "08:00")
+    computed = []
+
+    async def build_report(asset, kind, n_value):
+        computed.append((asset, kind, n_value))
+        return await handlers.build_subscription_report(asset, kind, n_value)
+
+    async def send(chat_id, text):
+        await bot.send_message(chat_id, text, parse_mode=None)
+
+    broadcaster = Broadcaster(send, rate_per_second=args.rate, per_chat_interval=1.0, batch_size=args.batch_size)
+    scheduler = SubscriptionScheduler(store, build_report, broadcaster, SUBSCRIPTION_TIMEZONE)
+    # A Monday morning after the delivery time, so daily and weekly subscriptions are both due.
+    now = datetime.now(SUBSCRIPTION_TIMEZONE) + timedelta(days=7)
+    now = (now - timedelta(days=now.weekday())).replace(hour=9, minute=0)
+
+    started = time.perf_counter()
+    delivery = asyncio.ensure_future(scheduler.run_once(now))
+    interactive = await run_load(handlers, args.users, args.ramp_seconds, 0.0, args.seed) if args.users else None
+    summary = await delivery
+    wall = time.perf_counter() - started
+    return {
+        "subscribers": args.subscribers,
+        "distinct_reports": len(set(combos)),
+        "reports_computed": len(computed),
+        "sent": summary["sent"],
+        "failed": summary["failed"],
+        "blocked": len(summary["blocked"]),
+        "delivery_s": summary["seconds"],
+        "wall_s": wall,
+        "messages_per_s": summary["sent"] / summary["seconds"] if summary["seconds"] else 0.0,
+        "flood_errors": bot.flood_errors,
+        "still_due": len(await store.due(now)),
+        "interactive": interactive and {
+            "succeeded": interactive["succeeded"], "failed": interactive["failed"],
+            "report_latency": interactive["report_latency"],
+        },
+        "scheduler": scheduler.stats,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Scheduled subscription delivery against a fake Telegram bot.")
+    parser.add_argument("--subscribers", type=int, default=3000)
+    parser.add_argument("--combos", type=int, default=12, help="distinct (asset, type, N) subscriptions drawn from")
+    parser.add_argument("--blocked-rate", type=float, default=0.01, help="share of chats that blocked the bot")
+    parser.add_argument("--send-latency", type=float, default=0.05, help="fake sendMessage latency (s)")
+    parser.add_argument("--rate", type=float, default=20.0, help="broadcast messages per second")
+    parser.add_argument("--batch-size", type=int, default=25)
+    parser.add_argument("--users", type=int, default=30, help="interactive users during the broadcast")
+    parser.add_argument("--ramp-seconds", type=float, default=20.0)
+    parser.add_argument("--history-days", type=int, default=400, help="length of the replayed history")
+    parser.add_argument("--sessions", type=int, default=2, help="upstream session pool size")
+    parser.add_argument("--latency", type=float, default=0.3, help="replay latency per upstream call (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the results as JSON to this path")
+    args = parser.parse_args(argv)
+    # Options build_handlers expects from the load test.
+    args.latency_jitter, args.failure_rate, args.empty_rate = 0.0, 0.0, 0.0
+    args.cache_backend, args.l1, args.io_workers, args.cpu_workers = "sqlite", True, 8, 2
+
+    logging.basicConfig(level=logging.WARNING)
+    rng = random.Random(args.seed)
+    blocked = {500000 + i for i in range(args.subscribers) if rng.random() < args.blocked_rate}
+    bot = FakeBot(blocked, args.send_latency)
+
+    with tempfile.TemporaryDirectory(prefix="broadcast-") as workdir:
+        upstream_args = argparse.Namespace(**{**vars(args), "rate": 2.0, "burst": 5})
+        handlers, data_cache, data_provider, executor = build_handlers(workdir, upstream_args)
+        store = SubscriptionStore(os.path.join(workdir, "subscriptions.db"))
+        try:
+            result = asyncio.run(run_broadcast(handlers, store, bot, args))
+        finally:
+            store.close()
+            executor.shutdown()
+            data_provider.close()
+            data_cache.close()
+    result["config"] = vars(args)
+
+    print(f"{result['sent']}/{result['subscribers']} delivered in {result['delivery_s']:.1f}s "
+          f"({result['messages_per_s']:.1f} msg/s), {result['blocked']} blocked, {result['failed']} failed")
+    print(f"{result['reports_computed']} reports computed for {result['distinct_reports']} distinct subscriptions; "
+          f"{result['flood_errors']} flood-limit errors; {result['still_due']} still due")
+    if result["interactive"]:
+        p = result["interactive"]["report_latency"]
+        print(f"interactive: {result['interactive']['succeeded']} ok, {result['interactive']['failed']} failed"
+              + (f", report p50 {p['p50_s'] * 1e3:.0f}ms p95 {p['p95_s'] * 1e3:.0f}ms" if p else ""))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, default=str)
+    ok = result["sent"] + result["blocked"] == result["subscribers"] and result["still_due"] == 0
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
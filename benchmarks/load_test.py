@@ -0,0 +1,247 @@
+# your_bot_project/benchmarks/load_test.py
+
+"""
+Concurrent-user load test against BotHandlers, with no TradingView or Telegram access.
+
+    python -m benchmarks.load_test --users 300 --ramp-seconds 5
+    python -m benchmarks.load_test --users 200 --latency 0.5 --failure-rate 0.05 --output load.json
+    python -m benchmarks.load_test --users 300 --cache-backend columnar
+    python -m benchmarks.load_test --users 300 --l1
+
+Each simulated user goes through /start -> daily/weekly button -> asset
+button -> N, with synthetic Update and CallbackQuery objects. Market data
+comes from ReplayDatafeed over synthetic files, with injected latency and
+failures. The report gives p50/p95/p99 latency for the whole flow and for
+the final N -> report step, plus throughput.
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from config import ASSET_EXCHANGE_MAP, ASSET_SESSION_MAP, UPSTREAM_BURST, UPSTREAM_RATE_PER_SECOND
+from bot.handlers import BotHandlers
+from bot.state_manager import StateManager
+from services.bar_cache import BarCache
+from services.columnar_cache import ColumnarCache
+from services.data_cache import DataCache
+from services.data_provider import TradingViewDataProvider
+from services.executor import TaskExecutor
+from services.replay_feed import ReplayDatafeed, write_replay_file
+from services.report_cache import ReportCache
+from benchmarks.synthetic import generate_assets
+
+REPORT_MARKER = "統計報告"
+
+
+class FakeMessage:
+    """Stands in for telegram.Message; replies are recorded in the user's transcript."""
+    def __init__(self, user, text: str, transcript: list):
+        self.from_user = user
+        self.text = text
+        self._transcript = transcript
+
+    async def reply_text(self, text: str, **kwargs):
+        self._transcript.append(text)
+        return FakeMessage(self.from_user, text, self._transcript)
+
+    async def edit_text(self, text: str, **kwargs):
+        self._transcript.append(text)
+        return self
+
+
+class FakeCallbackQuery:
+    """Stands in for telegram.CallbackQuery."""
+    def __init__(self, user, data: str, transcript: list):
+        self.from_user = user
+        self.data = data
+        self._transcript = transcript
+
+    async def answer(self, *args, **kwargs):
+        return True
+
+    async def edit_message_text(self, text: str, **kwargs):
+        self._transcript.append(text)
+
+
+class FakeUpdate:
+    """Stands in for telegram.Update with either a message or a callback query."""
+    def __init__(self, user, message: FakeMessage | None = None, callback_query: FakeCallbackQuery | None = None):
+        self.effective_user = user
+        self.message = message
+        self.callback_query = callback_query
+
+
+async def simulate_user(handlers: BotHandlers, user_id: int, stats_type: str, asset: str, n_value: int,
+                        think_seconds: float) -> dict:
+    """Runs one user through the whole flow and returns its timings."""
+    user = SimpleNamespace(id=user_id)
+    transcript = []
+    context = SimpleNamespace(args=[])
+    loop = asyncio.get_running_loop()
+
+    def message(text):
+        return FakeUpdate(user, message=FakeMessage(user, text, transcript))
+
+    def callback(data):
+        return FakeUpdate(user, callback_query=FakeCallbackQuery(user, data, transcript))
+
+    started = loop.time()
+    error = None
+    try:
+        await handlers.start(message("/start"), context)
+        await asyncio.sleep(think_seconds)
+        if stats_type == 'daily':
+            await handlers.start_daily_stats_callback(callback('start_daily_stats'), context)
+        else:
+            await handlers.start_weekly_stats_callback(callback('start_weekly_stats'), context)
+        await asyncio.sleep(think_seconds)
+        await handlers.select_asset_callback(callback(f'select_asset_{stats_type}:{asset}'), context)
+        await asyncio.sleep(think_seconds)
+        report_started = loop.time()
+        await handlers.handle_message(message(str(n_value)), context)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        report_started = loop.time()
+    finished = loop.time()
+    ok = error is None and bool(transcript) and REPORT_MARKER in transcript[-1]
+    return {
+        "flow_s": finished - started - 3 * think_seconds,
+        "report_s": finished - report_started,
+        "ok": ok,
+        "error": error or (None if ok else (transcript[-1] if transcript else "no reply")),
+    }
+
+
+def _percentiles(samples: list) -> dict:
+    if not samples:
+        return {}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {"p50_s": p50, "p95_s": p95, "p99_s": p99, "max_s": max(samples), "mean_s": float(np.mean(samples))}
+
+
+async def run_load(handlers: BotHandlers, users: int, ramp_seconds: float, think_seconds: float, seed: int) -> dict:
+    """Starts `users` simulated users spread over `ramp_seconds` and gathers their results."""
+    rng = random.Random(seed)
+    assets = list(ASSET_EXCHANGE_MAP)
+
+    async def delayed_user(user_id):
+        await asyncio.sleep(rng.uniform(0.0, ramp_seconds))
+        stats_type = rng.choice(('daily', 'weekly'))
+        n_value = rng.randint(5, 60) if stats_type == 'daily' else rng.randint(4, 26)
+        return await simulate_user(handlers, user_id, stats_type, rng.choice(assets), n_value, think_seconds)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(delayed_user(100000 + i) for i in range(users)))
+    wall = time.perf_counter() - started
+
+    succeeded = [r for r in results if r["ok"]]
+    errors = {}
+    for r in results:
+        if not r["ok"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    return {
+        "users": users,
+        "succeeded": len(succeeded),
+        "failed": users - len(succeeded),
+        "wall_s": wall,
+        "throughput_flows_per_s": len(succeeded) / wall if wall else 0.0,
+        "flow_latency": _percentiles([r["flow_s"] for r in succeeded]),
+        "report_latency": _percentiles([r["report_s"] for r in succeeded]),
+        "errors": errors,
+    }
+
+
+def build_handlers(workdir: str, args) -> tuple:
+    """Creates replay files, a fresh cache and the bot components wired to ReplayDatafeed."""
+    replay_dir = os.path.join(workdir, "replay")
+    for symbol, data in generate_assets(args.history_days).items():
+        write_replay_file(data, replay_dir, symbol, ASSET_EXCHANGE_MAP[symbol], "1H")
+
+    if args.cache_backend == "columnar":
+        data_cache = ColumnarCache(os.path.join(workdir, "columnar"))
+    else:
+        data_cache = DataCache(db_path=os.path.join(workdir, "load_test.db"))
+    if args.l1:
+        data_cache = BarCache(data_cache)
+    data_provider = TradingViewDataProvider(
+        None, None, cache=data_cache, auth_sessions=0, guest_sessions=args.sessions,
+        rate_per_second=args.rate, burst=args.burst, session_profiles=ASSET_SESSION_MAP,
+        datafeed_factory=functools.partial(
+            ReplayDatafeed, data_dir=replay_dir,
+            latency_seconds=args.latency, latency_jitter_seconds=args.latency_jitter,
+            failure_rate=args.failure_rate, empty_rate=args.empty_rate, seed=args.seed,
+        ),
+    )
+    data_provider.wait_until_ready()
+    executor = TaskExecutor(io_workers=args.io_workers, cpu_workers=args.cpu_workers)
+    handlers = BotHandlers(StateManager(), data_provider, executor, ReportCache())
+    return handlers, data_cache, data_provider, executor
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Simulated concurrent users against BotHandlers.")
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--ramp-seconds", type=float, default=5.0, help="spread user arrivals over this many seconds")
+    parser.add_argument("--think-seconds", type=float, default=0.0, help="pause between a user's steps")
+    parser.add_argument("--history-days", type=int, default=400, help="length of the replayed history")
+    parser.add_argument("--sessions", type=int, default=2, help="upstream session pool size")
+    parser.add_argument("--latency", type=float, default=0.3, help="replay latency per upstream call (s)")
+    parser.add_argument("--latency-jitter", type=float, default=0.2, help="extra random latency (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of upstream calls that raise")
+    parser.add_argument("--empty-rate", type=float, default=0.0, help="share of upstream calls that return None")
+    parser.add_argument("--rate", type=float, default=UPSTREAM_RATE_PER_SECOND, help="upstream calls per second")
+    parser.add_argument("--burst", type=float, default=UPSTREAM_BURST, help="upstream token bucket size")
+    parser.add_argument("--cache-backend", choices=("sqlite", "columnar"), default="sqlite")
+    parser.add_argument("--l1", action="store_true", help="put the in-process bar cache in front of the cache")
+    parser.add_argument("--io-workers", type=int, default=8)
+    parser.add_argument("--cpu-workers", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as workdir:
+        handlers, data_cache, data_provider, executor = build_handlers(workdir, args)
+        try:
+            summary = asyncio.run(run_load(handlers, args.users, args.ramp_seconds, args.think_seconds, args.seed))
+        finally:
+            executor.shutdown()
+            data_provider.close()
+            data_cache.close()
+    summary["upstream"] = data_provider.upstream_stats
+    summary["session_pool"] = data_provider.pool_status
+    summary["upstream_queue"] = data_provider.limiter_status
+    summary["report_cache"] = handlers.report_cache.stats
+    summary["config"] = vars(args)
+
+    print(f"{summary['succeeded']}/{summary['users']} flows succeeded in {summary['wall_s']:.2f}s "
+          f"({summary['throughput_flows_per_s']:.1f} flows/s)")
+    for label in ("flow_latency", "report_latency"):
+        p = summary[label]
+        if p:
+            print(f"{label:<15} p50 {p['p50_s'] * 1e3:8.1f}ms  p95 {p['p95_s'] * 1e3:8.1f}ms  "
+                  f"p99 {p['p99_s'] * 1e3:8.1f}ms  max {p['max_s'] * 1e3:8.1f}ms")
+    for error, count in summary["errors"].items():
+        print(f"  {count} x {error}")
+    print(f"upstream: {summary['upstream']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, default=str)
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+# your_bot_project/benchmarks/run.py
+
+"""
+Offline benchmark runner.
+
+    python -m benchmarks.run                      # full run, compared against benchmarks/baseline.json
+    python -m benchmarks.run --quick              # skip the largest spans
+    python -m benchmarks.run --save-baseline      # record the current results as the new baseline
+    python -m benchmarks.run --filter cache_      # only benchmarks whose name contains 'cache_'
+
+Results are written as JSON; each benchmark reports the median and minimum
+of several timed repeats. Medians slower than the baseline by more than
+--tolerance are reported as regressions (exit code 1 with --fail-on-regression).
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics as pystats
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import services.statistics as stats
+from services.bar_cache import BarCache
+from services.columnar_cache import ColumnarCache
+from services.data_cache import DataCache
+import reporting.formatters as formatters
+from benchmarks.synthetic import DEFAULT_END, generate_assets, generate_ohlcv
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+DEFAULT_OUTPUT = os.path.join(BENCHMARK_DIR, "latest.json")
+
+# Series lengths in days: a quarter, a year, a decade and two decades of hourly bars.
+SPANS = {"3m": 90, "1y": 365, "10y": 3650, "20y": 7300}
+QUICK_SPANS = ("3m", "1y", "10y")
+CACHE_SPANS = ("3m", "1y", "10y")
+# Cache backends under test; SQLite keeps the unprefixed names recorded in older baselines.
+CACHE_BACKENDS = {
+    "": lambda path: DataCache(db_path=path + ".db"),
+    "columnar-": lambda path: ColumnarCache(path),
+    "l1-": lambda path: BarCache(DataCache(db_path=path + ".db")),
+}
+# Reference time at the end of the synthetic data, so the statistics cover the whole series.
+NOW = DEFAULT_END.replace(tzinfo=timezone.utc)
+
+
+def _time(func, repeats: int, setup=None) -> dict:
+    """Times `func(setup())` `repeats` times; setup runs outside the timed region."""
+    samples = []
+    for _ in range(repeats):
+        arg = setup() if setup else None
+        started = time.perf_counter()
+        func(arg) if setup else func()
+        samples.append(time.perf_counter() - started)
+    return {"median_s": pystats.median(samples), "min_s": min(samples), "repeats": repeats}
+
+
+def _bench_statistics(results: dict, spans: list):
+    for label in spans:
+        days = SPANS[label]
+        data = generate_ohlcv("NQ1!", days, "cme_futures", "CME_MINI")
+        repeats = 20 if days <= 365 else 5
+        results[f"stats_daily[{label}]"] = _time(lambda: stats.calculate_daily_stats(data, days - 1, NOW), repeats)
+        results[f"stats_weekly[{label}]"] = _time(lambda: stats.calculate_weekly_stats(data, days // 7 - 2, NOW), repeats)
+
+
+def _bench_cache(results: dict, spans: list, workdir: str):
+    for (prefix, open_cache), span in ((b, s) for b in CACHE_BACKENDS.items() for s in spans):
+        label = prefix + span
+        days = SPANS[span]
+        data = generate_ohlcv("BTCUSDT", days, "crypto", "BINANCE")
+        repeats = 5 if days <= 365 else 3
+        counter = iter(range(10**6))
+
+        def fresh_cache():
+            return open_cache(os.path.join(workdir, f"save-{label}-{next(counter)}"))
+
+        def save_into(cache):
+            cache.save_data(data, "BTCUSDT", "BINANCE", "1H")
+            cache.close()
+        results[f"cache_save_full[{label}]"] = _time(save_into, repeats, setup=fresh_cache)
+
+        # Steady state: a populated database receiving a tail top-up and serving reads.
+        cache = open_cache(os.path.join(workdir, f"steady-{label}"))
+        cache.save_data(data, "BTCUSDT", "BINANCE", "1H")
+        tail = data.tail(8)
+        results[f"cache_save_tail[{label}]"] = _time(lambda: cache.save_data(tail, "BTCUSDT", "BINANCE", "1H"), 20)
+        results[f"cache_get_2000[{label}]"] = _time(lambda: cache.get_data("BTCUSDT", "BINANCE", "1H", 2000), 20)
+        results[f"cache_get_all[{label}]"] = _time(
+            lambda: cache.get_data("BTCUSDT", "BINANCE", "1H", len(data)), repeats
+        )
+        results[f"stats_weekly_from_cache[{label}]"] = _time(
+            lambda: stats.calculate_weekly_stats_from_cache(cache, "BTCUSDT", "BINANCE", "1H", days // 7 - 2, NOW), 20
+        )
+        cache.close()
+
+
+def _bench_shared_cache(results: dict, workdir: str):
+    """Reads and top-ups against a database holding a decade of every configured asset."""
+    assets = generate_assets(SPANS["10y"])
+    tail = assets["NQ1!"].tail(8)
+    for prefix, open_cache in CACHE_BACKENDS.items():
+        cache = open_cache(os.path.join(workdir, f"all-assets-{prefix}"))
+        for symbol, data in assets.items():
+            cache.save_data(data, symbol, data["symbol"].iat[0].split(":")[0], "1H")
+        label = f"{prefix}all-assets-10y"
+        results[f"cache_save_tail[{label}]"] = _time(lambda: cache.save_data(tail, "NQ1!", "CME_MINI", "1H"), 20)
+        results[f"cache_get_2000[{label}]"] = _time(lambda: cache.get_data("NQ1!", "CME_MINI", "1H", 2000), 20)
+        cache.close()
+
+
+def _bench_formatters(results: dict):
+    rng = np.random.default_rng(0)
+    hourly = [rng.integers(0, 400, size=24).tolist() for _ in range(2)]
+    weekly = [rng.integers(0, 100, size=7).tolist() for _ in range(2)]
+    results["format_daily"] = _time(lambda: formatters.format_daily_report("NQ1!", 3650, *hourly), 200)
+    results["format_weekly"] = _time(lambda: formatters.format_weekly_report("NQ1!", 520, *weekly), 200)
+
+
+def run(spans: list, name_filter: str | None = None) -> dict:
+    """Runs every benchmark and returns {name: timing}."""
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        _bench_statistics(results, spans)
+        _bench_cache(results, [s for s in CACHE_SPANS if s in spans], workdir)
+        _bench_shared_cache(results, workdir)
+        _bench_formatters(results)
+    if name_filter:
+        results = {name: r for name, r in results.items() if name_filter in name}
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Returns (name, baseline_s, current_s, ratio, regressed) for benchmarks present in both."""
+    rows = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        ratio = current["median_s"] / previous["median_s"] if previous["median_s"] else float("inf")
+        rows.append((name, previous["median_s"], current["median_s"], ratio, ratio > 1.0 + tolerance))
+    return rows
+
+
+def _environment() -> dict:
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for statistics, cache and formatters.")
+    parser.add_argument("--quick", action="store_true", help="skip the 20-year span")
+    parser.add_argument("--filter", help="only keep benchmarks whose name contains this text")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the JSON results")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results to the baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging, e.g. 0.25 = 25%%")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 if anything regressed")
+    args = parser.parse_args(argv)
+
+    # The cache logs every save at INFO; keep the benchmark output readable.
+    logging.basicConfig(level=logging.WARNING)
+
+    spans = list(QUICK_SPANS if args.quick else SPANS)
+    results = run(spans, args.filter)
+    report = {"environment": _environment(), "results": results}
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+    rows = compare(results, baseline, args.tolerance)
+
+    print(f"{'benchmark':<36} {'baseline':>11} {'current':>11} {'ratio':>7}")
+    for name, result in results.items():
+        row = next((r for r in rows if r[0] == name), None)
+        if row is None:
+            print(f"{name:<36} {'-':>11} {result['median_s'] * 1e3:9.3f}ms {'new':>7}")
+            continue
+        _, previous, current, ratio, regressed = row
+        flag = "  REGRESSED" if regressed else ""
+        print(f"{name:<36} {previous * 1e3:9.3f}ms {current * 1e3:9.3f}ms {ratio:6.2f}x{flag}")
+
+    regressions = [r[0] for r in rows if r[4]]
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) slower than baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+# your_bot_project/benchmarks/synthetic.py
+
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from config import ASSET_EXCHANGE_MAP, ASSET_SESSION_MAP, NEW_YORK_TIMEZONE
+
+# Fixed end of every generated series, so the same arguments always give the same data.
+DEFAULT_END = datetime(2026, 1, 2, 0, 0)
+
+# Hourly log-return volatility per session profile.
+_VOLATILITY = {"cme_futures": 0.003, "fx": 0.0015, "crypto": 0.008}
+# Exchange holidays per year (full trading days removed), and the chance of a data outage per bar.
+_HOLIDAYS_PER_YEAR = 9
+_OUTAGE_PROBABILITY = 0.002
+
+
+def _seed(symbol: str, seed: int) -> int:
+    return zlib.crc32(symbol.encode()) ^ seed
+
+
+def _session_mask(utc_index: pd.DatetimeIndex, profile: str) -> np.ndarray:
+    """Returns True for hourly bars that fall inside the profile's trading session (New York time)."""
+    if profile == "crypto":
+        return np.ones(len(utc_index), dtype=bool)
+    local = utc_index.tz_localize("UTC").tz_convert(NEW_YORK_TIMEZONE)
+    weekday = local.weekday.to_numpy()
+    hour = local.hour.to_numpy()
+    open_hour = 18 if profile == "cme_futures" else 17
+    # Closed from Friday 17:00 until the Sunday open, and all of Saturday.
+    closed = (weekday == 5) | ((weekday == 4) & (hour >= 17)) | ((weekday == 6) & (hour < open_hour))
+    if profile == "cme_futures":
+        # CME Globex daily maintenance halt 17:00-18:00.
+        closed |= hour == 17
+    return ~closed
+
+
+def generate_ohlcv(symbol: str, days: int, profile: str = "crypto", exchange: str = "SYNTH",
+                   end: datetime = DEFAULT_END, seed: int = 0) -> pd.DataFrame:
+    """
+    Generates a deterministic hourly OHLCV series shaped like TvDatafeed output.
+
+    Bars follow the session profile's trading hours and include holiday
+    closures and short random data outages. Timestamps are naive, as
+    TvDatafeed returns them, and the bot treats them as UTC.
+
+    Args:
+        symbol (str): Asset symbol; also seeds the random generator.
+        days (int): Length of the series in calendar days.
+        profile (str): "cme_futures", "fx" or "crypto" (see services/market_hours.py).
+        exchange (str): Exchange code written to the `symbol` column.
+        end (datetime): Naive end of the series (exclusive).
+        seed (int): Extra seed to vary series with the same symbol.
+
+    Returns:
+        A DataFrame indexed by 'datetime' with symbol, open, high, low, close and volume columns.
+    """
+    rng = np.random.default_rng(_seed(symbol, seed))
+    index = pd.date_range(end=end - timedelta(hours=1), periods=days * 24, freq="h", name="datetime")
+    keep = _session_mask(index, profile)
+
+    if profile != "crypto":
+        dates = index.normalize().to_numpy()
+        unique_dates = np.unique(dates)
+        holidays = rng.choice(unique_dates, size=min(len(unique_dates), days * _HOLIDAYS_PER_YEAR // 365), replace=False)
+        keep &= ~np.isin(dates, holidays)
+
+    # Outages drop a run of 1-6 bars starting at randomly chosen bars.
+    outage_starts = np.flatnonzero(rng.random(len(index)) < _OUTAGE_PROBABILITY)
+    for start, length in zip(outage_starts, rng.integers(1, 7, size=len(outage_starts))):
+        keep[start:start + length] = False
+
+    index = index[keep]
+    n = len(index)
+    volatility = _VOLATILITY.get(profile, 0.003)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0.0, volatility, size=n)))
+    open_ = np.empty(n)
+    open_[0] = 100.0
+    open_[1:] = close[:-1]
+    wick = np.abs(rng.normal(0.0, volatility, size=(2, n)))
+    high = np.maximum(open_, close) * (1.0 + wick[0])
+    low = np.minimum(open_, close) * (1.0 - wick[1])
+    volume = rng.lognormal(8.0, 1.0, size=n).round()
+
+    return pd.DataFrame(
+        {"symbol": f"{exchange}:{symbol}", "open": open_, "high": high, "low": low, "close": close, "volume": volume},
+        index=index,
+    )
+
+
+def generate_assets(days: int, end: datetime = DEFAULT_END, seed: int = 0) -> dict:
+    """Generates one series per configured asset, using its exchange and session profile."""
+    return {
+        symbol: generate_ohlcv(symbol, days, ASSET_SESSION_MAP.get(symbol, "crypto"), exchange, end, seed)
+        for symbol, exchange in ASSET_EXCHANGE_MAP.items()
+    }
@@ -0,0 +1,303 @@
+# your_bot_project/benchmarks/webhook_test.py
+
+"""
+End-to-end test of webhook mode with a fake Telegram on both sides.
+
+    python -m benchmarks.webhook_test --workers 4 --users 200
+    python -m benchmarks.webhook_test --workers 1 --users 200 --output webhook-1.json
+
+Starts the WebhookDispatcher with real worker processes built by
+main.build_application. A fake update poster plays Telegram's side of the
+webhook: it posts /start, the button presses and N for every simulated user
+to the receiver, waiting for the bot's reply after each step. The workers
+answer through a fake Bot API server that records every message. Market data
+comes from ReplayDatafeed over synthetic files, and all workers share one
+on-disk cache. A flow only completes if the user's conversation state stayed
+in one worker.
+"""
+
+import argparse
+import asyncio
+import functools
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import numpy as np
+
+from config import ASSET_EXCHANGE_MAP, UPSTREAM_RATE_PER_SECOND
+from benchmarks.synthetic import generate_assets
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPORT_MARKER = "統計報告"
+FAKE_TOKEN = "123456:WEBHOOK-TEST"
+SECRET = "webhook-test-secret"
+
+
+class FakeBotAPI:
+    """A minimal Bot API server: answers the methods the bot calls and records what it sends per chat."""
+    def __init__(self):
+        self.events = {}
+        self._message_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                method = self.path.rsplit("/", 1)[-1]
+                if self.headers.get("Content-Type", "").startswith("application/json"):
+                    params = json.loads(body or b"{}")
+                else:
+                    params = {k: v[0] for k, v in parse_qs(body.decode("utf-8")).items()}
+                payload = json.dumps({"ok": True, "result": api.handle(method, params)}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}/bot"
+
+    def handle(self, method: str, params: dict):
+        if method == "getMe":
+            return {"id": 123456, "is_bot": True, "first_name": "StatsBot", "username": "stats_test_bot",
+                    "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": False}
+        if method in ("sendMessage", "editMessageText"):
+            chat_id = int(params["chat_id"])
+            with self._lock:
+                self.events.setdefault(chat_id, []).append((method, params.get("text", ""), time.monotonic()))
+            return {"message_id": int(params.get("message_id") or next(self._message_ids)), "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"}, "text": params.get("text", "")}
+        return True
+
+    def count(self, chat_id: int) -> int:
+        with self._lock:
+            return len(self.events.get(chat_id, ()))
+
+    def since(self, chat_id: int, index: int) -> list:
+        with self._lock:
+            return list(self.events.get(chat_id, ())[index:])
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="fake-bot-api", daemon=True).start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class UpdatePoster:
+    """Plays Telegram's side of the webhook: posts updates as JSON with the secret token header."""
+    def __init__(self, url: str, secret_token: str):
+        self.url = url
+        self.secret_token = secret_token
+        self._update_ids = itertools.count(1)
+        self.statuses = {}
+
+    def post(self, update: dict, attempts: int = 3) -> int:
+        """Posts one update, redelivering it like Telegram does when the receiver fails; returns the last status."""
+        update = {"update_id": next(self._update_ids), **update}
+        request = urllib.request.Request(
+            self.url, data=json.dumps(update).encode("utf-8"), method="POST",
+            headers={"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": self.secret_token},
+        )
+        for attempt in range(attempts):
+            try:
+                with urllib.request.urlopen(request, timeout=10) as response:
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except OSError:
+                status = 0
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if status == 200:
+                break
+            time.sleep(0.5 * (attempt + 1))
+        return status
+
+
+def _user(user_id: int) -> dict:
+    return {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+
+
+def message_update(user_id: int, text: str) -> dict:
+    message = {"message_id": random.randint(1, 10 ** 9), "date": int(time.time()), "text": text,
+               "chat": {"id": user_id, "type": "private"}, "from": _user(user_id)}
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"message": message}
+
+
+def callback_update(user_id: int, data: str) -> dict:
+    return {"callback_query": {
+        "id": str(random.randint(1, 10 ** 12)), "from": _user(user_id), "chat_instance": str(user_id), "data": data,
+        "message": {"message_id": 1, "date": int(time.time()), "chat": {"id": user_id, "type": "private"}, "text": ""},
+    }}
+
+
+async def simulate_user(api: FakeBotAPI, poster: UpdatePoster, user_id: int, stats_type: str, asset: str,
+                        n_value: int, timeout: float) -> dict:
+    """Runs one user through /start -> button -> asset -> N over the webhook, waiting for each reply."""
+    loop = asyncio.get_running_loop()
+
+    async def step(update: dict, done) -> str | None:
+        seen = api.count(user_id)
+        status = await loop.run_in_executor(None, poster.post, update)
+        if status != 200:
+            return f"HTTP {status}"
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            if any(done(text) for _, text, _ in api.since(user_id, seen)):
+                return None
+            await asyncio.sleep(0.02)
+        replies = api.since(user_id, seen)
+        return f"no reply: {replies[-1][1][:40]!r}" if replies else "no reply"
+
+    started = loop.time()
+    error = (await step(message_update(user_id, "/start"), lambda text: "請點擊" in text)
+             or await step(callback_update(user_id, f"start_{stats_type}_stats"), lambda text: "請選擇" in text)
+             or await step(callback_update(user_id, f"select_asset_{stats_type}:{asset}"), lambda text: "請輸入" in text))
+    report_started = loop.time()
+    if error is None:
+        error = await step(message_update(user_id, str(n_value)),
+                           lambda text: REPORT_MARKER in text or text.startswith("抱歉"))
+        if error is None and not any(REPORT_MARKER in text for _, text, _ in api.since(user_id, 0)):
+            error = api.since(user_id, 0)[-1][1]
+    finished = loop.time()
+    return {"ok": error is None, "error": error, "flow_s": finished - started, "report_s": finished - report_started}
+
+
+def _percentiles(samples: list) -> dict:
+    if not samples:
+        return {}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {"p50_s": p50, "p95_s": p95, "p99_s": p99, "max_s": max(samples)}
+
+
+async def run_users(api: FakeBotAPI, poster: UpdatePoster, args) -> dict:
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=64))
+    rng = random.Random(args.seed)
+    assets = list(ASSET_EXCHANGE_MAP)
+
+    async def delayed_user(user_id):
+        await asyncio.sleep(rng.uniform(0.0, args.ramp_seconds))
+        stats_type = rng.choice(('daily', 'weekly'))
+        n_value = rng.randint(5, 60) if stats_type == 'daily' else rng.randint(4, 26)
+        return await simulate_user(api, poster, user_id, stats_type, rng.choice(assets), n_value, args.step_timeout)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(delayed_user(100000 + i) for i in range(args.users)))
+    wall = time.perf_counter() - started
+    succeeded = [r for r in results if r["ok"]]
+    errors = {}
+    for r in results:
+        if not r["ok"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    return {
+        "users": args.users,
+        "workers": args.workers,
+        "succeeded": len(succeeded),
+        "failed": args.users - len(succeeded),
+        "wall_s": wall,
+        "throughput_flows_per_s": len(succeeded) / wall if wall else 0.0,
+        "flow_latency": _percentiles([r["flow_s"] for r in succeeded]),
+        "report_latency": _percentiles([r["report_s"] for r in succeeded]),
+        "errors": errors,
+        "http_statuses": poster.statuses,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Webhook mode end to end with a fake Telegram.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--ramp-seconds", type=float, default=5.0, help="spread user arrivals over this many seconds")
+    parser.add_argument("--step-timeout", type=float, default=60.0, help="seconds to wait for each reply")
+    parser.add_argument("--history-days", type=int, default=400, help="length of the replayed history")
+    parser.add_argument("--latency", type=float, default=0.3, help="replay latency per upstream call (s)")
+    parser.add_argument("--upstream-rate", type=float, default=UPSTREAM_RATE_PER_SECOND,
+                        help="upstream calls per second, split across the workers")
+    parser.add_argument("--cache-backend", choices=("sqlite", "columnar"), default="sqlite")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    api = FakeBotAPI()
+    api.start()
+    with tempfile.TemporaryDirectory(prefix="webhook-") as workdir:
+        from services.replay_feed import write_replay_file
+        replay_dir = os.path.join(workdir, "replay")
+        for symbol, data in generate_assets(args.history_days).items():
+            write_replay_file(data, replay_dir, symbol, ASSET_EXCHANGE_MAP[symbol], "1H")
+        # Spawned workers inherit the environment and working directory, so their data/ lives in workdir.
+        os.environ.update({
+            "TELEGRAM_BOT_TOKEN": FAKE_TOKEN, "TELEGRAM_API_BASE_URL": api.base_url,
+            "TV_REPLAY_DIR": replay_dir, "TV_REPLAY_LATENCY_SECONDS": str(args.latency),
+            "TV_AUTH_SESSIONS": "0", "TV_GUEST_SESSIONS": str(2 * args.workers),
+            "UPSTREAM_RATE_PER_SECOND": str(args.upstream_rate),
+            "CACHE_BACKEND": args.cache_backend, "PREFETCH_ENABLED": "0", "METRICS_ENABLED": "0",
+        })
+        sys.path.insert(0, REPO_ROOT)
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        os.makedirs("data", exist_ok=True)
+        import main as bot_main
+        from bot.webhook import WebhookDispatcher
+        logging.getLogger().setLevel(logging.WARNING)
+
+        dispatcher = WebhookDispatcher(
+            functools.partial(bot_main.build_application, webhook=True),
+            workers=args.workers, port=0, secret_token=SECRET,
+        )
+        dispatcher.start()
+        try:
+            if not dispatcher.wait_until_ready(timeout=120):
+                print("workers did not start")
+                return 1
+            poster = UpdatePoster(f"http://127.0.0.1:{dispatcher.port}{dispatcher.path}", SECRET)
+            summary = asyncio.run(run_users(api, poster, args))
+            summary["dispatcher"] = dispatcher.status()
+        finally:
+            dispatcher.stop()
+            api.stop()
+            os.chdir(cwd)
+    summary["config"] = vars(args)
+
+    print(f"{summary['succeeded']}/{summary['users']} flows succeeded over {args.workers} workers in "
+          f"{summary['wall_s']:.2f}s ({summary['throughput_flows_per_s']:.1f} flows/s)")
+    for label in ("flow_latency", "report_latency"):
+        p = summary[label]
+        if p:
+            print(f"{label:<15} p50 {p['p50_s'] * 1e3:8.1f}ms  p95 {p['p95_s'] * 1e3:8.1f}ms  "
+                  f"p99 {p['p99_s'] * 1e3:8.1f}ms  max {p['max_s'] * 1e3:8.1f}ms")
+    for error, count in summary["errors"].items():
+        print(f"  {count} x {error}")
+    print(f"webhook responses: {summary['http_statuses']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, default=str)
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+# your_bot_project/bot/broadcast.py
+
+import asyncio
+import logging
+import random
+from collections import OrderedDict
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+from services.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_MESSAGES = REGISTRY.counter(
+    "bot_broadcast_messages_total", "Broadcast messages by outcome.", ("outcome",)
+)
+
+SENT = "sent"
+FAILED = "failed"
+BLOCKED = "blocked"
+
+
+class _SendBucket:
+    """An asyncio token bucket that can be paused when Telegram asks to retry later."""
+    def __init__(self, rate_per_second: float, burst: float):
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self._tokens = float(burst)
+        self._loop_time = asyncio.get_running_loop().time
+        self._refilled_at = self._loop_time()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, self._loop_time() + seconds)
+
+    async def take(self):
+        # Waiters queue on the lock, so tokens are handed out in arrival order.
+        async with self._lock:
+            while True:
+                now = self._loop_time()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate_per_second)
+                self._refilled_at = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate_per_second)
+
+
+def _retry_after_seconds(error: RetryAfter) -> float:
+    retry_after = error.retry_after
+    return retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+
+
+class Broadcaster:
+    """
+    Sends one message to many chats within Telegram's rate limits.
+
+    Messages go out in batches of `batch_size` concurrent sends, paced by a
+    global token bucket of `rate_per_second` (Telegram allows about 30 per
+    second per bot; the default leaves room for interactive replies) and
+    spaced at least `per_chat_interval` seconds apart within one chat.
+    RetryAfter pauses the whole broadcast for the requested time; network
+    errors are retried with jittered backoff; chats that blocked the bot are
+    reported so their subscriptions can be dropped.
+    """
+    def __init__(self, send, rate_per_second: float = 20.0, per_chat_interval: float = 1.0,
+                 batch_size: int = 25, max_retries: int = 3):
+        """`send` is a coroutine function send(chat_id, text), e.g. wrapping bot.send_message."""
+        self.send = send
+        self.rate_per_second = rate_per_second
+        self.per_chat_interval = per_chat_interval
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+
+    @staticmethod
+    def _interleave(messages: list) -> list:
+        """Orders (index, chat_id, text) round-robin by chat, so one chat's messages are spread out."""
+        per_chat = OrderedDict()
+        for index, (chat_id, text) in enumerate(messages):
+            per_chat.setdefault(chat_id, []).append((index, text))
+        ordered = []
+        while per_chat:
+            for chat_id in list(per_chat):
+                index, text = per_chat[chat_id].pop(0)
+                ordered.append((index, chat_id, text))
+                if not per_chat[chat_id]:
+                    del per_chat[chat_id]
+        return ordered
+
+    async def broadcast(self, messages: list, on_batch=None) -> dict:
+        """
+        Delivers (chat_id, text) messages.
+
+        Args:
+            on_batch (coroutine function | None): Awaited after each batch with
+                the indices into `messages` it finished (sent, failed or
+                blocked), so the caller can record progress as it goes.
+
+        Returns:
+            {"sent": int, "failed": int, "blocked": [chat ids that blocked the bot], "seconds": float}
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        # No burst: sends are spread evenly, so no one-second window exceeds the rate.
+        bucket = _SendBucket(self.rate_per_second, burst=1.0)
+        chat_locks, last_chat_send = {}, {}
+        summary = {SENT: 0, FAILED: 0, BLOCKED: []}
+
+        async def deliver(chat_id, text):
+            # One send at a time per chat, spaced from the previous actual send, retries included.
+            async with chat_locks.setdefault(chat_id, asyncio.Lock()):
+                for attempt in range(self.max_retries + 1):
+                    wait = last_chat_send.get(chat_id, float("-inf")) + self.per_chat_interval - loop.time()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    await bucket.take()
+                    last_chat_send[chat_id] = loop.time()
+                    try:
+                        await self.send(chat_id, text)
+                        return SENT
+                    except RetryAfter as e:
+                        seconds = _retry_after_seconds(e)
+                        logger.warning(f"Telegram flood control: pausing broadcast for {seconds}s.")
+                        bucket.pause(seconds)
+                    except Forbidden:
+                        return BLOCKED
+                    except BadRequest as e:
+                        logger.warning(f"Could not deliver to chat {chat_id}: {e}")
+                        return FAILED
+                    except NetworkError as e:
+                        delay = random.uniform(0.0, min(30.0, 2.0 ** attempt))
+                        logger.warning(f"Network error delivering to chat {chat_id} ({e}); retrying in {delay:.1f}s.")
+                        await asyncio.sleep(delay)
+                return FAILED
+
+        ordered = self._interleave(messages)
+        for i in range(0, len(ordered), self.batch_size):
+            batch = ordered[i:i + self.batch_size]
+            outcomes = await asyncio.gather(*(deliver(chat_id, text) for _, chat_id, text in batch))
+            if on_batch is not None:
+                await on_batch([index for index, _, _ in batch])
+            for (_, chat_id, _), outcome in zip(batch, outcomes):
+                BROADCAST_MESSAGES.inc(outcome=outcome)
+                if outcome == BLOCKED:
+                    summary[BLOCKED].append(chat_id)
+                else:
+                    summary[outcome] += 1
+        summary["seconds"] = loop.time() - started
+        logger.info(f"Broadcast {summary[SENT]} messages in {summary['seconds']:.1f}s "
+                    f"({summary[FAILED]} failed, {len(summary[BLOCKED])} blocked).")
+        return summary
@@ -1,23 +1,59 @@
 # your_bot_project/bot/handlers.py (最終修正版)
 
+import asyncio
 import logging
+from datetime import datetime
+from typing import TYPE_CHECKING
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, constants
 from telegram.ext import ContextTypes
 
-from tvDatafeed import Interval
-
 from bot.state_manager import StateManager
-from services.data_provider import TradingViewDataProvider
-import services.statistics as stats
+from services.executor import TaskExecutor, ExecutorShutdownError
+from services.report_cache import ReportCache
+from services.startup_profile import startup_timer
+from services.metrics import STAGE_SECONDS
+from services.rate_limiter import INTERACTIVE, BACKGROUND
 import reporting.formatters as formatters
-from config import ASSET_EXCHANGE_MAP, State
+from config import (
+    ASSET_EXCHANGE_MAP, BACKFILL_CHUNK_BARS, BACKFILL_PROGRESS_INTERVAL_SECONDS, COMPARE_EDIT_INTERVAL_SECONDS,
+    NEW_YORK_TIMEZONE, SUBSCRIPTION_DEFAULT_TIME, SUBSCRIPTION_MAX_PER_CHAT, SUBSCRIPTION_TIMEZONE, State,
+)
+
+if TYPE_CHECKING:
+    # pandas and tvDatafeed are only imported once the data services are built.
+    from services.data_provider import TradingViewDataProvider
+    from services.prefetch import PrefetchScheduler
+    from services.subscriptions import SubscriptionStore, SubscriptionScheduler
 
 logger = logging.getLogger(__name__)
 
+
+class ReportUnavailable(Exception):
+    """Raised by _build_report with the message to show when no report can be produced."""
+
+
 class BotHandlers:
-    def __init__(self, state_manager: StateManager, data_provider: TradingViewDataProvider):
+    def __init__(self, state_manager: StateManager, data_provider: "TradingViewDataProvider | None", executor: TaskExecutor,
+                 report_cache: ReportCache | None = None, prefetcher: "PrefetchScheduler | None" = None,
+                 max_user_requests: int = 2, subscriptions: "SubscriptionStore | None" = None):
         self.state_manager = state_manager
+        # May be None at first: main.py attaches the data services once they are built in the background.
         self.data_provider = data_provider
+        self.executor = executor
+        self.report_cache = report_cache or ReportCache()
+        self.prefetcher = prefetcher
+        # Reports in progress per user; all handlers run on the event loop thread, so no lock.
+        self.max_user_requests = max_user_requests
+        self._user_requests = {}
+        self.subscriptions = subscriptions
+        self.subscription_scheduler = None
+
+    def attach_services(self, data_provider: "TradingViewDataProvider", prefetcher: "PrefetchScheduler | None" = None,
+                        subscription_scheduler: "SubscriptionScheduler | None" = None):
+        """Makes the data services available once background startup has built them."""
+        self.data_provider = data_provider
+        self.prefetcher = prefetcher
+        self.subscription_scheduler = subscription_scheduler
 
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         keyboard = [
@@ -31,6 +67,38 @@ class BotHandlers:
             "請點擊下方按鈕開始：",
             reply_markup=reply_markup
         )
+        if startup_timer.mark("first_response"):
+            logger.info(startup_timer.report())
+
+    async def status(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        status = self.prefetcher.status() if self.prefetcher else {}
+        report = formatters.format_prefetch_status(status)
+        if self.data_provider is not None:
+            report += formatters.format_session_pool_status(self.data_provider.pool_status)
+            report += formatters.format_upstream_queue_status(self.data_provider.limiter_status)
+            report += formatters.format_circuit_status(self.data_provider.circuit_status)
+        if self.subscription_scheduler is not None:
+            report += formatters.format_subscription_status(self.subscription_scheduler.stats)
+        report += "\n" + startup_timer.report()
+        await update.message.reply_text(report, parse_mode=None)
+
+    def _begin_request(self, user_id: int) -> bool:
+        """Counts a report in progress for the user; returns False if they are at their limit."""
+        active = self._user_requests.get(user_id, 0)
+        if active >= self.max_user_requests:
+            return False
+        self._user_requests[user_id] = active + 1
+        return True
+
+    def _end_request(self, user_id: int):
+        remaining = self._user_requests.get(user_id, 1) - 1
+        if remaining > 0:
+            self._user_requests[user_id] = remaining
+        else:
+            self._user_requests.pop(user_id, None)
+
+    async def _reject_busy_user(self, update: Update):
+        await update.message.reply_text(f"您已有 {self.max_user_requests} 個請求正在處理中，請等待完成後再試。")
 
     async def _present_asset_selection(self, query, stats_type: str) -> None:
         asset_buttons = [
@@ -79,6 +147,10 @@ class BotHandlers:
         except ValueError:
             await update.message.reply_text("輸入無效，請輸入一個正整數。")
             return
+        if self.data_provider is None:
+            # Keep the user's state so they can simply send N again in a moment.
+            await update.message.reply_text("系統正在啟動中，請稍候幾秒後再輸入一次。")
+            return
         user_session_data = self.state_manager.get_data(user_id)
         asset_symbol = user_session_data.get('asset_symbol')
         exchange = ASSET_EXCHANGE_MAP.get(asset_symbol)
@@ -86,30 +158,332 @@ class BotHandlers:
             await update.message.reply_text("系統錯誤，請重新 /start 開始。")
             self.state_manager.clear_state(user_id)
             return
-        
+        if not self._begin_request(user_id):
+            # Keep the user's state so they can send N again once a report arrives.
+            await self._reject_busy_user(update)
+            return
+
         if current_state == State.DAILY_STATS_ASSET_SELECTION:
-            await update.message.reply_text(f"收到！正在為 {asset_symbol} 獲取並分析最近 {n_value} 天的數據，請稍候...")
-            raw_data = self.data_provider.get_historical_data(asset_symbol, exchange, Interval.in_1_hour, n_bars=n_value * 24 + 5)
-            result = stats.calculate_daily_stats(raw_data, n_value) if raw_data is not None else None
-            if result:
-                high_counts, low_counts, days_processed = result
-                report = formatters.format_daily_report(asset_symbol, days_processed, high_counts, low_counts)
-                # 【修正】使用 parse_mode=None 來發送純文字報告
+            stats_type = 'daily'
+            ack_text = f"收到！正在為 {asset_symbol} 獲取並分析最近 {n_value} 天的數據，請稍候..."
+        else:
+            stats_type = 'weekly'
+            ack_text = f"收到！正在為 {asset_symbol} 獲取並分析最近 {n_value} 個完整週的數據，請稍候..."
+        ack = await update.message.reply_text(ack_text)
+
+        try:
+            report = await self._with_progress(
+                ack, ack_text,
+                lambda on_progress: self._build_report(stats_type, asset_symbol, exchange, n_value, on_progress),
+            )
+            # 【修正】使用 parse_mode=None 來發送純文字報告
+            with STAGE_SECONDS.time(stage="telegram_send"):
                 await update.message.reply_text(report, parse_mode=None)
+        except ReportUnavailable as e:
+            await update.message.reply_text(str(e))
+        except asyncio.TimeoutError:
+            await update.message.reply_text(f"抱歉，為 {asset_symbol} 處理數據逾時，請稍後再試。")
+        except ExecutorShutdownError as e:
+            logger.warning(f"Could not process request for user {user_id}: {e}")
+        finally:
+            self._end_request(user_id)
+            self.state_manager.clear_state(user_id)
+
+    async def _with_progress(self, message, text: str, build):
+        """
+        Awaits build(on_progress) and edits `message` with the progress it reports.
+
+        on_progress(fraction) may be called from worker threads; the message is
+        edited from the event loop at most once per BACKFILL_PROGRESS_INTERVAL_SECONDS.
+        """
+        progress = {}
+        task = asyncio.ensure_future(build(lambda fraction: progress.__setitem__("fraction", fraction)))
+        try:
+            shown = None
+            while not task.done():
+                await asyncio.wait({task}, timeout=BACKFILL_PROGRESS_INTERVAL_SECONDS)
+                fraction = progress.get("fraction")
+                if not task.done() and fraction is not None and fraction != shown:
+                    shown = fraction
+                    await message.edit_text(f"{text}\n歷史數據處理進度：{fraction:.0%}")
+            return task.result()
+        finally:
+            task.cancel()
+
+    async def compare(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """
+        /compare daily|weekly N: statistics for every asset side by side.
+
+        All assets are fetched concurrently and their statistics computed in
+        the process pool; the reply is edited as each asset finishes.
+        """
+        args = context.args or []
+        try:
+            stats_type = args[0].lower()
+            n_value = int(args[1])
+            if stats_type not in ('daily', 'weekly') or n_value <= 0: raise ValueError("invalid arguments")
+        except (IndexError, ValueError):
+            await update.message.reply_text("用法：/compare daily N 或 /compare weekly N（N 為正整數）")
+            return
+        if self.data_provider is None:
+            await update.message.reply_text("系統正在啟動中，請稍候幾秒後再輸入一次。")
+            return
+        user_id = update.effective_user.id
+        if not self._begin_request(user_id):
+            await self._reject_busy_user(update)
+            return
+        try:
+            await self._run_compare(update.message, stats_type, n_value)
+        except ExecutorShutdownError as e:
+            logger.warning(f"Could not finish /compare for user {user_id}: {e}")
+        finally:
+            self._end_request(user_id)
+
+    async def _run_compare(self, reply_to, stats_type: str, n_value: int):
+        assets = list(ASSET_EXCHANGE_MAP.keys())
+        results = {}
+        message = await reply_to.reply_text(
+            formatters.format_compare_report(stats_type, n_value, assets, results), parse_mode=None
+        )
+        now = datetime.now(NEW_YORK_TIMEZONE)
+
+        async def run_one(asset_symbol):
+            exchange = ASSET_EXCHANGE_MAP[asset_symbol]
+            try:
+                raw_data = await self._fetch_bars(stats_type, asset_symbol, exchange, n_value)
+                result = None
+                if raw_data is not None:
+                    result = await self._compute_stats(stats_type, asset_symbol, exchange, n_value, raw_data, now)
+            except asyncio.TimeoutError:
+                logger.warning(f"Timed out comparing {asset_symbol}.")
+                result = None
+            except ExecutorShutdownError:
+                raise
+            except Exception as e:
+                # One failing asset must not cancel the others; its row shows as unavailable.
+                logger.error(f"Error comparing {asset_symbol}: {e}", exc_info=True)
+                result = None
+            return asset_symbol, result
+
+        last_edit = 0.0
+        tasks = [asyncio.ensure_future(run_one(symbol)) for symbol in assets]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                asset_symbol, result = await finished
+                results[asset_symbol] = result
+                loop_time = asyncio.get_running_loop().time()
+                # Telegram throttles message edits, so intermediate updates are rate limited.
+                if len(results) < len(assets) and loop_time - last_edit < COMPARE_EDIT_INTERVAL_SECONDS:
+                    continue
+                last_edit = loop_time
+                await message.edit_text(
+                    formatters.format_compare_report(stats_type, n_value, assets, results), parse_mode=None
+                )
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    def _parse_subscription(args: list):
+        """Parses 'ASSET daily|weekly N [HH:MM]' into (asset, kind, n_value, delivery_time)."""
+        assets = {symbol.upper(): symbol for symbol in ASSET_EXCHANGE_MAP}
+        asset = assets[args[0].upper()]
+        kind = args[1].lower()
+        n_value = int(args[2])
+        if kind not in ('daily', 'weekly') or n_value <= 0: raise ValueError("invalid arguments")
+        delivery_time = args[3] if len(args) > 3 else SUBSCRIPTION_DEFAULT_TIME
+        hour, minute = map(int, delivery_time.split(":"))
+        if not (0 <= hour < 24 and 0 <= minute < 60): raise ValueError("invalid time")
+        return asset, kind, n_value, f"{hour:02d}:{minute:02d}"
+
+    async def subscribe(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """
+        /subscribe ASSET daily|weekly N [HH:MM]: delivers the report on a schedule.
+
+        Daily reports arrive every day, weekly reports every Monday, at HH:MM
+        in SUBSCRIPTION_TIMEZONE. Subscribing again changes the time.
+        """
+        if self.subscriptions is None:
+            await update.message.reply_text("訂閱功能未啟用。")
+            return
+        try:
+            asset, kind, n_value, delivery_time = self._parse_subscription(context.args or [])
+        except (IndexError, KeyError, ValueError):
+            await update.message.reply_text(
+                "用法：/subscribe 資產 daily|weekly N [HH:MM]\n"
+                f"例如：/subscribe NQ1! daily 30 08:00\n可用資產：{'、'.join(ASSET_EXCHANGE_MAP)}"
+            )
+            return
+        chat_id = update.effective_chat.id
+        existing = await self.subscriptions.for_chat(chat_id)
+        is_new = all((s.asset, s.kind, s.n_value) != (asset, kind, n_value) for s in existing)
+        if is_new and len(existing) >= SUBSCRIPTION_MAX_PER_CHAT:
+            await update.message.reply_text(f"每個聊天最多可訂閱 {SUBSCRIPTION_MAX_PER_CHAT} 項，請先使用 /unsubscribe 取消部分訂閱。")
+            return
+        await self.subscriptions.add(chat_id, asset, kind, n_value, delivery_time)
+        when = "每天" if kind == 'daily' else "每週一"
+        unit = "天" if kind == 'daily' else "個完整週"
+        await update.message.reply_text(
+            f"已訂閱！{when} {delivery_time}（{SUBSCRIPTION_TIMEZONE.key}）將發送 {asset} 最近 {n_value} {unit}的統計報告。"
+        )
+
+    async def unsubscribe(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """/unsubscribe ASSET daily|weekly N, or /unsubscribe all."""
+        if self.subscriptions is None:
+            await update.message.reply_text("訂閱功能未啟用。")
+            return
+        args = context.args or []
+        chat_id = update.effective_chat.id
+        if args and args[0].lower() == 'all':
+            removed = await self.subscriptions.remove(chat_id)
+        else:
+            try:
+                asset, kind, n_value, _ = self._parse_subscription(args[:3])
+            except (IndexError, KeyError, ValueError):
+                await update.message.reply_text("用法：/unsubscribe 資產 daily|weekly N，或 /unsubscribe all")
+                return
+            removed = await self.subscriptions.remove(chat_id, asset, kind, n_value)
+        await update.message.reply_text(f"已取消 {removed} 項訂閱。" if removed else "找不到符合的訂閱。")
+
+    async def list_subscriptions(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """/subscriptions: lists this chat's subscriptions."""
+        if self.subscriptions is None:
+            await update.message.reply_text("訂閱功能未啟用。")
+            return
+        subscriptions = await self.subscriptions.for_chat(update.effective_chat.id)
+        await update.message.reply_text(
+            formatters.format_subscription_list(subscriptions, SUBSCRIPTION_TIMEZONE.key), parse_mode=None
+        )
+
+    async def build_subscription_report(self, asset_symbol: str, stats_type: str, n_value: int) -> str | None:
+        """
+        Renders a subscribed report for the SubscriptionScheduler.
+
+        Fetches at background priority so deliveries queue behind interactive
+        requests. Returns None when no report can be produced, so the
+        subscription stays due and is retried on the next check.
+        """
+        if self.data_provider is None:
+            return None
+        try:
+            report = await self._build_report(stats_type, asset_symbol, ASSET_EXCHANGE_MAP[asset_symbol], n_value,
+                                              priority=BACKGROUND)
+        except (ReportUnavailable, asyncio.TimeoutError) as e:
+            logger.warning(f"Subscribed {stats_type} report for {asset_symbol} (N={n_value}) unavailable: {e!r}")
+            return None
+        return formatters.format_subscription_delivery(report)
+
+    @staticmethod
+    def _bars_needed(stats_type: str, n_value: int) -> int:
+        """Hourly bars covering N days or N complete weeks."""
+        return n_value * 24 + 5 if stats_type == 'daily' else (n_value + 2) * 7 * 24
+
+    async def _fetch_bars(self, stats_type: str, asset_symbol: str, exchange: str, n_value: int,
+                          priority: int = INTERACTIVE):
+        """
+        Fetches enough hourly bars to cover N days or N complete weeks.
+
+        At most one upstream request's worth is fetched; longer periods are
+        completed from the cache by _compute_stats.
+        """
+        # Heavy modules (pandas, tvDatafeed) are imported on first use to keep startup fast.
+        from tvDatafeed import Interval
+        from services.data_provider import MAX_BARS_PER_REQUEST
+
+        n_bars = min(self._bars_needed(stats_type, n_value), MAX_BARS_PER_REQUEST)
+        return await self.executor.run_io(
+            self.data_provider.get_historical_data, asset_symbol, exchange, Interval.in_1_hour, n_bars=n_bars,
+            priority=priority,
+        )
+
+    async def _compute_stats(self, stats_type: str, asset_symbol: str, exchange: str, n_value: int, raw_data, now: datetime,
+                             on_progress=None):
+        """
+        Computes the daily or weekly statistics for fetched bars.
+
+        Periods longer than one upstream request are read from the cache in
+        chunks, reporting progress through on_progress(fraction).
+
+        Returns:
+            (high_counts, low_counts, sessions_processed), or None if the data is insufficient.
+        """
+        from tvDatafeed import Interval
+        from services.data_provider import MAX_BARS_PER_REQUEST
+        import services.statistics as stats
+
+        cache = self.data_provider.cache
+        with STAGE_SECONDS.time(stage="stats_compute"):
+            result = None
+            if stats_type == 'weekly' and cache:
+                # The fetch refreshed the cache, whose weekly extremes answer this without the bars.
+                result = await self.executor.run_io(
+                    stats.calculate_weekly_stats_from_cache, cache,
+                    asset_symbol, exchange, Interval.in_1_hour.value, n_value, now
+                )
+            if result is None and cache and self._bars_needed(stats_type, n_value) > MAX_BARS_PER_REQUEST:
+                result = await self.executor.run_io(
+                    stats.calculate_stats_from_cache_chunks, cache, stats_type,
+                    asset_symbol, exchange, Interval.in_1_hour.value, n_value, now, BACKFILL_CHUNK_BARS, on_progress
+                )
+            if result is None and hasattr(cache, "get_bars") and raw_data is not None and not raw_data.empty:
+                # The in-process cache holds the fetched bars as arrays; compute on them in a
+                # thread rather than pickling a copy of the frame to the process pool.
+                result = await self.executor.run_io(
+                    stats.calculate_stats_from_bar_cache, cache, stats_type,
+                    asset_symbol, exchange, Interval.in_1_hour.value, len(raw_data), n_value, now
+                )
+            if result is None:
+                calculate = stats.calculate_daily_stats if stats_type == 'daily' else stats.calculate_weekly_stats
+                result = await self.executor.run_cpu(calculate, raw_data, n_value, now)
+            return result
+
+    async def _build_report(self, stats_type: str, asset_symbol: str, exchange: str, n_value: int,
+                            on_progress=None, priority: int = INTERACTIVE) -> str:
+        """
+        Fetches data, computes statistics and renders the report text.
+
+        Raises ReportUnavailable with the message for the user when the data
+        cannot be fetched or is insufficient.
+
+        Rendered reports are cached per (type, asset, N, last closed bar,
+        staleness), so identical requests skip statistics and formatting until
+        new bars arrive. The report ends with the data watermark.
+        """
+        from tvDatafeed import Interval
+        from services.data_provider import last_closed_bar
+
+        # One reference time per request keeps the statistics reproducible.
+        now = datetime.now(NEW_YORK_TIMEZONE)
+        raw_data = await self._fetch_bars(stats_type, asset_symbol, exchange, n_value, priority)
+        if raw_data is None:
+            raise ReportUnavailable(f"抱歉，無法為 {asset_symbol} 獲取或分析數據。")
+
+        freshness = self.data_provider.freshness(asset_symbol, exchange, Interval.in_1_hour, raw_data)
+        # The staleness shown in the report is part of its watermark.
+        watermark = (last_closed_bar(raw_data, Interval.in_1_hour), freshness["missing_bars"], freshness["refreshing"],
+                     freshness["degraded"])
+        cache_key = (stats_type, asset_symbol, n_value, watermark)
+        report = self.report_cache.get(cache_key)
+        if report is not None:
+            logger.info(f"Serving cached {stats_type} report for {asset_symbol} (N={n_value}).")
+            return report
+
+        result = await self._compute_stats(stats_type, asset_symbol, exchange, n_value, raw_data, now, on_progress)
+        if not result:
+            raise ReportUnavailable(f"抱歉，無法為 {asset_symbol} 獲取或分析數據。")
+        high_counts, low_counts, processed = result
+        if stats_type == 'weekly' and processed == 0:
+            raise ReportUnavailable(f"抱歉，在獲取的數據範圍內找不到足夠的完整週來進行統計。")
+        with STAGE_SECONDS.time(stage="format"):
+            if stats_type == 'daily':
+                report = formatters.format_daily_report(asset_symbol, processed, high_counts, low_counts, n_value)
             else:
-                await update.message.reply_text(f"抱歉，無法為 {asset_symbol} 獲取或分析數據。")
-        elif current_state == State.WEEKLY_STATS_ASSET_SELECTION:
-            await update.message.reply_text(f"收到！正在為 {asset_symbol} 獲取並分析最近 {n_value} 個完整週的數據，請稍候...")
-            raw_data = self.data_provider.get_historical_data(asset_symbol, exchange, Interval.in_1_hour, n_bars=(n_value + 2) * 7 * 24)
-            result = stats.calculate_weekly_stats(raw_data, n_value) if raw_data is not None else None
-            if result:
-                high_counts, low_counts, weeks_processed = result
-                if weeks_processed > 0:
-                    report = formatters.format_weekly_report(asset_symbol, weeks_processed, high_counts, low_counts)
-                    # 【修正】使用 parse_mode=None 來發送純文字報告
-                    await update.message.reply_text(report, parse_mode=None)
-                else:
-                    await update.message.reply_text(f"抱歉，在獲取的數據範圍內找不到足夠的完整週來進行統計。")
-            else:
-                await update.message.reply_text(f"抱歉，無法為 {asset_symbol} 獲取或分析數據。")
-        self.state_manager.clear_state(user_id)
\ No newline at end of file
+                report = formatters.format_weekly_report(asset_symbol, processed, high_counts, low_counts, n_value)
+            latest_bar = freshness["latest_bar"]
+            report += formatters.format_freshness(
+                latest_bar.to_pydatetime() if latest_bar is not None else None,
+                freshness["missing_bars"], freshness["refreshing"], freshness["degraded"],
+            )
+
+        self.report_cache.put(cache_key, report)
+        return report
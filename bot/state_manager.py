@@ -1,46 +1,183 @@
 # your_bot_project/bot/state_manager.py
 
+import json
 import logging
+import threading
+import time
+from collections import OrderedDict
 from config import State
 
 logger = logging.getLogger(__name__)
 
+CREATE_SESSIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS user_sessions (
+    user_id   INTEGER PRIMARY KEY,
+    state     INTEGER NOT NULL,
+    data      TEXT NOT NULL,
+    last_seen REAL NOT NULL
+)
+"""
+UPSERT_SESSION_QUERY = (
+    "INSERT INTO user_sessions (user_id, state, data, last_seen) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT(user_id) DO UPDATE SET state = excluded.state, data = excluded.data, last_seen = excluded.last_seen"
+)
+
+
+class _UserSession:
+    """Conversation state of one user."""
+    __slots__ = ("state", "data", "last_seen")
+
+    def __init__(self, state: int = State.START, data: dict | None = None, last_seen: float | None = None):
+        self.state = state
+        self.data = data if data is not None else {}
+        self.last_seen = time.time() if last_seen is None else last_seen
+
+
 class StateManager:
     """
     Manages the conversation state and temporary data for each user.
     This replaces the need for a global user_data dictionary.
+
+    Sessions idle for longer than `idle_ttl_seconds` expire, and at most
+    `max_sessions` are kept, evicting the least recently used. With a
+    `db_path`, sessions are also written to SQLite in the background and
+    reloaded on startup, so users in the middle of a flow survive restarts.
+
+    Webhook workers share one database; with `shard=(index, count)` a worker
+    only restores and prunes the users with user_id % count == index.
     """
-    def __init__(self):
-        self._user_states = {}
+    def __init__(self, max_sessions: int = 10000, idle_ttl_seconds: float = 3600.0, db_path: str | None = None,
+                 shard: tuple[int, int] | None = None):
+        self.max_sessions = max_sessions
+        self.shard = shard
+        self.idle_ttl_seconds = idle_ttl_seconds
+        # Ordered from least to most recently used.
+        self._user_states = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"expired": 0, "evicted": 0}
+        self._store = None
+        if db_path:
+            from services.sqlite_store import SQLiteStore
+            self._store = SQLiteStore(db_path, read_connections=1, mmap_size=0, cache_size_kb=2048)
+            self._store.write(lambda conn: conn.execute(CREATE_SESSIONS_TABLE))
+            self._load()
+
+    # --- Persistence ---
+
+    def _load(self):
+        cutoff = time.time() - self.idle_ttl_seconds
+        index, count = self.shard or (0, 1)
+        rows = self._store.read(lambda conn: conn.execute(
+            "SELECT user_id, state, data, last_seen FROM user_sessions WHERE last_seen >= ? AND user_id % ? = ? "
+            "ORDER BY last_seen DESC LIMIT ?", (cutoff, count, index, self.max_sessions)
+        ).fetchall())
+        for user_id, state, data, last_seen in reversed(rows):
+            self._user_states[user_id] = _UserSession(state, json.loads(data), last_seen)
+        # Expired and over-cap rows were not loaded; drop them from disk too.
+        self._submit(lambda conn: conn.execute(
+            "DELETE FROM user_sessions WHERE user_id % ? = ? AND user_id NOT IN ("
+            "SELECT user_id FROM user_sessions WHERE last_seen >= ? AND user_id % ? = ? ORDER BY last_seen DESC LIMIT ?)",
+            (count, index, cutoff, count, index, self.max_sessions)
+        ))
+        logger.info(f"Restored {len(rows)} user sessions from '{self._store.db_path}'.")
+
+    def _persist(self, user_id: int, session: _UserSession):
+        if self._store is not None:
+            row = (user_id, session.state, json.dumps(session.data), session.last_seen)
+            self._submit(lambda conn: conn.execute(UPSERT_SESSION_QUERY, row))
 
-    def _ensure_user_exists(self, user_id: int):
-        """Initializes a data structure for a user if they don't exist yet."""
-        if user_id not in self._user_states:
-            self._user_states[user_id] = {'state': State.START, 'data': {}}
+    def _persist_delete(self, user_ids: list):
+        if self._store is not None and user_ids:
+            rows = [(u,) for u in user_ids]
+            self._submit(lambda conn: conn.executemany("DELETE FROM user_sessions WHERE user_id = ?", rows))
+
+    def _submit(self, func):
+        # Fire and forget: handlers never wait on disk, failures are only logged.
+        future = self._store.submit_write(func)
+        future.add_done_callback(
+            lambda f: f.exception() and logger.error(f"Could not persist user sessions: {f.exception()}")
+        )
+
+    # --- Expiry and eviction ---
+
+    def _prune(self, now: float):
+        """Drops expired sessions from the LRU end and evicts past max_sessions. Caller holds the lock."""
+        removed = []
+        cutoff = now - self.idle_ttl_seconds
+        while self._user_states:
+            user_id, session = next(iter(self._user_states.items()))
+            if session.last_seen >= cutoff:
+                break
+            self._user_states.popitem(last=False)
+            removed.append(user_id)
+            self.stats["expired"] += 1
+        while len(self._user_states) > self.max_sessions:
+            user_id, _ = self._user_states.popitem(last=False)
+            removed.append(user_id)
+            self.stats["evicted"] += 1
+        self._persist_delete(removed)
+
+    def _get_session(self, user_id: int, create: bool):
+        """Returns the live session (marking it used), creating one if asked. Caller holds the lock."""
+        now = time.time()
+        session = self._user_states.get(user_id)
+        if session is not None and now - session.last_seen > self.idle_ttl_seconds:
+            del self._user_states[user_id]
+            self._persist_delete([user_id])
+            self.stats["expired"] += 1
+            session = None
+        if session is None:
+            if not create:
+                return None
+            session = self._user_states[user_id] = _UserSession(last_seen=now)
             logger.info(f"New user state initialized for user_id: {user_id}")
+            self._prune(now)
+        else:
+            session.last_seen = now
+            self._user_states.move_to_end(user_id)
+        return session
+
+    # --- Public API ---
 
     def set_state(self, user_id: int, state: int):
         """Sets the conversation state for a user."""
-        self._ensure_user_exists(user_id)
-        self._user_states[user_id]['state'] = state
+        with self._lock:
+            session = self._get_session(user_id, create=True)
+            session.state = state
+            self._persist(user_id, session)
         logger.debug(f"State for user {user_id} set to {state}")
 
     def get_state(self, user_id: int) -> int:
         """Gets the current conversation state for a user."""
-        return self._user_states.get(user_id, {}).get('state', State.START)
+        with self._lock:
+            session = self._get_session(user_id, create=False)
+            return session.state if session is not None else State.START
 
     def set_data(self, user_id: int, key: str, value):
         """Stores a piece of data for the user's session."""
-        self._ensure_user_exists(user_id)
-        self._user_states[user_id]['data'][key] = value
+        with self._lock:
+            session = self._get_session(user_id, create=True)
+            session.data[key] = value
+            self._persist(user_id, session)
         logger.debug(f"Data for user {user_id} updated: {{'{key}': {value}}}")
 
     def get_data(self, user_id: int) -> dict:
         """Gets all stored data for the user's session."""
-        return self._user_states.get(user_id, {}).get('data', {})
+        with self._lock:
+            session = self._get_session(user_id, create=False)
+            return session.data if session is not None else {}
 
     def clear_state(self, user_id: int):
         """Clears all state and data for a user after a conversation ends."""
-        if user_id in self._user_states:
-            del self._user_states[user_id]
-            logger.info(f"State for user {user_id} cleared.")
\ No newline at end of file
+        with self._lock:
+            if self._user_states.pop(user_id, None) is not None:
+                self._persist_delete([user_id])
+                logger.info(f"State for user {user_id} cleared.")
+
+    def __len__(self) -> int:
+        return len(self._user_states)
+
+    def close(self):
+        """Flushes pending session writes and closes the session database."""
+        if self._store is not None:
+            self._store.close()
@@ -0,0 +1,243 @@
+# your_bot_project/bot/webhook.py
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telegram import Update
+
+from services.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_UPDATES = REGISTRY.counter(
+    "bot_webhook_updates_total", "Webhook updates by worker and outcome.", ("worker", "outcome")
+)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def shard_for(update: dict, workers: int) -> int:
+    """
+    Picks the worker for an update: by the sending user's id, so one user's
+    conversation state always lives in the same process; else by chat id;
+    else by update_id.
+    """
+    for value in update.values():
+        if isinstance(value, dict):
+            user = value.get("from") or value.get("user")
+            if isinstance(user, dict) and isinstance(user.get("id"), int):
+                return user["id"] % workers
+    for value in update.values():
+        if isinstance(value, dict) and isinstance(value.get("chat"), dict):
+            return value["chat"].get("id", 0) % workers
+    return update.get("update_id", 0) % workers
+
+
+class _ReceiverServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Telegram opens up to max_connections (40 by default) at once; the default backlog of 5 resets them.
+    request_queue_size = 128
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    # Telegram keeps connections open between updates.
+    protocol_version = "HTTP/1.1"
+    dispatcher = None
+
+    def _reply(self, status: int, body: bytes = b"", content_type: str = "text/plain"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        dispatcher = self.dispatcher
+        if self.path.split("?", 1)[0] != dispatcher.path:
+            self._reply(404)
+            return
+        if dispatcher.secret_token and self.headers.get(SECRET_HEADER) != dispatcher.secret_token:
+            self._reply(403)
+            return
+        payload = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            worker = shard_for(json.loads(payload), len(dispatcher.queues))
+        except (ValueError, AttributeError, TypeError):
+            self._reply(400)
+            return
+        if dispatcher.submit(worker, payload):
+            self._reply(200)
+        else:
+            # Telegram redelivers updates that were not answered with 2xx.
+            self._reply(503)
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            self._reply(200, REGISTRY.render().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+            return
+        if path != "/healthz":
+            self._reply(404)
+            return
+        status = self.dispatcher.status()
+        body = json.dumps(status).encode("utf-8")
+        self._reply(200 if status["ready"] else 503, body, "application/json")
+
+    def log_message(self, format, *args):
+        # One line per update would flood the bot log.
+        pass
+
+
+def _worker_main(app_factory, index: int, count: int, updates, ready):
+    """Entry point of a worker process: builds its Application and feeds it updates from the queue."""
+    # Shutdown is coordinated by the dispatcher through the queue, not by Ctrl+C reaching every process.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    application = app_factory(index, count)
+    asyncio.run(_serve_worker(application, index, updates, ready))
+
+
+async def _serve_worker(application, index: int, updates, ready):
+    loop = asyncio.get_running_loop()
+    await application.initialize()
+    # post_init/post_shutdown are normally run by run_polling(); call them the same way here.
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+    ready.set()
+    logger.info(f"Webhook worker {index} ready.")
+    try:
+        while True:
+            payload = await loop.run_in_executor(None, updates.get)
+            if payload is None:
+                break
+            try:
+                update = Update.de_json(json.loads(payload), application.bot)
+            except Exception as e:
+                logger.warning(f"Worker {index} dropped an undecodable update: {e}")
+                continue
+            await application.update_queue.put(update)
+    finally:
+        await application.stop()
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+        logger.info(f"Webhook worker {index} stopped.")
+
+
+class WebhookDispatcher:
+    """
+    Receives Telegram webhook POSTs and hands them to worker processes.
+
+    Each worker runs its own Application built by `app_factory(index, count)`
+    (a picklable top-level function) and processes updates from its own
+    queue. Updates are sharded by user id, so a user's conversation state
+    and per-user limits stay in one process. The receiver only parses the
+    update far enough to pick the worker and answers at once; a full worker
+    queue is answered with 503 so Telegram retries later.
+    """
+    def __init__(self, app_factory, workers: int = 4, host: str = "127.0.0.1", port: int = 8443,
+                 path: str = "/telegram", secret_token: str | None = None, queue_size: int = 1000):
+        self.app_factory = app_factory
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self.queue_size = queue_size
+        # Spawned workers start from a clean interpreter rather than a fork of this one's threads.
+        self._context = multiprocessing.get_context("spawn")
+        self.queues = []
+        self._ready = []
+        self._processes = []
+        self._server = None
+        self.stats = {"accepted": 0, "rejected": 0}
+        self._stats_lock = threading.Lock()
+
+    def start(self):
+        """Starts the worker processes and the HTTP receiver on a daemon thread."""
+        for index in range(self.workers):
+            updates = self._context.Queue(self.queue_size)
+            ready = self._context.Event()
+            process = self._context.Process(
+                target=_worker_main, args=(self.app_factory, index, self.workers, updates, ready),
+                # Not daemonic: workers run their own process pools for the statistics.
+                name=f"webhook-worker-{index}",
+            )
+            process.start()
+            self.queues.append(updates)
+            self._ready.append(ready)
+            self._processes.append(process)
+        handler = type("WebhookHandler", (_WebhookHandler,), {"dispatcher": self})
+        self._server = _ReceiverServer((self.host, self.port), handler)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="webhook-http", daemon=True).start()
+        logger.info(f"Webhook receiver listening on http://{self.host}:{self.port}{self.path} "
+                    f"with {self.workers} workers.")
+
+    def wait_until_ready(self, timeout: float | None = None) -> bool:
+        """Blocks until every worker has started its Application."""
+        return all(ready.wait(timeout) for ready in self._ready)
+
+    def submit(self, worker: int, payload: bytes) -> bool:
+        try:
+            self.queues[worker].put_nowait(payload)
+        except queue.Full:
+            outcome = "rejected"
+        else:
+            outcome = "accepted"
+        WEBHOOK_UPDATES.inc(worker=str(worker), outcome=outcome)
+        with self._stats_lock:
+            self.stats[outcome] += 1
+        return outcome == "accepted"
+
+    def status(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        workers = [{"alive": p.is_alive(), "ready": r.is_set()} for p, r in zip(self._processes, self._ready)]
+        return {"ready": all(w["alive"] and w["ready"] for w in workers), "workers": workers, **stats}
+
+    def stop(self, timeout: float = 30.0):
+        """Stops accepting updates, lets the workers finish their queues and waits for them."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for updates in self.queues:
+            updates.put(None)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                logger.warning(f"{process.name} did not stop in {timeout}s; terminating it.")
+                process.terminate()
+        logger.info("Webhook dispatcher stopped.")
+
+
+async def set_webhook(token: str, url: str, secret_token: str | None, base_url: str):
+    """Registers the public webhook URL with Telegram."""
+    from telegram import Bot
+    async with Bot(token, base_url=base_url) as bot:
+        await bot.set_webhook(url, secret_token=secret_token, allowed_updates=Update.ALL_TYPES)
+    logger.info(f"Webhook registered at {url}.")
+
+
+def run_webhook(app_factory, token: str, webhook_url: str | None = None, base_url: str = "https://api.telegram.org/bot",
+                **dispatcher_options):
+    """Runs a WebhookDispatcher until SIGINT or SIGTERM."""
+    if webhook_url:
+        asyncio.run(set_webhook(token, webhook_url, dispatcher_options.get("secret_token"), base_url))
+    dispatcher = WebhookDispatcher(app_factory, **dispatcher_options)
+    stopping = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopping.set())
+    dispatcher.start()
+    try:
+        # Wake up regularly so the signal handlers get to run.
+        while not stopping.wait(1.0):
+            pass
+    finally:
+        dispatcher.stop()
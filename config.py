@@ -51,11 +51,160 @@ ASSET_EXCHANGE_MAP = {
     "BTCUSDT": "BINANCE"
 }
 
+# --- Trading Session Profiles ---
+# Used by the background refresher to skip assets whose market is closed.
+# See services/market_hours.py for the session definitions.
+ASSET_SESSION_MAP = {
+    "NQ1!": "cme_futures",
+    "ES1!": "cme_futures",
+    "YM1!": "cme_futures",
+    "XAUUSD": "fx",
+    "HK50": "fx",  # Pepperstone CFD, quoted on the broker's Sunday-Friday week
+    "BTCUSDT": "crypto"
+}
+
 # --- File Paths Configuration ---
 # Central place to define directories and file paths
 DATA_DIR = "data"
 DATABASE_PATH = os.path.join(DATA_DIR, "bot_data.db") # Example if you use a single DB
 
+# --- User Session Configuration ---
+# Conversation state is kept per user in an LRU capped at STATE_MAX_SESSIONS entries;
+# idle sessions expire. Set STATE_PERSISTENCE=1 to keep the sessions in SQLite across restarts.
+STATE_MAX_SESSIONS = int(os.environ.get("STATE_MAX_SESSIONS", 10000))
+STATE_IDLE_TTL_SECONDS = float(os.environ.get("STATE_IDLE_TTL_SECONDS", 3600))
+STATE_PERSISTENCE = os.environ.get("STATE_PERSISTENCE", "0") == "1"
+STATE_DB_PATH = os.path.join(DATA_DIR, "user_sessions.db")
+
+# --- Execution Configuration ---
+# Thread pool for blocking I/O (TradingView fetches, SQLite), process pool for statistics.
+IO_WORKERS = int(os.environ.get("IO_WORKERS", 8))
+CPU_WORKERS = int(os.environ.get("CPU_WORKERS", 2))
+FETCH_TIMEOUT_SECONDS = float(os.environ.get("FETCH_TIMEOUT_SECONDS", 60))
+STATS_TIMEOUT_SECONDS = float(os.environ.get("STATS_TIMEOUT_SECONDS", 30))
+
+# --- TradingView Session Pool Configuration ---
+# Each session serves one upstream fetch at a time, so the pool size caps upstream parallelism.
+# Authenticated sessions fall back to guest sessions when no credentials are set.
+TV_AUTH_SESSIONS = int(os.environ.get("TV_AUTH_SESSIONS", 2))
+TV_GUEST_SESSIONS = int(os.environ.get("TV_GUEST_SESSIONS", 0))
+TV_SESSION_MAX_FAILURES = int(os.environ.get("TV_SESSION_MAX_FAILURES", 3))
+# Idle sessions are probed this often by the background refresher.
+TV_SESSION_HEALTH_CHECK_SECONDS = float(os.environ.get("TV_SESSION_HEALTH_CHECK_SECONDS", 600))
+# Token bucket in front of every upstream call; interactive requests are queued ahead of background ones.
+UPSTREAM_RATE_PER_SECOND = float(os.environ.get("UPSTREAM_RATE_PER_SECOND", 2.0))
+UPSTREAM_BURST = float(os.environ.get("UPSTREAM_BURST", 5))
+# Reports a single user may have in progress at once.
+USER_MAX_CONCURRENT_REQUESTS = int(os.environ.get("USER_MAX_CONCURRENT_REQUESTS", 2))
+
+# --- Upstream Resilience Configuration ---
+# Each get_hist call is abandoned after UPSTREAM_CALL_TIMEOUT_SECONDS and retried with jittered
+# exponential backoff; no attempt starts UPSTREAM_DEADLINE_SECONDS after the first (keep it
+# below FETCH_TIMEOUT_SECONDS so the cached fallback arrives in time).
+UPSTREAM_CALL_TIMEOUT_SECONDS = float(os.environ.get("UPSTREAM_CALL_TIMEOUT_SECONDS", 15))
+UPSTREAM_MAX_ATTEMPTS = int(os.environ.get("UPSTREAM_MAX_ATTEMPTS", 3))
+UPSTREAM_BACKOFF_BASE_SECONDS = float(os.environ.get("UPSTREAM_BACKOFF_BASE_SECONDS", 0.5))
+UPSTREAM_BACKOFF_MAX_SECONDS = float(os.environ.get("UPSTREAM_BACKOFF_MAX_SECONDS", 4.0))
+UPSTREAM_DEADLINE_SECONDS = float(os.environ.get("UPSTREAM_DEADLINE_SECONDS", 30))
+# After this many consecutive failures on one exchange, its calls fail fast for CIRCUIT_RESET_SECONDS.
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", 5))
+CIRCUIT_RESET_SECONDS = float(os.environ.get("CIRCUIT_RESET_SECONDS", 30))
+
+# --- Offline Replay Configuration ---
+# When set, sessions serve bars from local CSV files (services/replay_feed.py) instead of TradingView.
+TV_REPLAY_DIR = os.environ.get("TV_REPLAY_DIR", "")
+TV_REPLAY_LATENCY_SECONDS = float(os.environ.get("TV_REPLAY_LATENCY_SECONDS", 0.0))
+TV_REPLAY_FAILURE_RATE = float(os.environ.get("TV_REPLAY_FAILURE_RATE", 0.0))
+
+# --- Cache Storage Configuration ---
+# CACHE_BACKEND selects "sqlite" (services/data_cache.py) or "columnar" (services/columnar_cache.py).
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "sqlite").lower()
+COLUMNAR_CACHE_DIR = os.environ.get("COLUMNAR_CACHE_DIR", os.path.join(DATA_DIR, "columnar"))
+# SQLite runs in WAL mode with a small pool of read-only connections and one writer thread.
+CACHE_READ_CONNECTIONS = int(os.environ.get("CACHE_READ_CONNECTIONS", 4))
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE_KB = int(os.environ.get("SQLITE_CACHE_SIZE_KB", 64 * 1024))
+
+# --- L1 Bar Cache Configuration ---
+# Each process keeps the newest L1_CACHE_WINDOW_BARS of recently used series in memory
+# in front of the on-disk cache, evicting least recently used series beyond the budget.
+L1_CACHE_ENABLED = os.environ.get("L1_CACHE_ENABLED", "1") == "1"
+L1_CACHE_BUDGET_MB = float(os.environ.get("L1_CACHE_BUDGET_MB", 64))
+L1_CACHE_WINDOW_BARS = int(os.environ.get("L1_CACHE_WINDOW_BARS", 5000))
+# With several webhook workers, a resident series picks up bars written by other workers at most this often.
+L1_CACHE_REVALIDATE_SECONDS = float(os.environ.get("L1_CACHE_REVALIDATE_SECONDS", 5))
+
+# --- Data Freshness Configuration ---
+# A cache hit missing at most this many closed bars (per the asset's trading session)
+# is answered immediately and refreshed in the background; staler hits are refreshed first.
+CACHE_MAX_STALE_BARS = int(os.environ.get("CACHE_MAX_STALE_BARS", 3))
+
+# --- Report Cache Configuration ---
+# Rendered reports are reused until new bars arrive or the TTL expires.
+REPORT_CACHE_SIZE = int(os.environ.get("REPORT_CACHE_SIZE", 256))
+REPORT_CACHE_TTL_SECONDS = float(os.environ.get("REPORT_CACHE_TTL_SECONDS", 300))
+
+# --- Compare Command Configuration ---
+# /compare edits its reply as assets finish, at most once per this many seconds.
+COMPARE_EDIT_INTERVAL_SECONDS = float(os.environ.get("COMPARE_EDIT_INTERVAL_SECONDS", 1.0))
+
+# --- Long History Configuration ---
+# Periods needing more bars than one TradingView request returns are computed
+# from the cache in chunks of this many bars, editing a progress message at most
+# once per BACKFILL_PROGRESS_INTERVAL_SECONDS.
+BACKFILL_CHUNK_BARS = int(os.environ.get("BACKFILL_CHUNK_BARS", 5000))
+BACKFILL_PROGRESS_INTERVAL_SECONDS = float(os.environ.get("BACKFILL_PROGRESS_INTERVAL_SECONDS", 2.0))
+
+# --- Background Prefetch Configuration ---
+# Keeps every asset in ASSET_EXCHANGE_MAP topped up so interactive requests hit a warm cache.
+PREFETCH_ENABLED = os.environ.get("PREFETCH_ENABLED", "1") == "1"
+PREFETCH_INTERVAL_SECONDS = float(os.environ.get("PREFETCH_INTERVAL_SECONDS", 300))
+PREFETCH_JITTER_SECONDS = float(os.environ.get("PREFETCH_JITTER_SECONDS", 30))
+PREFETCH_CONCURRENCY = int(os.environ.get("PREFETCH_CONCURRENCY", 2))
+PREFETCH_BARS = int(os.environ.get("PREFETCH_BARS", 2000))
+
+# --- Subscription Configuration ---
+# /subscribe delivers daily reports every day and weekly reports every Monday at HH:MM in
+# SUBSCRIPTION_TIMEZONE. Due subscriptions are checked every SUBSCRIPTION_CHECK_SECONDS and each
+# distinct (asset, type, N) is computed once, at most SUBSCRIPTION_COMPUTE_CONCURRENCY at a time.
+SUBSCRIPTIONS_ENABLED = os.environ.get("SUBSCRIPTIONS_ENABLED", "1") == "1"
+SUBSCRIPTION_DB_PATH = os.path.join(DATA_DIR, "subscriptions.db")
+SUBSCRIPTION_TIMEZONE = ZoneInfo(os.environ.get("SUBSCRIPTION_TIMEZONE", "Asia/Taipei"))
+SUBSCRIPTION_DEFAULT_TIME = os.environ.get("SUBSCRIPTION_DEFAULT_TIME", "08:00")
+SUBSCRIPTION_MAX_PER_CHAT = int(os.environ.get("SUBSCRIPTION_MAX_PER_CHAT", 10))
+SUBSCRIPTION_CHECK_SECONDS = float(os.environ.get("SUBSCRIPTION_CHECK_SECONDS", 30))
+SUBSCRIPTION_COMPUTE_CONCURRENCY = int(os.environ.get("SUBSCRIPTION_COMPUTE_CONCURRENCY", 2))
+# Telegram allows about 30 messages per second per bot and one per second per chat; broadcasts
+# stay below that to leave room for interactive replies.
+BROADCAST_RATE_PER_SECOND = float(os.environ.get("BROADCAST_RATE_PER_SECOND", 20))
+BROADCAST_PER_CHAT_INTERVAL_SECONDS = float(os.environ.get("BROADCAST_PER_CHAT_INTERVAL_SECONDS", 1.0))
+BROADCAST_BATCH_SIZE = int(os.environ.get("BROADCAST_BATCH_SIZE", 25))
+BROADCAST_MAX_RETRIES = int(os.environ.get("BROADCAST_MAX_RETRIES", 3))
+
+# --- Webhook Deployment Configuration ---
+# BOT_MODE "polling" runs one process with run_polling(). "webhook" starts a local HTTP receiver on
+# WEBHOOK_LISTEN_HOST:WEBHOOK_LISTEN_PORT that hands updates to WEBHOOK_WORKERS processes, sharded
+# by user id; the workers share the on-disk caches and split the upstream rate and sessions.
+# WEBHOOK_URL is the public HTTPS URL Telegram posts to (e.g. a reverse proxy in front of the
+# receiver); when empty, setWebhook is left to the deployment.
+BOT_MODE = os.environ.get("BOT_MODE", "polling").lower()
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "")
+WEBHOOK_LISTEN_HOST = os.environ.get("WEBHOOK_LISTEN_HOST", "127.0.0.1")
+WEBHOOK_LISTEN_PORT = int(os.environ.get("WEBHOOK_LISTEN_PORT", 8443))
+WEBHOOK_PATH = os.environ.get("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET_TOKEN = get_secret("WEBHOOK_SECRET_TOKEN") if BOT_MODE == "webhook" else None
+WEBHOOK_WORKERS = int(os.environ.get("WEBHOOK_WORKERS", min(4, os.cpu_count() or 1)))
+# Updates queued per worker before the receiver answers 503 and Telegram retries later.
+WEBHOOK_QUEUE_SIZE = int(os.environ.get("WEBHOOK_QUEUE_SIZE", 1000))
+# Bot API endpoint; pointed at a fake server by benchmarks/webhook_test.py.
+TELEGRAM_API_BASE_URL = os.environ.get("TELEGRAM_API_BASE_URL", "https://api.telegram.org/bot")
+
+# --- Metrics Configuration ---
+# Prometheus text format at http://METRICS_HOST:METRICS_PORT/metrics; bound to localhost by default.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 9464))
+
 # --- Timezone Constant ---
 NEW_YORK_TIMEZONE = ZoneInfo('America/New_York')
 
@@ -1,5 +1,9 @@
 # your_bot_project/main.py (最終修正版)
 
+from services.startup_profile import startup_timer  # first, so startup timing includes all imports
+
+import asyncio
+import functools
 import os
 import logging
 import nest_asyncio
@@ -13,9 +17,31 @@ from telegram.ext import (
 )
 
 # Import configurations and components
-from config import TELEGRAM_BOT_TOKEN, TRADINGVIEW_USERNAME, TRADINGVIEW_PASSWORD, DATA_DIR
-from services.data_provider import TradingViewDataProvider
-from services.data_cache import DataCache
+from config import (
+    TELEGRAM_BOT_TOKEN, TRADINGVIEW_USERNAME, TRADINGVIEW_PASSWORD, DATA_DIR,
+    IO_WORKERS, CPU_WORKERS, FETCH_TIMEOUT_SECONDS, STATS_TIMEOUT_SECONDS,
+    CACHE_BACKEND, COLUMNAR_CACHE_DIR, CACHE_READ_CONNECTIONS, SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE_KB,
+    L1_CACHE_ENABLED, L1_CACHE_BUDGET_MB, L1_CACHE_WINDOW_BARS, L1_CACHE_REVALIDATE_SECONDS,
+    REPORT_CACHE_SIZE, REPORT_CACHE_TTL_SECONDS,
+    TV_AUTH_SESSIONS, TV_GUEST_SESSIONS, TV_SESSION_MAX_FAILURES, TV_SESSION_HEALTH_CHECK_SECONDS,
+    TV_REPLAY_DIR, TV_REPLAY_LATENCY_SECONDS, TV_REPLAY_FAILURE_RATE,
+    UPSTREAM_RATE_PER_SECOND, UPSTREAM_BURST, USER_MAX_CONCURRENT_REQUESTS, CACHE_MAX_STALE_BARS,
+    UPSTREAM_CALL_TIMEOUT_SECONDS, UPSTREAM_MAX_ATTEMPTS, UPSTREAM_BACKOFF_BASE_SECONDS,
+    UPSTREAM_BACKOFF_MAX_SECONDS, UPSTREAM_DEADLINE_SECONDS, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS,
+    ASSET_EXCHANGE_MAP, ASSET_SESSION_MAP, PREFETCH_ENABLED, PREFETCH_INTERVAL_SECONDS,
+    PREFETCH_JITTER_SECONDS, PREFETCH_CONCURRENCY, PREFETCH_BARS,
+    METRICS_ENABLED, METRICS_HOST, METRICS_PORT,
+    STATE_MAX_SESSIONS, STATE_IDLE_TTL_SECONDS, STATE_PERSISTENCE, STATE_DB_PATH,
+    SUBSCRIPTIONS_ENABLED, SUBSCRIPTION_DB_PATH, SUBSCRIPTION_TIMEZONE, SUBSCRIPTION_CHECK_SECONDS,
+    SUBSCRIPTION_COMPUTE_CONCURRENCY, BROADCAST_RATE_PER_SECOND, BROADCAST_PER_CHAT_INTERVAL_SECONDS,
+    BROADCAST_BATCH_SIZE, BROADCAST_MAX_RETRIES,
+    BOT_MODE, WEBHOOK_URL, WEBHOOK_LISTEN_HOST, WEBHOOK_LISTEN_PORT, WEBHOOK_PATH, WEBHOOK_SECRET_TOKEN,
+    WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE, TELEGRAM_API_BASE_URL,
+)
+# The data services (pandas, tvDatafeed, SQLite) are imported lazily in build_data_services()
+# so polling can start before they are loaded.
+from services.executor import TaskExecutor
+from services.report_cache import ReportCache
 from bot.state_manager import StateManager
 from bot.handlers import BotHandlers
 
@@ -33,42 +59,219 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def main() -> None:
+def _worker_share(total: float, worker_count: int, minimum: float = 1) -> float:
+    """A worker process's share of a global budget (sessions, upstream rate); zero stays zero."""
+    return max(minimum, total / worker_count) if total else 0
+
+
+def build_data_services(executor: TaskExecutor, worker_index: int = 0, worker_count: int = 1):
     """
-    The main function to initialize and run the Telegram bot.
+    Imports and constructs the cache, data provider and prefetcher.
+
+    Runs on a worker thread after polling has started. The TradingView login
+    itself continues in the background inside TradingViewDataProvider.
+
+    With several webhook workers, each gets its share of the TradingView
+    sessions and upstream rate, and only worker 0 runs the prefetcher; they
+    all share the on-disk cache, each with its own in-memory L1 in front.
     """
-    # --- Pre-run Checks ---
-    if not TELEGRAM_BOT_TOKEN:
-        logger.critical("FATAL: TELEGRAM_BOT_TOKEN is not configured. The bot cannot start.")
-        return
-    if not TRADINGVIEW_USERNAME or not TRADINGVIEW_PASSWORD:
-         logger.warning("WARNING: TradingView credentials are not fully set. Data fetching might fail.")
+    from services.data_provider import TradingViewDataProvider
+    from services.prefetch import PrefetchScheduler
+    from services.resilience import RetryPolicy
+    startup_timer.mark("data_modules_imported")
 
-    # --- Environment Setup ---
-    # Ensure the directory for databases or cache files exists.
-    # This prevents the "unable to open database file" error in new/ephemeral environments like Colab.
-    try:
-        os.makedirs(DATA_DIR, exist_ok=True)
-        logger.info(f"Ensured data directory exists at: ./{DATA_DIR}")
-    except OSError as e:
-        logger.critical(f"FATAL: Could not create data directory '{DATA_DIR}': {e}")
-        return
+    if CACHE_BACKEND == "columnar":
+        from services.columnar_cache import ColumnarCache
+        data_cache = ColumnarCache(COLUMNAR_CACHE_DIR)
+    else:
+        from services.data_cache import DataCache
+        data_cache = DataCache(
+            read_connections=CACHE_READ_CONNECTIONS,
+            mmap_size=SQLITE_MMAP_SIZE,
+            cache_size_kb=SQLITE_CACHE_SIZE_KB,
+        )
+    if L1_CACHE_ENABLED:
+        from services.bar_cache import BarCache
+        data_cache = BarCache(
+            data_cache, budget_bytes=int(L1_CACHE_BUDGET_MB * 2**20), window_bars=L1_CACHE_WINDOW_BARS,
+            # Alone, this process makes every write to the cache and its L1 sees them all.
+            revalidate_seconds=L1_CACHE_REVALIDATE_SECONDS if worker_count > 1 else 0.0,
+        )
+    startup_timer.mark("cache_opened")
+    provider_options = {}
+    if TV_REPLAY_DIR:
+        from services.replay_feed import ReplayDatafeed
+        logger.warning(f"Serving market data from replay files in {TV_REPLAY_DIR}, not TradingView.")
+        provider_options["datafeed_factory"] = functools.partial(
+            ReplayDatafeed, data_dir=TV_REPLAY_DIR,
+            latency_seconds=TV_REPLAY_LATENCY_SECONDS, failure_rate=TV_REPLAY_FAILURE_RATE,
+        )
+    data_provider = TradingViewDataProvider(
+        TRADINGVIEW_USERNAME, TRADINGVIEW_PASSWORD, cache=data_cache,
+        auth_sessions=int(_worker_share(TV_AUTH_SESSIONS, worker_count)),
+        guest_sessions=int(_worker_share(TV_GUEST_SESSIONS, worker_count)),
+        max_failures=TV_SESSION_MAX_FAILURES,
+        health_check_seconds=TV_SESSION_HEALTH_CHECK_SECONDS,
+        rate_per_second=_worker_share(UPSTREAM_RATE_PER_SECOND, worker_count, minimum=0.1),
+        burst=_worker_share(UPSTREAM_BURST, worker_count),
+        session_profiles=ASSET_SESSION_MAP,
+        max_stale_bars=CACHE_MAX_STALE_BARS,
+        retry_policy=RetryPolicy(
+            max_attempts=UPSTREAM_MAX_ATTEMPTS,
+            base_delay=UPSTREAM_BACKOFF_BASE_SECONDS,
+            max_delay=UPSTREAM_BACKOFF_MAX_SECONDS,
+            call_timeout=UPSTREAM_CALL_TIMEOUT_SECONDS,
+            deadline=UPSTREAM_DEADLINE_SECONDS,
+        ),
+        breaker_threshold=CIRCUIT_FAILURE_THRESHOLD,
+        breaker_reset_seconds=CIRCUIT_RESET_SECONDS,
+        **provider_options,
+    )
+    prefetcher = None
+    if PREFETCH_ENABLED and worker_index == 0:
+        prefetcher = PrefetchScheduler(
+            data_provider, executor, ASSET_EXCHANGE_MAP, ASSET_SESSION_MAP,
+            n_bars=PREFETCH_BARS,
+            period_seconds=PREFETCH_INTERVAL_SECONDS,
+            jitter_seconds=PREFETCH_JITTER_SECONDS,
+            max_concurrency=PREFETCH_CONCURRENCY,
+        )
+    return data_cache, data_provider, prefetcher
 
+
+def build_application(worker_index: int = 0, worker_count: int = 1, webhook: bool = False) -> Application:
+    """
+    Builds the Telegram application: core components, lifecycle hooks and handlers.
+
+    In webhook mode every worker process builds its own application without
+    an updater. Worker `i` serves metrics on METRICS_PORT + i, restores only
+    its shard of the user sessions, and only worker 0 runs the background
+    jobs (prefetch, subscription delivery).
+    """
     # --- Initialization of Core Components ---
+    # Only lightweight components are built here; the data services follow in on_startup.
+    startup_timer.mark("imports_done")
     logger.info("Initializing core components...")
-    state_manager = StateManager()
-    data_cache = DataCache()
-    data_provider = TradingViewDataProvider(TRADINGVIEW_USERNAME, TRADINGVIEW_PASSWORD, cache=data_cache)
-    bot_handlers = BotHandlers(state_manager, data_provider)
+    state_manager = StateManager(
+        max_sessions=STATE_MAX_SESSIONS,
+        idle_ttl_seconds=STATE_IDLE_TTL_SECONDS,
+        db_path=STATE_DB_PATH if STATE_PERSISTENCE else None,
+        shard=(worker_index, worker_count) if worker_count > 1 else None,
+    )
+    executor = TaskExecutor(
+        io_workers=IO_WORKERS,
+        cpu_workers=CPU_WORKERS,
+        io_timeout=FETCH_TIMEOUT_SECONDS,
+        cpu_timeout=STATS_TIMEOUT_SECONDS,
+    )
+    report_cache = ReportCache(max_entries=REPORT_CACHE_SIZE, ttl_seconds=REPORT_CACHE_TTL_SECONDS)
+    subscriptions = None
+    if SUBSCRIPTIONS_ENABLED:
+        from services.subscriptions import SubscriptionStore
+        subscriptions = SubscriptionStore(SUBSCRIPTION_DB_PATH)
+    bot_handlers = BotHandlers(state_manager, None, executor, report_cache,
+                               max_user_requests=USER_MAX_CONCURRENT_REQUESTS, subscriptions=subscriptions)
+    components = {}
     logger.info("Components initialized.")
 
+    def build_subscription_scheduler(bot):
+        from bot.broadcast import Broadcaster
+        from services.subscriptions import SubscriptionScheduler
+
+        async def send(chat_id, text):
+            await bot.send_message(chat_id, text, parse_mode=None)
+
+        broadcaster = Broadcaster(
+            send,
+            rate_per_second=BROADCAST_RATE_PER_SECOND,
+            per_chat_interval=BROADCAST_PER_CHAT_INTERVAL_SECONDS,
+            batch_size=BROADCAST_BATCH_SIZE,
+            max_retries=BROADCAST_MAX_RETRIES,
+        )
+        return SubscriptionScheduler(
+            subscriptions, bot_handlers.build_subscription_report, broadcaster, SUBSCRIPTION_TIMEZONE,
+            check_seconds=SUBSCRIPTION_CHECK_SECONDS,
+            max_concurrency=SUBSCRIPTION_COMPUTE_CONCURRENCY,
+        )
+
+    async def init_data_services(bot) -> None:
+        try:
+            data_cache, data_provider, prefetcher = await asyncio.get_running_loop().run_in_executor(
+                None, build_data_services, executor, worker_index, worker_count
+            )
+        except Exception as e:
+            logger.critical(f"FATAL: Could not initialize data services: {e}", exc_info=True)
+            return
+        # Every worker serves the subscription commands; only one delivers them.
+        subscription_scheduler = build_subscription_scheduler(bot) if subscriptions and worker_index == 0 else None
+        components.update(data_cache=data_cache, data_provider=data_provider, prefetcher=prefetcher,
+                          subscription_scheduler=subscription_scheduler)
+        bot_handlers.attach_services(data_provider, prefetcher, subscription_scheduler)
+        if prefetcher:
+            prefetcher.start()
+        if subscription_scheduler:
+            subscription_scheduler.start()
+        startup_timer.mark("data_services_ready")
+        logger.info("Data services ready.")
+
+    async def on_startup(application: Application) -> None:
+        # Don't await: polling starts right away while the data services load.
+        components["init_task"] = asyncio.create_task(init_data_services(application.bot))
+        if METRICS_ENABLED:
+            from services.metrics import start_http_server
+            # Each webhook worker has its own registry and port.
+            metrics_port = METRICS_PORT + worker_index
+            try:
+                components["metrics_server"] = start_http_server(METRICS_HOST, metrics_port)
+            except OSError as e:
+                logger.error(f"Could not start the metrics endpoint on {METRICS_HOST}:{metrics_port}: {e}")
+        startup_timer.mark("polling_started")
+
+    async def on_shutdown(application: Application) -> None:
+        init_task = components.get("init_task")
+        if init_task is not None:
+            await asyncio.gather(init_task, return_exceptions=True)
+        if components.get("prefetcher"):
+            await components["prefetcher"].stop()
+        if components.get("subscription_scheduler"):
+            await components["subscription_scheduler"].stop()
+        if components.get("metrics_server"):
+            components["metrics_server"].shutdown()
+        # Cancel queued fetch/stats work so polling can stop promptly.
+        executor.shutdown()
+        if components.get("data_provider"):
+            components["data_provider"].close()
+        if components.get("data_cache"):
+            components["data_cache"].close()
+        state_manager.close()
+        if subscriptions:
+            subscriptions.close()
+        logger.info(startup_timer.report())
+
     # --- Telegram Application Setup ---
     logger.info("Setting up Telegram application...")
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    # concurrent_updates lets one user's slow report run while other updates are handled.
+    builder = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .base_url(TELEGRAM_API_BASE_URL)
+        .concurrent_updates(True)
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+    )
+    if webhook:
+        # Updates arrive from the WebhookDispatcher instead of getUpdates.
+        builder = builder.updater(None)
+    application = builder.build()
 
     # --- Registering Handlers ---
     # Register all the handlers from the BotHandlers class
     application.add_handler(CommandHandler("start", bot_handlers.start))
+    application.add_handler(CommandHandler("status", bot_handlers.status))
+    application.add_handler(CommandHandler("compare", bot_handlers.compare))
+    application.add_handler(CommandHandler("subscribe", bot_handlers.subscribe))
+    application.add_handler(CommandHandler("unsubscribe", bot_handlers.unsubscribe))
+    application.add_handler(CommandHandler("subscriptions", bot_handlers.list_subscriptions))
     
     application.add_handler(CallbackQueryHandler(bot_handlers.start_daily_stats_callback, pattern='^start_daily_stats$'))
     application.add_handler(CallbackQueryHandler(bot_handlers.start_weekly_stats_callback, pattern='^start_weekly_stats$'))
@@ -83,12 +286,50 @@ def main() -> None:
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, bot_handlers.handle_message))
     
     logger.info("All handlers registered.")
+    return application
+
+
+def main() -> None:
+    """
+    The main function to initialize and run the Telegram bot.
+    """
+    # --- Pre-run Checks ---
+    if not TELEGRAM_BOT_TOKEN:
+        logger.critical("FATAL: TELEGRAM_BOT_TOKEN is not configured. The bot cannot start.")
+        return
+    if not TRADINGVIEW_USERNAME or not TRADINGVIEW_PASSWORD:
+         logger.warning("WARNING: TradingView credentials are not fully set. Data fetching might fail.")
+
+    # --- Environment Setup ---
+    # Ensure the directory for databases or cache files exists.
+    # This prevents the "unable to open database file" error in new/ephemeral environments like Colab.
+    try:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        logger.info(f"Ensured data directory exists at: ./{DATA_DIR}")
+    except OSError as e:
+        logger.critical(f"FATAL: Could not create data directory '{DATA_DIR}': {e}")
+        return
 
     # --- Start the Bot ---
-    logger.info("Starting bot polling...")
-    application.run_polling()
+    if BOT_MODE == "webhook":
+        from bot.webhook import run_webhook
+        logger.info(f"Starting webhook mode with {WEBHOOK_WORKERS} workers...")
+        run_webhook(
+            functools.partial(build_application, webhook=True),
+            TELEGRAM_BOT_TOKEN, WEBHOOK_URL or None, TELEGRAM_API_BASE_URL,
+            workers=WEBHOOK_WORKERS,
+            host=WEBHOOK_LISTEN_HOST,
+            port=WEBHOOK_LISTEN_PORT,
+            path=WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET_TOKEN,
+            queue_size=WEBHOOK_QUEUE_SIZE,
+        )
+    else:
+        application = build_application()
+        logger.info("Starting bot polling...")
+        application.run_polling()
     logger.info("Bot has stopped.")
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
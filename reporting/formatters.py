@@ -1,19 +1,33 @@
 # your_bot_project/reporting/formatters.py (依照您的舊版邏輯重製) TESING
 
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
 from config import NEW_YORK_TIMEZONE
 
 logger = logging.getLogger(__name__)
 
-def format_daily_report(asset_code: str, days_n: int, high_counts: list, low_counts: list) -> str:
-    """Generates a plain text report for daily stats, based on the original working code."""
+def _coverage_notice(processed: int, requested: int | None, unit: str) -> str:
+    """Warns when the data covered fewer days or weeks than the user asked for."""
+    if requested is None or processed >= requested:
+        return ""
+    return f"⚠️ 快取僅涵蓋 {processed}/{requested} {unit}，統計期間短於所要求的範圍。\n"
+
+
+def format_daily_report(asset_code: str, days_n: int, high_counts: list, low_counts: list,
+                        requested_n: int | None = None) -> str:
+    """
+    Generates a plain text report for daily stats, based on the original working code.
+
+    `requested_n` is the number of days asked for; if `days_n` falls short, the
+    report says so.
+    """
     logger.info(f"Formatting PLAIN TEXT daily report for {asset_code}.")
     
     report_parts = []
     report_parts.append(f"📊 日內高低點統計報告 📊\n\n")
     report_parts.append(f"資產: {asset_code}\n")
     report_parts.append(f"統計天數: {days_n}\n")
+    report_parts.append(_coverage_notice(days_n, requested_n, "天"))
     report_parts.append(f"數據時區: {NEW_YORK_TIMEZONE.tzname(datetime.now())} (美國/紐約)\n\n")
 
     total_high_points = sum(high_counts)
@@ -75,8 +89,14 @@ def format_daily_report(asset_code: str, days_n: int, high_counts: list, low_cou
     return "".join(report_parts)
 
 
-def format_weekly_report(asset_code: str, weeks_n: int, high_counts: list, low_counts: list) -> str:
-    """Generates a plain text report for weekly stats, based on the original working code."""
+def format_weekly_report(asset_code: str, weeks_n: int, high_counts: list, low_counts: list,
+                         requested_n: int | None = None) -> str:
+    """
+    Generates a plain text report for weekly stats, based on the original working code.
+
+    `requested_n` is the number of weeks asked for; if `weeks_n` falls short, the
+    report says so.
+    """
     logger.info(f"Formatting PLAIN TEXT weekly report for {asset_code}.")
     
     weekday_names = ["星期一", "星期二", "星期三", "星期四", "星期五", "星期六", "星期日"]
@@ -84,6 +104,7 @@ def format_weekly_report(asset_code: str, weeks_n: int, high_counts: list, low_c
     report_parts.append(f"📊 每週高低點統計報告 📊\n\n")
     report_parts.append(f"資產: {asset_code}\n")
     report_parts.append(f"統計週數: {weeks_n}\n")
+    report_parts.append(_coverage_notice(weeks_n, requested_n, "週"))
     report_parts.append(f"數據時區: {NEW_YORK_TIMEZONE.tzname(datetime.now())} (美國/紐約)\n\n")
 
     total_high_points = sum(high_counts)
@@ -142,4 +163,144 @@ def format_weekly_report(asset_code: str, weeks_n: int, high_counts: list, low_c
         max_low_weekdays = [weekday_names[h] for h, count in enumerate(low_counts) if count == max_low_count]
         report_parts.append(f"⬇️ 最常創立每週低點的時間是：{', '.join(max_low_weekdays)} (出現 {max_low_count} 次)\n")
 
-    return "".join(report_parts)
\ No newline at end of file
+    return "".join(report_parts)
+
+def _top_slots(counts: list, labels: list, top_n: int = 3) -> str:
+    """Returns the `top_n` most frequent slots as 'label (pct%)', most frequent first."""
+    total = sum(counts)
+    if total == 0:
+        return "無數據"
+    ranked = sorted((i for i, count in enumerate(counts) if count > 0), key=lambda i: counts[i], reverse=True)
+    return ", ".join(f"{labels[i]} ({counts[i] / total * 100:.0f}%)" for i in ranked[:top_n])
+
+
+def format_compare_report(stats_type: str, n_value: int, assets: list, results: dict) -> str:
+    """
+    Generates a plain text side-by-side summary of every asset.
+
+    Args:
+        stats_type (str): 'daily' or 'weekly'.
+        n_value (int): The requested number of days or weeks.
+        assets (list[str]): Assets in display order.
+        results (dict): asset -> (high_counts, low_counts, processed), or None if it failed.
+            Assets not in `results` are shown as still being computed.
+    """
+    if stats_type == 'daily':
+        title, unit = "📊 全資產日內高低點比較 📊\n\n", "天"
+        labels = [f"{hour:02d}:00" for hour in range(24)]
+    else:
+        title, unit = "📊 全資產每週高低點比較 📊\n\n", "週"
+        labels = ["星期一", "星期二", "星期三", "星期四", "星期五", "星期六", "星期日"]
+
+    report_parts = [title]
+    report_parts.append(f"統計{unit}數: {n_value}\n")
+    report_parts.append(f"數據時區: {NEW_YORK_TIMEZONE.tzname(datetime.now())} (美國/紐約)\n")
+    report_parts.append(f"進度: {len(results)}/{len(assets)}\n\n")
+
+    for asset in assets:
+        if asset not in results:
+            report_parts.append(f"{asset}: ⏳ 計算中...\n\n")
+            continue
+        result = results[asset]
+        if not result or result[2] == 0:
+            report_parts.append(f"{asset}: ⚠️ 無法獲取或分析數據\n\n")
+            continue
+        high_counts, low_counts, processed = result
+        report_parts.append(f"{asset} ({processed} {unit})\n")
+        report_parts.append(f"  📈 高點: {_top_slots(high_counts, labels)}\n")
+        report_parts.append(f"  📉 低點: {_top_slots(low_counts, labels)}\n\n")
+    return "".join(report_parts)
+
+
+def format_freshness(latest_bar, missing_bars: int, refreshing: bool = False, degraded: bool = False) -> str:
+    """
+    Generates the data watermark appended to a report.
+
+    `latest_bar` is the open time of the newest bar as a datetime or None; naive
+    datetimes are read as UTC, as everywhere else, whatever the host's time zone.
+    A degraded report was computed from the cache alone while upstream was failing.
+    """
+    if latest_bar is None:
+        return ""
+    if latest_bar.tzinfo is None:
+        latest_bar = latest_bar.replace(tzinfo=timezone.utc)
+    local = latest_bar.astimezone(NEW_YORK_TIMEZONE)
+    report_parts = [f"\n🕒 數據更新至: {local:%Y-%m-%d %H:%M} (美國/紐約)\n"]
+    if degraded:
+        report_parts.append("⚠️ 部分結果：TradingView 暫時無法連線，本報告僅依快取中現有的數據產生。\n")
+    elif missing_bars > 0:
+        note = "，已在背景更新，稍後再查詢可取得最新結果" if refreshing else ""
+        report_parts.append(f"⚠️ 數據可能落後約 {missing_bars} 根K線{note}。\n")
+    return "".join(report_parts)
+
+
+def format_prefetch_status(status: dict) -> str:
+    """Generates a plain text overview of the background cache refresher."""
+    report_parts = ["🔄 背景數據更新狀態 🔄\n\n"]
+    if not status:
+        report_parts.append("背景更新未啟用。\n")
+        return "".join(report_parts)
+
+    for symbol, s in status.items():
+        market = "開市" if s["market_open"] else "休市"
+        last_success = s["last_success"].strftime('%m-%d %H:%M') if s["last_success"] else "尚未成功"
+        report_parts.append(f"{symbol} ({market}): 最後更新 {last_success}，成功 {s['refreshes']} 次，失敗 {s['failures']} 次\n")
+        if s["last_error"]:
+            report_parts.append(f"  ⚠️ 最近錯誤: {s['last_error']}\n")
+    return "".join(report_parts)
+
+
+def format_session_pool_status(status: dict) -> str:
+    """Generates a one-line summary of the TradingView session pool."""
+    return (f"\n🔌 TradingView 連線: {status['live']}/{status['size']} 可用，閒置 {status['idle']}，"
+            f"已汰換 {status['retired']} 次\n")
+
+
+def format_upstream_queue_status(status: dict) -> str:
+    """Generates a short summary of the upstream rate limiter queue."""
+    report_parts = [f"🚦 上游佇列: 等待 {status['queue_depth']} (最高 {status['max_queue_depth']})，"
+                    f"進行中 {status['in_flight']}，可用額度 {status['tokens']}\n"]
+    labels = {"interactive": "使用者", "background": "背景"}
+    for priority, s in status["priorities"].items():
+        report_parts.append(f"  {labels.get(priority, priority)}: {s['granted']} 次，平均等待 {s['mean_wait_seconds']:.2f}s，"
+                            f"最長 {s['max_wait_seconds']:.2f}s，逾時 {s['timeouts']} 次\n")
+    return "".join(report_parts)
+
+
+def format_circuit_status(status: dict) -> str:
+    """Generates a one-line summary of the per-exchange upstream circuit breakers."""
+    if not status:
+        return ""
+    labels = {"closed": "正常", "half_open": "試探中", "open": "⛔ 暫停"}
+    parts = []
+    for exchange, s in status.items():
+        text = f"{exchange} {labels.get(s['state'], s['state'])}"
+        if s["state"] == "open":
+            text += f"（{s['retry_in_seconds']:.0f}s 後重試）"
+        parts.append(text)
+    return f"🔌 上游斷路器: {'，'.join(parts)}\n"
+
+
+def format_subscription_list(subscriptions: list, timezone_name: str) -> str:
+    """Generates the plain text list of a chat's report subscriptions."""
+    if not subscriptions:
+        return "您目前沒有任何訂閱。\n用法：/subscribe 資產 daily|weekly N [HH:MM]"
+    labels = {"daily": "日內統計（每天）", "weekly": "每週統計（每週一）"}
+    report_parts = [f"📬 您的訂閱（時間為 {timezone_name}）\n\n"]
+    for s in subscriptions:
+        unit = "天" if s.kind == 'daily' else "週"
+        report_parts.append(f"{s.asset} {labels.get(s.kind, s.kind)} N={s.n_value}{unit}，{s.delivery_time} 發送\n")
+    return "".join(report_parts)
+
+
+def format_subscription_delivery(report: str) -> str:
+    """Wraps a report delivered by subscription."""
+    return f"📬 訂閱報告\n\n{report}\n（取消訂閱請使用 /unsubscribe）"
+
+
+def format_subscription_status(status: dict) -> str:
+    """Generates a one-line summary of scheduled subscription deliveries."""
+    if not status:
+        return ""
+    return (f"📬 訂閱推送: 已發送 {status['sent']} 則，失敗 {status['failed']} 則，"
+            f"報告失敗 {status['report_failures']} 次，已移除 {status['unsubscribed']} 個封鎖的訂閱\n")
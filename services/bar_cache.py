@@ -0,0 +1,355 @@
+# your_bot_project/services/bar_cache.py
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from config import NEW_YORK_TIMEZONE
+from . import extremum_engine as engine
+from .data_cache import OHLCV_COLUMNS, to_epoch_seconds
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# result: hit (served from memory), miss (loaded from the backing cache) or bypass (longer than the window).
+L1_LOOKUPS = REGISTRY.counter(
+    "bot_l1_cache_lookups_total", "In-process bar cache lookups by result.", ("result",)
+)
+
+# Timestamps are kept as UTC and New York nanoseconds, so reads need no datetime or timezone conversion.
+# Prices stay float64 so the statistics see exactly the cached values; volume is only carried along.
+COLUMN_DTYPES = {
+    "utc_ns": np.int64, "local_ns": np.int64,
+    "open": np.float64, "high": np.float64, "low": np.float64, "close": np.float64,
+    "volume": np.float32,
+}
+BYTES_PER_BAR = sum(np.dtype(dtype).itemsize for dtype in COLUMN_DTYPES.values())
+
+# Read-only views of the most recent bars of one series, oldest first.
+Bars = namedtuple("Bars", tuple(COLUMN_DTYPES))
+
+
+def _frame_columns(df: pd.DataFrame) -> dict:
+    """Sorted, de-duplicated (last wins) L1 columns for a bar DataFrame."""
+    utc_ns = to_epoch_seconds(df.index) * 10**9
+    order = np.argsort(utc_ns, kind="stable")
+    utc_ns = utc_ns[order]
+    keep = np.append(utc_ns[1:] != utc_ns[:-1], True)
+    columns = {"utc_ns": utc_ns[keep], "local_ns": engine.local_nanoseconds(utc_ns[keep], NEW_YORK_TIMEZONE)}
+    for col in OHLCV_COLUMNS:
+        values = df[col].to_numpy(dtype=np.float64) if col in df.columns else np.full(len(df), np.nan)
+        columns[col] = values[order][keep].astype(COLUMN_DTYPES[col], copy=False)
+    return columns
+
+
+class _Window:
+    """
+    The most recent bars of one series in preallocated column arrays.
+
+    Bars live in [start, stop); the room after stop takes new bars without
+    reallocating. Every other change (rewriting existing bars, compacting
+    once the room is used up) builds fresh arrays, so views handed out
+    earlier never change under their readers.
+    """
+    __slots__ = ("columns", "start", "stop", "complete", "checked")
+
+    def __init__(self, capacity: int):
+        self.columns = {col: np.empty(capacity, dtype=dtype) for col, dtype in COLUMN_DTYPES.items()}
+        self.start = 0
+        self.stop = 0
+        # True while the window holds the whole series, so shorter histories are still hits.
+        self.complete = False
+        # time.monotonic() of the last load or revalidation against the backing cache.
+        self.checked = time.monotonic()
+
+    @property
+    def capacity(self) -> int:
+        return len(self.columns["utc_ns"])
+
+    @property
+    def length(self) -> int:
+        return self.stop - self.start
+
+    @property
+    def nbytes(self) -> int:
+        return self.capacity * BYTES_PER_BAR
+
+    def covers(self, n_bars: int) -> bool:
+        return self.length >= n_bars or self.complete
+
+    def bars(self, n_bars: int) -> Bars:
+        start = max(self.start, self.stop - n_bars)
+        views = []
+        for col in COLUMN_DTYPES:
+            view = self.columns[col][start:self.stop]
+            view.flags.writeable = False
+            views.append(view)
+        return Bars(*views)
+
+    def fill(self, new: dict, window_bars: int):
+        """Replaces the contents with the newest `window_bars` of `new`."""
+        count = len(new["utc_ns"])
+        first = max(0, count - window_bars)
+        for col in COLUMN_DTYPES:
+            self.columns[col][:count - first] = new[col][first:]
+        self.start, self.stop = 0, count - first
+        if first:
+            self.complete = False
+
+    def merge(self, new: dict, window_bars: int):
+        """
+        Upserts sorted, de-duplicated bars, as the backing cache's save_data did.
+
+        Bars older than the window are ignored unless it holds the whole series.
+        """
+        ts = self.columns["utc_ns"][self.start:self.stop]
+        new_ts = new["utc_ns"]
+        if not self.complete and self.length:
+            older = int(np.searchsorted(new_ts, ts[0]))
+            if older:
+                new = {col: values[older:] for col, values in new.items()}
+                new_ts = new["utc_ns"]
+        if len(new_ts) == 0:
+            return
+        if self.length == 0:
+            self.fill(new, window_bars)
+            return
+
+        positions = np.searchsorted(ts, new_ts)
+        exists = (positions < len(ts)) & (ts[np.minimum(positions, len(ts) - 1)] == new_ts)
+        appended = new_ts > ts[-1]
+        n_existing = int(exists.sum())
+        overlap = positions[exists]
+        contiguous = n_existing == 0 or (overlap[-1] == len(ts) - 1 and overlap[-1] - overlap[0] + 1 == n_existing)
+        if not ((exists | appended).all() and contiguous):
+            # Anything but a tail update (e.g. a gap filled inside the window): merge into fresh arrays.
+            merged_ts = np.concatenate([ts, new_ts])
+            order = np.argsort(merged_ts, kind="stable")
+            keep = np.append(merged_ts[order][1:] != merged_ts[order][:-1], True)
+            merged = {col: np.concatenate([self.columns[col][self.start:self.stop], new[col]])[order][keep]
+                      for col in COLUMN_DTYPES}
+            self.columns = {col: np.empty(self.capacity, dtype=dtype) for col, dtype in COLUMN_DTYPES.items()}
+            self.fill(merged, window_bars)
+            return
+
+        # Tail update. New bars go into the spare room after stop, which no view covers. Rewritten
+        # bars, or a full window, go to fresh arrays, so views handed out earlier never change.
+        n_appended = int(appended.sum())
+        if n_existing or self.stop + n_appended > self.capacity:
+            kept = min(self.length, max(0, window_bars - n_appended))
+            columns = {col: np.empty(self.capacity, dtype=dtype) for col, dtype in COLUMN_DTYPES.items()}
+            for col in COLUMN_DTYPES:
+                columns[col][:kept] = self.columns[col][self.stop - kept:self.stop]
+            if kept < self.length:
+                self.complete = False
+            self.columns, self.start, self.stop = columns, 0, kept
+            # The overlapping bars are the last n_existing kept ones, unless the appended bars pushed them out.
+            rewritten = min(n_existing, kept)
+            if rewritten:
+                for col in COLUMN_DTYPES:
+                    self.columns[col][kept - rewritten:kept] = new[col][exists][n_existing - rewritten:]
+        if n_appended == 0:
+            return
+        tail = {col: new[col][appended] for col in COLUMN_DTYPES}
+        first = max(0, n_appended - window_bars)
+        for col in COLUMN_DTYPES:
+            self.columns[col][self.stop:self.stop + n_appended - first] = tail[col][first:]
+        self.stop += n_appended - first
+        if self.length > window_bars:
+            # Slide the window; the bars before start are reclaimed at the next compaction.
+            self.start = self.stop - window_bars
+            self.complete = False
+
+
+class BarCache:
+    """
+    An in-process (L1) cache of recent bars in front of a DataCache or ColumnarCache.
+
+    Keeps the newest `window_bars` of each series in compact typed arrays
+    (int64 UTC and New York nanoseconds, float64 prices, float32 volume), so a
+    hit needs no SQL query, row conversion or timezone conversion: get_data
+    wraps read-only views of the arrays in a DataFrame without copying, and
+    get_bars hands the arrays themselves to the statistics.
+
+    Series are loaded from the backing cache on first use and evicted least
+    recently used first once the windows exceed `budget_bytes`. Writes go to
+    the backing cache first and are then applied to the resident window, so
+    both always agree; other processes sharing the backing cache are not
+    seen unless `revalidate_seconds` is set, in which case a resident series
+    reads the bars newer than its tail from the backing cache at most that
+    often. Offers the backing cache's interface; range and session queries
+    are passed through.
+    """
+    def __init__(self, backing, budget_bytes: int = 64 * 1024 * 1024, window_bars: int = 5000,
+                 revalidate_seconds: float = 0.0):
+        self.backing = backing
+        self.budget_bytes = budget_bytes
+        self.window_bars = window_bars
+        self.revalidate_seconds = revalidate_seconds
+        # Room for a quarter of a window of new bars between compactions.
+        self._capacity = window_bars + max(16, window_bars // 4)
+        self._windows = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Per-series locks order loads from the backing cache against writes to it.
+        self._series_locks = {}
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "evictions": 0}
+        REGISTRY.gauge("bot_l1_cache_bytes", "Memory held by the in-process bar cache.", lambda: self._bytes)
+        logger.info(f"L1 bar cache initialized: {window_bars} bars per series, "
+                    f"{budget_bytes / 2**20:.0f} MiB budget.")
+
+    def _series_lock(self, key: tuple) -> threading.Lock:
+        with self._lock:
+            return self._series_locks.setdefault(key, threading.Lock())
+
+    def _lookup(self, key: tuple, n_bars: int) -> Bars | None:
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or not window.covers(n_bars):
+                return None
+            if self.revalidate_seconds and time.monotonic() - window.checked > self.revalidate_seconds:
+                return None
+            self._windows.move_to_end(key)
+            return window.bars(n_bars)
+
+    def _revalidate(self, key: tuple) -> bool:
+        """Merges bars other processes wrote after the window's tail. Needs the series lock."""
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or window.length == 0:
+                return False
+            last_ts = int(window.columns["utc_ns"][window.stop - 1] // 10**9)
+        # The last bar is read again too, in case it was still forming.
+        newer = self.backing.get_range(*key, last_ts, np.iinfo(np.int64).max)
+        with self._lock:
+            if self._windows.get(key) is not window:
+                return False
+            if newer is not None and not newer.empty:
+                window.merge(_frame_columns(newer), self.window_bars)
+            window.checked = time.monotonic()
+        return True
+
+    def _insert(self, key: tuple, window: _Window):
+        """Makes `window` resident and evicts least recently used series over the budget. Needs self._lock."""
+        previous = self._windows.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes
+        if window.nbytes > self.budget_bytes:
+            return
+        self._windows[key] = window
+        self._bytes += window.nbytes
+        while self._bytes > self.budget_bytes:
+            _, evicted = self._windows.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.stats["evictions"] += 1
+
+    def get_bars(self, symbol: str, exchange: str, interval_str: str, n_bars: int) -> Bars | None:
+        """
+        Returns read-only views of the most recent N bars, loading the series on a miss.
+
+        Returns None if the series is not cached or N is longer than the window.
+        """
+        key = (symbol, exchange, interval_str)
+        bars = self._lookup(key, n_bars)
+        if bars is not None:
+            self.stats["hits"] += 1
+            L1_LOOKUPS.inc(result="hit")
+            return bars
+        if n_bars > self.window_bars:
+            self.stats["bypassed"] += 1
+            L1_LOOKUPS.inc(result="bypass")
+            return None
+        with self._series_lock(key):
+            # Another thread may have loaded the series while this one waited.
+            bars = self._lookup(key, n_bars)
+            if bars is None and self.revalidate_seconds and self._revalidate(key):
+                bars = self._lookup(key, n_bars)
+            if bars is not None:
+                self.stats["hits"] += 1
+                L1_LOOKUPS.inc(result="hit")
+                return bars
+            self.stats["misses"] += 1
+            L1_LOOKUPS.inc(result="miss")
+            data = self.backing.get_data(symbol, exchange, interval_str, self.window_bars)
+            if data is None or data.empty:
+                return None
+            window = _Window(self._capacity)
+            window.fill(_frame_columns(data), self.window_bars)
+            window.complete = len(data) < self.window_bars
+            with self._lock:
+                self._insert(key, window)
+                return window.bars(n_bars)
+
+    @staticmethod
+    def _frame(bars: Bars) -> pd.DataFrame:
+        # Columns and index are views of the window's arrays; nothing is copied.
+        index = pd.DatetimeIndex(bars.utc_ns.view("datetime64[ns]"), name="datetime")
+        return pd.DataFrame({col: getattr(bars, col) for col in OHLCV_COLUMNS}, index=index, copy=False)
+
+    def get_data(self, symbol: str, exchange: str, interval_str: str, n_bars: int) -> pd.DataFrame | None:
+        """Retrieves the most recent N bars, from memory when the window covers them."""
+        try:
+            bars = self.get_bars(symbol, exchange, interval_str, n_bars)
+        except Exception as e:
+            logger.error(f"Error reading the L1 bar cache: {e}", exc_info=True)
+            bars = None
+        if bars is None:
+            return self.backing.get_data(symbol, exchange, interval_str, n_bars)
+        return self._frame(bars)
+
+    def save_data(self, df: pd.DataFrame, symbol: str, exchange: str, interval_str: str) -> tuple[int, int]:
+        """Writes through to the backing cache, then updates the series if it is resident."""
+        if df.empty:
+            return 0, 0
+        key = (symbol, exchange, interval_str)
+        with self._series_lock(key):
+            result = self.backing.save_data(df, symbol, exchange, interval_str)
+            try:
+                new = _frame_columns(df)
+                with self._lock:
+                    window = self._windows.get(key)
+                    if window is not None:
+                        window.merge(new, self.window_bars)
+            except Exception as e:
+                # The backing cache has the bars; reload them on the next read.
+                logger.error(f"Error updating the L1 bar cache, dropping {symbol}: {e}", exc_info=True)
+                self.invalidate(symbol, exchange, interval_str)
+        return result
+
+    def invalidate(self, symbol: str, exchange: str, interval_str: str):
+        """Drops a series, so the next read loads it from the backing cache again."""
+        with self._lock:
+            window = self._windows.pop((symbol, exchange, interval_str), None)
+            if window is not None:
+                self._bytes -= window.nbytes
+
+    def get_range(self, symbol: str, exchange: str, interval_str: str, first_ts: int, last_ts: int,
+                  limit: int | None = None) -> pd.DataFrame | None:
+        return self.backing.get_range(symbol, exchange, interval_str, first_ts, last_ts, limit=limit)
+
+    def get_session_histogram(self, symbol: str, exchange: str, interval_str: str,
+                              kind: str, first_session: int, last_session: int):
+        return self.backing.get_session_histogram(symbol, exchange, interval_str, kind, first_session, last_session)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {"series": len(self._windows), "bytes": self._bytes, **self.stats}
+
+    async def asave_data(self, df: pd.DataFrame, symbol: str, exchange: str, interval_str: str) -> tuple[int, int]:
+        """Awaitable save_data() that runs off the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.save_data, df, symbol, exchange, interval_str)
+
+    async def aget_data(self, symbol: str, exchange: str, interval_str: str, n_bars: int) -> pd.DataFrame | None:
+        """Awaitable get_data() that runs off the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.get_data, symbol, exchange, interval_str, n_bars)
+
+    def close(self):
+        with self._lock:
+            self._windows.clear()
+            self._bytes = 0
+        self.backing.close()
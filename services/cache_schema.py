@@ -0,0 +1,133 @@
+# your_bot_project/services/cache_schema.py
+
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 3
+
+# v2 layout: one row per (symbol, exchange, interval) in `symbols`, and bars
+# keyed by (symbol_id, ts) with ts as int64 epoch seconds. WITHOUT ROWID makes
+# the primary key the clustered index, so "latest N bars" is an index-ordered
+# range scan and no datetime strings need to be parsed on read.
+V2_TABLES = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS symbols (
+    id INTEGER PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    exchange TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    UNIQUE (symbol, exchange, interval)
+);
+CREATE TABLE IF NOT EXISTS klines (
+    symbol_id INTEGER NOT NULL REFERENCES symbols (id),
+    ts INTEGER NOT NULL,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    volume REAL,
+    PRIMARY KEY (symbol_id, ts)
+) WITHOUT ROWID;
+"""
+
+
+# v3 adds per-session extremes derived from klines, maintained on every save.
+# `session` is the New York day number (days since 1970-01-01) of the day, or of
+# the Monday for weekly sessions; the slots are the hour of day or the weekday.
+V3_TABLES = """
+CREATE TABLE IF NOT EXISTS session_extremes (
+    symbol_id INTEGER NOT NULL REFERENCES symbols (id),
+    kind TEXT NOT NULL,
+    session INTEGER NOT NULL,
+    high_ts INTEGER NOT NULL,
+    low_ts INTEGER NOT NULL,
+    high REAL,
+    low REAL,
+    high_slot INTEGER NOT NULL,
+    low_slot INTEGER NOT NULL,
+    PRIMARY KEY (symbol_id, kind, session)
+) WITHOUT ROWID;
+"""
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """
+    Detects the schema version of a cache database.
+
+    Returns 0 for an empty database and 1 for the original layout with TEXT
+    datetimes, which predates the schema_version table.
+    """
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if "schema_version" in tables:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+        return row[0] or 0
+    return 1 if "klines" in tables else 0
+
+
+def _set_version(conn: sqlite3.Connection, version: int):
+    conn.execute("DELETE FROM schema_version")
+    conn.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
+
+
+def _execute_script(conn: sqlite3.Connection, script: str):
+    # Statements are run one by one: executescript() would commit the open transaction.
+    for statement in script.split(";"):
+        if statement.strip():
+            conn.execute(statement)
+
+
+def _create_v2(conn: sqlite3.Connection):
+    _execute_script(conn, V2_TABLES)
+
+
+def _migrate_v1_to_v2(conn: sqlite3.Connection):
+    """Rewrites the v1 `klines` table into the v2 layout in place."""
+    logger.info("Migrating cache database from schema v1 to v2...")
+    conn.execute("ALTER TABLE klines RENAME TO klines_v1")
+    _create_v2(conn)
+    conn.execute("""
+        INSERT OR IGNORE INTO symbols (symbol, exchange, interval)
+        SELECT DISTINCT symbol, exchange, interval FROM klines_v1
+    """)
+    # v1 stored naive datetimes via astype(str); strftime('%s') reads them as UTC,
+    # which round-trips to the same naive wall-clock time on read.
+    migrated = conn.execute("""
+        INSERT OR REPLACE INTO klines (symbol_id, ts, open, high, low, close, volume)
+        SELECT s.id, CAST(strftime('%s', k.datetime) AS INTEGER), k.open, k.high, k.low, k.close, k.volume
+        FROM klines_v1 AS k
+        JOIN symbols AS s ON s.symbol = k.symbol AND s.exchange = k.exchange AND s.interval = k.interval
+        WHERE strftime('%s', k.datetime) IS NOT NULL
+    """).rowcount
+    conn.execute("DROP TABLE klines_v1")
+    logger.info(f"Migrated {migrated} rows to schema v2.")
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Brings a cache database up to SCHEMA_VERSION.
+
+    Returns:
+        The schema version found before migrating, so callers can run
+        follow-up work such as VACUUM (after v1) or rebuilding derived tables.
+    """
+    version = get_schema_version(conn)
+    if version == SCHEMA_VERSION:
+        return version
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"Cache database schema v{version} is newer than supported v{SCHEMA_VERSION}.")
+
+    with conn:
+        # Explicit BEGIN so the DDL below is part of the same atomic transaction.
+        conn.execute("BEGIN")
+        if version == 0:
+            _create_v2(conn)
+        if version == 1:
+            _migrate_v1_to_v2(conn)
+        _execute_script(conn, V3_TABLES)
+        _set_version(conn, SCHEMA_VERSION)
+    logger.info(f"Cache database schema is now v{SCHEMA_VERSION}.")
+    return version
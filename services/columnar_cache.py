@@ -0,0 +1,335 @@
+# your_bot_project/services/columnar_cache.py
+
+import asyncio
+import logging
+import os
+import re
+import shutil
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within one process.
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+from . import session_extremes
+from .data_cache import OHLCV_COLUMNS, to_epoch_seconds, from_epoch_seconds
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = "data/columnar"
+COLUMN_DTYPES = {"ts": np.int64, **{col: np.float64 for col in OHLCV_COLUMNS}}
+_ITEM_SIZE = 8
+# Extra history read around a session range so its first and last sessions are complete.
+_SESSION_MARGIN_SECONDS = 8 * 86400
+
+
+def _safe_name(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.!-]", "_", value)
+
+
+class _Snapshot:
+    """Read-only memory maps of one series, all truncated to the same length."""
+    __slots__ = ("columns", "length", "ts_path", "ts_bytes")
+
+    def __init__(self, columns: dict, length: int, ts_path: str, ts_bytes: int):
+        self.columns = columns
+        self.length = length
+        # Size of the timestamp file when mapped; a change means another process wrote to the series.
+        self.ts_path = ts_path
+        self.ts_bytes = ts_bytes
+
+
+class ColumnarCache:
+    """
+    A bar cache storing each (symbol, exchange, interval) as columnar files.
+
+    Every column is a raw little-endian int64/float64 array in its own file,
+    so reads are memory-mapped slices with no per-row conversion, and ranges
+    are found by binary search on the sorted timestamp column. New bars are
+    appended past the end that open snapshots map; any change to existing
+    bars (a refreshed tail, a backfill of older history) writes a new
+    generation of the files and switches to it atomically, so data a reader
+    already holds never changes.
+
+    Offers the same save_data/get_data/get_session_histogram interface as the
+    SQLite DataCache and is selected with CACHE_BACKEND=columnar. Several
+    processes may share one root: writes take a per-series file lock, and
+    readers notice other processes' writes by the timestamp file's size.
+    """
+    def __init__(self, root: str = CACHE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._snapshots = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        logger.info(f"ColumnarCache initialized at '{root}'.")
+
+    # --- Layout ---
+
+    def _series_dir(self, key: tuple) -> str:
+        symbol, exchange, interval_str = key
+        return os.path.join(self.root, _safe_name(exchange), _safe_name(symbol), _safe_name(interval_str))
+
+    def _lock(self, key: tuple) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    @contextmanager
+    def _write_lock(self, key: tuple):
+        """Serializes writers of one series across threads and, where supported, processes."""
+        with self._lock(key):
+            if fcntl is None:
+                yield
+                return
+            series_dir = self._series_dir(key)
+            os.makedirs(series_dir, exist_ok=True)
+            with open(os.path.join(series_dir, "LOCK"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _current_generation(self, series_dir: str) -> str | None:
+        try:
+            with open(os.path.join(series_dir, "CURRENT"), encoding="utf-8") as f:
+                return os.path.join(series_dir, f.read().strip())
+        except FileNotFoundError:
+            return None
+
+    def _open_snapshot(self, key: tuple) -> _Snapshot | None:
+        generation = self._current_generation(self._series_dir(key))
+        if generation is None:
+            return None
+        ts_path = os.path.join(generation, "ts")
+        try:
+            ts_bytes = os.path.getsize(ts_path)
+            # An interrupted append can leave columns of different lengths; trust the shortest.
+            length = min(os.path.getsize(os.path.join(generation, col)) // _ITEM_SIZE for col in COLUMN_DTYPES)
+            if length == 0:
+                columns = {col: np.empty(0, dtype=dtype) for col, dtype in COLUMN_DTYPES.items()}
+            else:
+                columns = {
+                    col: np.memmap(os.path.join(generation, col), dtype=dtype, mode="r", shape=(length,))
+                    for col, dtype in COLUMN_DTYPES.items()
+                }
+        except FileNotFoundError:
+            # Another process switched generations and removed this one; the next read opens the new one.
+            return None
+        return _Snapshot(columns, length, ts_path, ts_bytes)
+
+    @staticmethod
+    def _is_current(snapshot: _Snapshot) -> bool:
+        try:
+            return os.path.getsize(snapshot.ts_path) == snapshot.ts_bytes
+        except FileNotFoundError:
+            return False
+
+    def _snapshot(self, key: tuple) -> _Snapshot | None:
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None and not self._is_current(snapshot):
+            self._snapshots.pop(key, None)
+            snapshot = None
+        if snapshot is None:
+            with self._lock(key):
+                snapshot = self._snapshots.get(key)
+                if snapshot is None:
+                    snapshot = self._open_snapshot(key)
+                    if snapshot is not None:
+                        self._snapshots[key] = snapshot
+        return snapshot
+
+    # --- Writes ---
+
+    @staticmethod
+    def _frame_columns(df: pd.DataFrame) -> dict:
+        """Sorted, de-duplicated (last wins) typed arrays for every column of a bar DataFrame."""
+        ts = to_epoch_seconds(df.index)
+        order = np.argsort(ts, kind="stable")
+        ts = ts[order]
+        # Keep the last occurrence of duplicated timestamps, as the upsert does.
+        keep = np.append(ts[1:] != ts[:-1], True)
+        columns = {"ts": ts[keep]}
+        for col in OHLCV_COLUMNS:
+            values = df[col].to_numpy(dtype=np.float64) if col in df.columns else np.full(len(df), np.nan)
+            columns[col] = values[order][keep]
+        return columns
+
+    def _new_generation(self, series_dir: str) -> tuple[str, str | None]:
+        """Creates the next generation directory; returns it and the current one."""
+        os.makedirs(series_dir, exist_ok=True)
+        previous = self._current_generation(series_dir)
+        number = int(os.path.basename(previous)[1:]) + 1 if previous else 1
+        generation = os.path.join(series_dir, f"g{number}")
+        os.makedirs(generation, exist_ok=True)
+        return generation, previous
+
+    def _write_generation(self, series_dir: str, columns: dict):
+        """Writes all columns to a fresh generation directory and makes it current."""
+        generation, previous = self._new_generation(series_dir)
+        for col, dtype in COLUMN_DTYPES.items():
+            columns[col].astype(dtype).tofile(os.path.join(generation, col))
+        self._switch_generation(series_dir, generation, previous)
+
+    def _switch_generation(self, series_dir: str, generation: str, previous: str | None):
+        """Makes `generation` current and removes the previous one."""
+        pointer = os.path.join(series_dir, "CURRENT.tmp")
+        with open(pointer, "w", encoding="utf-8") as f:
+            f.write(os.path.basename(generation))
+        os.replace(pointer, os.path.join(series_dir, "CURRENT"))
+        if previous:
+            # Open memory maps keep the old files readable until they are dropped.
+            shutil.rmtree(previous, ignore_errors=True)
+
+    def save_data(self, df: pd.DataFrame, symbol: str, exchange: str, interval_str: str) -> tuple[int, int]:
+        """
+        Upserts a DataFrame of bars into the series files.
+
+        Returns:
+            A tuple (inserted, updated) with the number of new and refreshed rows.
+        """
+        if df.empty:
+            return 0, 0
+        key = (symbol, exchange, interval_str)
+        try:
+            new = self._frame_columns(df)
+            with self._write_lock(key):
+                inserted, updated = self._save_locked(key, new)
+                # The next read maps the files again at their new length.
+                self._snapshots.pop(key, None)
+            logger.info(f"Saved {inserted} new and refreshed {updated} existing rows for {symbol} in columnar cache.")
+            return inserted, updated
+        except Exception as e:
+            logger.error(f"Error saving data to columnar cache: {e}", exc_info=True)
+            return 0, 0
+
+    def _save_locked(self, key: tuple, new: dict) -> tuple[int, int]:
+        series_dir = self._series_dir(key)
+        current = self._open_snapshot(key)
+        new_ts = new["ts"]
+        if current is None or current.length == 0:
+            self._write_generation(series_dir, new)
+            return len(new_ts), 0
+
+        ts = current.columns["ts"]
+        positions = np.searchsorted(ts, new_ts)
+        exists = (positions < current.length) & (ts[np.minimum(positions, current.length - 1)] == new_ts)
+        appended = new_ts > ts[-1]
+        n_existing = int(exists.sum())
+
+        # Fast path: the batch overlaps a contiguous block at the very end and/or extends past it.
+        if (exists | appended).all():
+            overlap = positions[exists]
+            contiguous = n_existing == 0 or (overlap[-1] == current.length - 1 and overlap[-1] - overlap[0] + 1 == n_existing)
+            if contiguous:
+                generation = previous = self._current_generation(series_dir)
+                if n_existing:
+                    # Readers hold memory maps of the current files; rewrite the overlapping bars in a copy.
+                    generation, previous = self._new_generation(series_dir)
+                    for col in COLUMN_DTYPES:
+                        shutil.copyfile(os.path.join(previous, col), os.path.join(generation, col))
+                for col in COLUMN_DTYPES:
+                    path = os.path.join(generation, col)
+                    with open(path, "r+b") as f:
+                        # Drop any bytes left by an interrupted append before writing.
+                        f.truncate(current.length * _ITEM_SIZE)
+                        if n_existing:
+                            f.seek(int(overlap[0]) * _ITEM_SIZE)
+                            f.write(new[col][exists].astype(COLUMN_DTYPES[col]).tobytes())
+                        f.seek(0, os.SEEK_END)
+                        f.write(new[col][appended].astype(COLUMN_DTYPES[col]).tobytes())
+                if generation != previous:
+                    self._switch_generation(series_dir, generation, previous)
+                return int(appended.sum()), n_existing
+
+        # General case: merge in memory and switch to a new generation.
+        merged_ts = np.concatenate([ts, new_ts])
+        order = np.argsort(merged_ts, kind="stable")
+        merged_ts = merged_ts[order]
+        keep = np.append(merged_ts[1:] != merged_ts[:-1], True)
+        merged = {"ts": merged_ts[keep]}
+        for col in OHLCV_COLUMNS:
+            merged[col] = np.concatenate([current.columns[col], new[col]])[order][keep]
+        self._write_generation(series_dir, merged)
+        return len(new_ts) - n_existing, n_existing
+
+    # --- Reads ---
+
+    def _frame(self, snapshot: _Snapshot, start: int, stop: int) -> pd.DataFrame:
+        # Columns are views into the memory maps; only the index is materialized.
+        data = {col: snapshot.columns[col][start:stop].view(np.ndarray) for col in OHLCV_COLUMNS}
+        return pd.DataFrame(data, index=from_epoch_seconds(snapshot.columns["ts"][start:stop]), copy=False)
+
+    def get_data(self, symbol: str, exchange: str, interval_str: str, n_bars: int) -> pd.DataFrame | None:
+        """Retrieves the most recent N bars for a given asset as read-only views of the files."""
+        try:
+            snapshot = self._snapshot((symbol, exchange, interval_str))
+            if snapshot is None or snapshot.length == 0:
+                return None
+            df = self._frame(snapshot, max(0, snapshot.length - n_bars), snapshot.length)
+            logger.info(f"Loaded {len(df)} rows for {symbol} from columnar cache.")
+            return df
+        except Exception as e:
+            logger.error(f"Error retrieving data from columnar cache: {e}", exc_info=True)
+            return None
+
+    def get_range(self, symbol: str, exchange: str, interval_str: str, first_ts: int, last_ts: int,
+                  limit: int | None = None) -> pd.DataFrame | None:
+        """
+        Retrieves the bars with first_ts <= ts <= last_ts (epoch seconds) by binary search.
+
+        With `limit`, at most that many of the oldest matching bars are returned.
+        """
+        try:
+            snapshot = self._snapshot((symbol, exchange, interval_str))
+            if snapshot is None or snapshot.length == 0:
+                return None
+            ts = snapshot.columns["ts"]
+            start, stop = int(np.searchsorted(ts, first_ts, side="left")), int(np.searchsorted(ts, last_ts, side="right"))
+            if limit is not None:
+                stop = min(stop, start + limit)
+            return self._frame(snapshot, start, stop) if stop > start else None
+        except Exception as e:
+            logger.error(f"Error retrieving data range from columnar cache: {e}", exc_info=True)
+            return None
+
+    def get_session_histogram(self, symbol: str, exchange: str, interval_str: str,
+                              kind: str, first_session: int, last_session: int):
+        """
+        Histograms of high/low slots per session, as DataCache.get_session_histogram.
+
+        Computed on the fly from the memory-mapped bars of the requested sessions.
+        """
+        try:
+            snapshot = self._snapshot((symbol, exchange, interval_str))
+            if snapshot is None or snapshot.length == 0:
+                return None
+            ts = snapshot.columns["ts"]
+            session_days = 7 if kind == session_extremes.WEEKLY else 1
+            first_ts = first_session * 86400 - _SESSION_MARGIN_SECONDS
+            last_ts = (last_session + session_days) * 86400 + _SESSION_MARGIN_SECONDS
+            start, stop = np.searchsorted(ts, first_ts), np.searchsorted(ts, last_ts)
+            return session_extremes.histogram_from_bars(
+                ts[start:stop], snapshot.columns["high"][start:stop], snapshot.columns["low"][start:stop],
+                kind, first_session, last_session,
+            )
+        except Exception as e:
+            logger.error(f"Error computing session extremes from columnar cache: {e}", exc_info=True)
+            return None
+
+    async def asave_data(self, df: pd.DataFrame, symbol: str, exchange: str, interval_str: str) -> tuple[int, int]:
+        """Awaitable save_data() that runs off the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.save_data, df, symbol, exchange, interval_str)
+
+    async def aget_data(self, symbol: str, exchange: str, interval_str: str, n_bars: int) -> pd.DataFrame | None:
+        """Awaitable get_data() that runs off the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.get_data, symbol, exchange, interval_str, n_bars)
+
+    def close(self):
+        self._snapshots.clear()
+        logger.info("Columnar cache closed.")
@@ -1,87 +1,159 @@
 # your_bot_project/services/data_cache.py
 
+import asyncio
 import sqlite3
 import pandas as pd
+import numpy as np
 import logging
-from datetime import datetime
+from itertools import repeat
+
+from .cache_schema import migrate
+from . import session_extremes
+from .sqlite_store import SQLiteStore
 
 logger = logging.getLogger(__name__)
 
 DB_FILE = "data/historical_data.db"
 TABLE_NAME = "klines"
+OHLCV_COLUMNS = ("open", "high", "low", "close", "volume")
+
+# Re-saving a bar overwrites it, so the still-forming last bar gets refreshed.
+UPSERT_QUERY = f"""
+INSERT INTO {TABLE_NAME} (symbol_id, ts, open, high, low, close, volume)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (symbol_id, ts) DO UPDATE SET
+    open = excluded.open,
+    high = excluded.high,
+    low = excluded.low,
+    close = excluded.close,
+    volume = excluded.volume
+"""
+
+
+def to_epoch_seconds(index: pd.DatetimeIndex) -> np.ndarray:
+    """
+    Converts a DatetimeIndex to int64 epoch seconds.
+
+    Naive timestamps are stored as-is (read as UTC), tz-aware ones are
+    converted to UTC first, so reads always return the naive UTC wall-clock.
+    """
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return index.values.astype('datetime64[s]').astype(np.int64)
+
+
+def from_epoch_seconds(ts) -> pd.DatetimeIndex:
+    """Inverse of to_epoch_seconds: int64 epoch seconds to a naive DatetimeIndex."""
+    return pd.DatetimeIndex(pd.to_datetime(np.asarray(ts, dtype=np.int64), unit='s'), name='datetime')
+
 
 class DataCache:
     """
     Manages a local SQLite cache for historical financial data.
+
+    Safe to share between worker threads: reads use pooled read-only
+    connections and writes are serialized through the store's writer thread.
     """
-    def __init__(self, db_path: str = DB_FILE):
-        self._conn = sqlite3.connect(db_path, check_same_thread=False)
-        self._create_table()
+    def __init__(self, db_path: str = DB_FILE, read_connections: int = 4,
+                 mmap_size: int = 256 * 1024 * 1024, cache_size_kb: int = 64 * 1024):
+        self._store = SQLiteStore(db_path, read_connections=read_connections,
+                                  mmap_size=mmap_size, cache_size_kb=cache_size_kb)
+        self._symbol_ids = {}
+        previous_version = self._store.write(migrate)
+        if 0 < previous_version < 3:
+            # Databases from before v3 hold bars but no derived session extremes yet.
+            self._store.write(session_extremes.rebuild_all)
+        if previous_version == 1:
+            # Reclaim the space freed by the rewritten table.
+            self._store.write(lambda conn: conn.execute("VACUUM"))
         logger.info(f"DataCache initialized with database at '{db_path}'.")
-##nothing
-    def _create_table(self):
-        """Creates the data table if it doesn't exist."""
-        # A composite primary key prevents duplicate entries for the same candle.
-        create_table_query = f"""
-        CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
-            symbol TEXT NOT NULL,
-            exchange TEXT NOT NULL,
-            interval TEXT NOT NULL,
-            datetime TEXT NOT NULL,
-            open REAL,
-            high REAL,
-            low REAL,
-            close REAL,
-            volume REAL,
-            PRIMARY KEY (symbol, exchange, interval, datetime)
-        );
+
+    def _get_symbol_id(self, symbol: str, exchange: str, interval_str: str, create: bool = False) -> int | None:
+        """Looks up (and optionally registers) the id of a symbol series."""
+        key = (symbol, exchange, interval_str)
+        symbol_id = self._symbol_ids.get(key)
+        if symbol_id is not None:
+            return symbol_id
+
+        def lookup(conn: sqlite3.Connection):
+            if create:
+                conn.execute("INSERT OR IGNORE INTO symbols (symbol, exchange, interval) VALUES (?, ?, ?)", key)
+            row = conn.execute(
+                "SELECT id FROM symbols WHERE symbol = ? AND exchange = ? AND interval = ?", key
+            ).fetchone()
+            return row[0] if row else None
+
+        symbol_id = self._store.write(lookup) if create else self._store.read(lookup)
+        if symbol_id is not None:
+            self._symbol_ids[key] = symbol_id
+        return symbol_id
+
+    def save_data(self, df: pd.DataFrame, symbol: str, exchange: str, interval_str: str) -> tuple[int, int]:
         """
-        self._conn.cursor().execute(create_table_query)
-        self._conn.commit()
+        Upserts a DataFrame of bars into the cache in a single transaction.
 
-    def save_data(self, df: pd.DataFrame, symbol: str, exchange: str, interval_str: str):
-        """Saves a DataFrame to the cache, ignoring duplicates."""
+        Rows whose key already exists are updated in place rather than
+        rejected, so one overlapping bar no longer drops the whole batch.
+
+        Returns:
+            A tuple (inserted, updated) with the number of new and refreshed rows.
+        """
         if df.empty:
-            return
-        
-        df_to_save = df.copy()
-        df_to_save['symbol'] = symbol
-        df_to_save['exchange'] = exchange
-        df_to_save['interval'] = interval_str
-        
-        # Convert datetime index to a string column for SQLite compatibility
-        df_to_save.index.name = 'datetime_index'
-        df_to_save.reset_index(inplace=True)
-        df_to_save.rename(columns={'datetime_index': 'datetime'}, inplace=True)
-        df_to_save['datetime'] = df_to_save['datetime'].astype(str)
+            return 0, 0
+
+        if df.index.has_duplicates:
+            # The upsert keeps the last of repeated bars; count only what is written.
+            df = df[~df.index.duplicated(keep='last')]
 
         try:
-            # 'append' combined with the PRIMARY KEY ensures we only add new rows.
-            df_to_save.to_sql(TABLE_NAME, self._conn, if_exists='append', index=False)
-            logger.info(f"Saved/updated {len(df_to_save)} rows for {symbol} in cache.")
-        except sqlite3.IntegrityError:
-            logger.warning(f"Some duplicate data for {symbol} was ignored during save, which is expected.")
+            symbol_id = self._get_symbol_id(symbol, exchange, interval_str, create=True)
+            timestamps = to_epoch_seconds(df.index).tolist()
+            values = [df[col].tolist() if col in df.columns else repeat(None) for col in OHLCV_COLUMNS]
+            rows = zip(repeat(symbol_id), timestamps, *values)
+
+            first_ts, last_ts = min(timestamps), max(timestamps)
+
+            def upsert(conn: sqlite3.Connection) -> int:
+                existing = self._existing_timestamps(conn, symbol_id, first_ts, last_ts)
+                conn.executemany(UPSERT_QUERY, rows)
+                # Keep the derived per-session extremes in the same transaction.
+                session_extremes.refresh(conn, symbol_id, first_ts, last_ts)
+                return len(set(timestamps) - existing)
+
+            inserted = self._store.write(upsert)
+            updated = len(timestamps) - inserted
+            logger.info(f"Saved {inserted} new and refreshed {updated} existing rows for {symbol} in cache.")
+            return inserted, updated
         except Exception as e:
             logger.error(f"Error saving data to cache: {e}", exc_info=True)
+            return 0, 0
+
+    @staticmethod
+    def _existing_timestamps(conn: sqlite3.Connection, symbol_id: int, first_ts: int, last_ts: int) -> set:
+        """Timestamps already stored within a batch's range; a key range scan, not the whole series."""
+        query = f"SELECT ts FROM {TABLE_NAME} WHERE symbol_id = ? AND ts BETWEEN ? AND ?"
+        return {row[0] for row in conn.execute(query, (symbol_id, first_ts, last_ts))}
 
     def get_data(self, symbol: str, exchange: str, interval_str: str, n_bars: int) -> pd.DataFrame | None:
         """Retrieves the most recent N bars from the cache for a given asset."""
+        # Served by the (symbol_id, ts) clustered key in index order, no sort step.
         query = f"""
-        SELECT * FROM {TABLE_NAME}
-        WHERE symbol = ? AND exchange = ? AND interval = ?
-        ORDER BY datetime DESC
+        SELECT ts, open, high, low, close, volume FROM {TABLE_NAME}
+        WHERE symbol_id = ?
+        ORDER BY ts DESC
         LIMIT ?
         """
         try:
-            df = pd.read_sql_query(query, self._conn, params=(symbol, exchange, interval_str, n_bars))
-            if df.empty:
+            symbol_id = self._get_symbol_id(symbol, exchange, interval_str)
+            if symbol_id is None:
+                return None
+            rows = self._store.read(lambda conn: conn.execute(query, (symbol_id, n_bars)).fetchall())
+            if not rows:
                 return None
-            
-            # Convert back to a proper DataFrame structure
-            df['datetime'] = pd.to_datetime(df['datetime'])
-            df.set_index('datetime', inplace=True)
-            df.sort_index(inplace=True)
-            df.drop(columns=['symbol', 'exchange', 'interval'], inplace=True)
+
+            # Rows arrive newest first; reverse them into chronological order.
+            rows.reverse()
+            df = self._frame(rows)
 
             logger.info(f"Loaded {len(df)} rows for {symbol} from cache.")
             return df
@@ -89,6 +161,71 @@ class DataCache:
             logger.error(f"Error retrieving data from cache: {e}", exc_info=True)
             return None
 
+    def get_range(self, symbol: str, exchange: str, interval_str: str, first_ts: int, last_ts: int,
+                  limit: int | None = None) -> pd.DataFrame | None:
+        """
+        Retrieves the bars with first_ts <= ts <= last_ts (epoch seconds), oldest first.
+
+        With `limit`, at most that many of the oldest matching bars are returned,
+        so long ranges can be read in chunks.
+        """
+        query = f"""
+        SELECT ts, open, high, low, close, volume FROM {TABLE_NAME}
+        WHERE symbol_id = ? AND ts BETWEEN ? AND ?
+        ORDER BY ts
+        LIMIT ?
+        """
+        try:
+            symbol_id = self._get_symbol_id(symbol, exchange, interval_str)
+            if symbol_id is None:
+                return None
+            params = (symbol_id, first_ts, last_ts, -1 if limit is None else limit)
+            rows = self._store.read(lambda conn: conn.execute(query, params).fetchall())
+            return self._frame(rows) if rows else None
+        except Exception as e:
+            logger.error(f"Error retrieving data range from cache: {e}", exc_info=True)
+            return None
+
+    @staticmethod
+    def _frame(rows: list) -> pd.DataFrame:
+        """Builds the bar DataFrame from (ts, open, high, low, close, volume) rows."""
+        df = pd.DataFrame.from_records(rows, columns=('ts',) + OHLCV_COLUMNS)
+        df.index = from_epoch_seconds(df.pop('ts').to_numpy())
+        return df
+
+    def get_session_histogram(self, symbol: str, exchange: str, interval_str: str,
+                              kind: str, first_session: int, last_session: int):
+        """
+        Histograms of high/low slots from the materialized session extremes.
+
+        Args:
+            kind (str): session_extremes.DAILY (hour slots) or WEEKLY (weekday slots).
+            first_session, last_session (int): Inclusive New York day numbers;
+                for weekly sessions, the day numbers of the Mondays.
+
+        Returns:
+            A tuple (high_counts, low_counts, sessions), or None on error or if
+            the symbol is not cached. No OHLC bars are loaded.
+        """
+        try:
+            symbol_id = self._get_symbol_id(symbol, exchange, interval_str)
+            if symbol_id is None:
+                return None
+            return self._store.read(
+                lambda conn: session_extremes.histogram(conn, symbol_id, kind, first_session, last_session)
+            )
+        except Exception as e:
+            logger.error(f"Error reading session extremes from cache: {e}", exc_info=True)
+            return None
+
+    async def asave_data(self, df: pd.DataFrame, symbol: str, exchange: str, interval_str: str) -> tuple[int, int]:
+        """Awaitable save_data() that runs off the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.save_data, df, symbol, exchange, interval_str)
+
+    async def aget_data(self, symbol: str, exchange: str, interval_str: str, n_bars: int) -> pd.DataFrame | None:
+        """Awaitable get_data() that runs off the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.get_data, symbol, exchange, interval_str, n_bars)
+
     def close(self):
-        self._conn.close()
-        logger.info("Database connection closed.")
\ No newline at end of file
+        self._store.close()
+        logger.info("Database connection closed.")
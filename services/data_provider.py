@@ -1,41 +1,224 @@
 # your_bot_project/services/data_provider.py
 
 import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime, timezone
+import pandas as pd
 from tvDatafeed import TvDatafeed, Interval
 from .data_cache import DataCache
+from .singleflight import SingleFlight
+from .session_pool import SessionPool, AUTHENTICATED, GUEST
+from .metrics import REGISTRY, STAGE_SECONDS, CACHE_LOOKUPS, UPSTREAM_REQUESTS, UPSTREAM_QUEUE_WAIT
+from .rate_limiter import UpstreamLimiter, INTERACTIVE, BACKGROUND, PRIORITY_NAMES
+from . import market_hours
+from .resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, OPEN
+from .startup_profile import startup_timer
 
 logger = logging.getLogger(__name__)
 
+# Bar length in seconds for each TvDatafeed interval value.
+INTERVAL_SECONDS = {
+    "1": 60, "3": 180, "5": 300, "15": 900, "30": 1800, "45": 2700,
+    "1H": 3600, "2H": 7200, "3H": 10800, "4H": 14400,
+    "1D": 86400, "1W": 604800, "1M": 2592000,
+}
+
+# Extra already-cached bars re-fetched on a tail top-up, so the still-forming
+# last bar gets refreshed and small clock skews don't leave a hole.
+DELTA_OVERLAP_BARS = 3
+
+# TradingView returns at most this many of the most recent bars per request.
+# Longer periods are computed from the history accumulated in the cache.
+MAX_BARS_PER_REQUEST = 5000
+
+# Login runs in the background; fetches wait this long for it before giving up.
+LOGIN_WAIT_SECONDS = 30
+# Upstream requests wait at most this long in the rate limiter queue.
+UPSTREAM_QUEUE_TIMEOUT_SECONDS = 60
+# Each started block of this many bars costs one rate limiter token (5000 bars: 1, 5001: 2).
+UPSTREAM_BARS_PER_TOKEN = 5000
+# Cheap, always-available series used to probe idle sessions.
+HEALTH_CHECK_SYMBOL = ("BTCUSDT", "BINANCE")
+
+def last_closed_bar(data: pd.DataFrame, interval: Interval):
+    """
+    Returns the timestamp of the newest bar in `data` that has already closed.
+
+    Used as the data watermark: it only moves when a new bar completes, not
+    while the last bar is still forming. Returns None if no bar has closed.
+    """
+    bar_seconds = INTERVAL_SECONDS.get(interval.value, 0)
+    now = pd.Timestamp.now(tz="UTC")
+    if data.index.tz is None:
+        # Naive timestamps are read as UTC, as in the statistics.
+        now = now.tz_localize(None)
+    closed = data.index[data.index <= now - pd.Timedelta(seconds=bar_seconds)]
+    return closed[-1] if len(closed) else None
+
+
 class TradingViewDataProvider:
     """
     A class to handle all interactions with the TradingView data feed.
     """
     _instance = None  # Class-level instance for the singleton pattern
 
-    def __new__(cls, username=None, password=None, cache: DataCache = None):
+    def __new__(cls, username=None, password=None, cache: DataCache = None,
+                auth_sessions: int = 1, guest_sessions: int = 0, max_failures: int = 3,
+                health_check_seconds: float = 600.0, datafeed_factory=TvDatafeed,
+                rate_per_second: float = 2.0, burst: float = 5.0,
+                session_profiles: dict | None = None, max_stale_bars: int = 3,
+                retry_policy: RetryPolicy | None = None, breaker_threshold: int = 5, breaker_reset_seconds: float = 30.0):
         """
-        Singleton pattern to ensure only one instance of TvDatafeed is logged in.
+        Singleton pattern to ensure only one pool of TvDatafeed sessions is logged in.
         This prevents multiple login attempts.
+
+        Fetches are spread over a pool of `auth_sessions` authenticated plus
+        `guest_sessions` guest sessions, so different symbols download in
+        parallel. Logging in happens on a background thread so construction
+        never blocks startup; fetches wait for it (see wait_until_ready) while
+        cache hits are served right away.
+
+        Upstream calls pass through an UpstreamLimiter: a token bucket of
+        `rate_per_second` and `burst`, queued by priority so interactive
+        requests go before background refreshes.
+
+        Cache hits are checked against each symbol's trading session
+        (`session_profiles`, symbol -> market_hours profile). A hit missing at
+        most `max_stale_bars` closed bars is served immediately while it is
+        refreshed in the background; a staler one is topped up first.
+
+        Each upstream call is bounded by `retry_policy` (timeout, jittered
+        exponential backoff, overall deadline) and guarded by a per-exchange
+        CircuitBreaker. When upstream cannot answer, whatever the cache holds
+        is served instead and the series is reported as degraded.
+
+        `datafeed_factory` builds each session as datafeed_factory(username, password)
+        or datafeed_factory() for guests; it defaults to TvDatafeed and lets
+        ReplayDatafeed stand in offline.
         """
         if cls._instance is None:
             cls._instance = super(TradingViewDataProvider, cls).__new__(cls)
-            cls._instance.tv = None
             cls._instance.cache = cache
-            if username and password:
-                logger.info("TradingView credentials provided. Attempting to log in...")
-                try:
-                    cls._instance.tv = TvDatafeed(username, password)
-                    logger.info("Successfully logged into TradingView.")
-                except Exception as e:
-                    logger.error(f"Failed to log into TradingView: {e}", exc_info=True)
-                    cls._instance.tv = None # Ensure instance is None on failure
-            else:
+            cls._instance._flights = SingleFlight()
+            cls._instance._transfer_stats = {"full_fetches": 0, "tail_topups": 0, "bars_fetched": 0}
+            cls._instance._credentials = (username, password)
+            cls._instance._datafeed_factory = datafeed_factory
+            cls._instance._ready = threading.Event()
+            cls._instance.health_check_seconds = health_check_seconds
+            cls._instance.session_profiles = session_profiles or {}
+            cls._instance.max_stale_bars = max_stale_bars
+            # Per series: when upstream last confirmed the newest bar, and the refreshes in flight.
+            cls._instance._verified_at = {}
+            cls._instance._revalidating = set()
+            cls._instance._revalidate_lock = threading.Lock()
+            cls._instance.retry_policy = retry_policy or RetryPolicy()
+            cls._instance._breaker_options = (breaker_threshold, breaker_reset_seconds)
+            cls._instance._breakers = {}
+            # Series last answered from the cache because upstream failed.
+            cls._instance._degraded = set()
+            if not (username and password):
                 logger.warning("TradingView credentials not provided. Data fetching will likely fail.")
-                # Corrected guest session call. The `chromedriver_path` argument is deprecated.
-                cls._instance.tv = TvDatafeed() # Guest session
+                guest_sessions, auth_sessions = guest_sessions + auth_sessions, 0
+            # TvDatafeed keeps its websocket on the instance, so each session serves one call at a time.
+            kinds = [AUTHENTICATED] * auth_sessions + [GUEST] * guest_sessions
+            cls._instance._pool = SessionPool(cls._instance._create_session, kinds or [GUEST], max_failures)
+            # Admitting at most one call per session keeps priority order at the pool as well.
+            cls._instance._limiter = UpstreamLimiter(rate_per_second, burst, max_in_flight=cls._instance._pool.size)
+            # get_hist cannot be interrupted, so calls run here and are abandoned on timeout.
+            # A timed-out call keeps its session checked out, which bounds these threads by the pool size.
+            cls._instance._upstream_calls = ThreadPoolExecutor(max_workers=cls._instance._pool.size,
+                                                               thread_name_prefix="tv-call")
+            REGISTRY.gauge("bot_upstream_queue_depth", "Upstream calls waiting in the rate limiter queue.",
+                           lambda: cls._instance._limiter.status()["queue_depth"])
+            cls._instance.start_login()
         return cls._instance
 
-    def get_historical_data(self, symbol: str, exchange: str, interval: Interval, n_bars: int):
+    def start_login(self):
+        """Starts logging in every pool session on a background thread."""
+        threading.Thread(target=self._fill_pool, name="tv-login", daemon=True).start()
+
+    def _fill_pool(self):
+        self._pool.fill(on_first_session=self._on_first_session)
+        if self._pool.live == 0:
+            logger.error("No TradingView session could be created; retrying in the background.")
+        # Release waiting fetches; without a session they will fail fast.
+        self._ready.set()
+
+    def _on_first_session(self):
+        startup_timer.mark("tradingview_login")
+        self._ready.set()
+
+    def _create_session(self, kind: str) -> TvDatafeed:
+        """SessionPool factory: logs in one new TvDatafeed session."""
+        username, password = self._credentials
+        if kind == AUTHENTICATED:
+            logger.info("TradingView credentials provided. Attempting to log in...")
+            tv = self._datafeed_factory(username, password)
+            logger.info("Successfully logged into TradingView.")
+            return tv
+        # Corrected guest session call. The `chromedriver_path` argument is deprecated.
+        return self._datafeed_factory() # Guest session
+
+    @property
+    def login_state(self) -> str:
+        """'pending' until the first login round finishes, then 'ready' or 'failed'."""
+        if self._pool.live > 0:
+            return "ready"
+        return "failed" if self._ready.is_set() else "pending"
+
+    def wait_until_ready(self, timeout: float = LOGIN_WAIT_SECONDS) -> bool:
+        """Waits for the background login. Returns True if a session is available."""
+        self._ready.wait(timeout)
+        return self._pool.live > 0
+
+    def check_sessions(self) -> int:
+        """
+        Probes sessions idle for at least health_check_seconds with a one-bar fetch.
+
+        Sessions failing the probe are retired and replaced in the background.
+        Returns the number of failed probes.
+        """
+        def probe(tv):
+            with self._limiter.slot(BACKGROUND, timeout=UPSTREAM_QUEUE_TIMEOUT_SECONDS):
+                data = tv.get_hist(symbol=HEALTH_CHECK_SYMBOL[0], exchange=HEALTH_CHECK_SYMBOL[1],
+                                   interval=Interval.in_1_hour, n_bars=1)
+            return data is not None and not data.empty
+        failed = self._pool.health_check(probe, idle_seconds=self.health_check_seconds)
+        if failed:
+            logger.warning(f"{failed} TradingView session(s) failed the health check.")
+        return failed
+
+    @property
+    def pool_status(self) -> dict:
+        """Size, live/idle sessions and checkout counters of the session pool."""
+        return self._pool.status()
+
+    @property
+    def limiter_status(self) -> dict:
+        """Queue depth, in-flight calls, tokens and wait times of the upstream rate limiter."""
+        return self._limiter.status()
+
+    @property
+    def circuit_status(self) -> dict:
+        """State, consecutive failures and counters of each exchange's circuit breaker."""
+        return {exchange: breaker.status() for exchange, breaker in sorted(self._breakers.items())}
+
+    def _breaker(self, exchange: str) -> CircuitBreaker:
+        breaker = self._breakers.get(exchange)
+        if breaker is None:
+            breaker = self._breakers.setdefault(exchange, CircuitBreaker(exchange, *self._breaker_options))
+        return breaker
+
+    def close(self):
+        """Stops replacing retired sessions."""
+        self._pool.close()
+        self._upstream_calls.shutdown(wait=False)
+
+    def get_historical_data(self, symbol: str, exchange: str, interval: Interval, n_bars: int,
+                            priority: int = INTERACTIVE):
         """
         Fetches historical data for a given symbol.
 
@@ -44,6 +227,7 @@ class TradingViewDataProvider:
             exchange (str): The exchange code (e.g., "CME_MINI").
             interval (Interval): The time interval (e.g., Interval.in_1_hour).
             n_bars (int): The number of bars to fetch.
+            priority (int): Upstream queue priority; INTERACTIVE requests go before BACKGROUND ones.
 
         Returns:
             A pandas DataFrame with the data, or None if fetching fails.
@@ -51,32 +235,304 @@ class TradingViewDataProvider:
         # 1. First, try to get data from cache
         cached_data = None
         if self.cache:
-            cached_data = self.cache.get_data(symbol, exchange, interval.value, n_bars)
+            with STAGE_SECONDS.time(stage="cache_lookup"):
+                cached_data = self.cache.get_data(symbol, exchange, interval.value, n_bars)
             if cached_data is not None and len(cached_data) >= n_bars:
-                logger.info(f"Full data for {symbol} found in cache. Skipping API call.")
-                return cached_data
+                missing = self.missing_bars(symbol, exchange, interval, cached_data)
+                if missing == 0:
+                    CACHE_LOOKUPS.inc(symbol=symbol, result="hit")
+                    logger.info(f"Full data for {symbol} found in cache. Skipping API call.")
+                    return cached_data
+                if missing <= self.max_stale_bars:
+                    # Stale-while-revalidate: answer now, catch up in the background.
+                    CACHE_LOOKUPS.inc(symbol=symbol, result="stale")
+                    logger.info(f"Cache for {symbol} is {missing} bar(s) behind. Serving it while refreshing.")
+                    self._revalidate(symbol, exchange, interval, n_bars)
+                    return cached_data
+                logger.info(f"Cache for {symbol} is {missing} bars behind. Refreshing before answering.")
+                CACHE_LOOKUPS.inc(symbol=symbol, result="expired")
+            else:
+                CACHE_LOOKUPS.inc(symbol=symbol, result="partial" if cached_data is not None else "miss")
+        else:
+            CACHE_LOOKUPS.inc(symbol=symbol, result="miss")
 
         # 2. If cache is not sufficient, fetch from the API
-        if self.tv is None:
+        if not self.wait_until_ready():
             logger.error("TvDatafeed instance is not available or login failed. Cannot fetch data.")
+            return self._serve_degraded(symbol, exchange, interval, cached_data)
+        if self._breaker(exchange).state == OPEN:
+            # Fail fast instead of queueing behind an outage.
+            return self._serve_degraded(symbol, exchange, interval, cached_data)
+
+        # 3. Partial hit: fetch only the bars newer than the cache, then merge,
+        # unless the cache is short of older history as well. TradingView only
+        # serves the most recent bars, so backfilling means fetching the whole
+        # window, which also covers the tail; topping up first would be wasted.
+        if cached_data is not None:
+            missing = self._tail_gap(interval, cached_data)
+            if missing is not None and len(cached_data) + missing >= n_bars:
+                merged = self._top_up_tail(symbol, exchange, interval, n_bars, cached_data, priority)
+                if merged is not None and len(merged) >= n_bars:
+                    return merged.tail(n_bars)
+                if self._breaker(exchange).state == OPEN:
+                    return self._serve_degraded(symbol, exchange, interval, cached_data)
+            logger.info(f"Cache for {symbol} lacks older history. Backfilling {n_bars} bars.")
+
+        self._transfer_stats["full_fetches"] += 1
+        data = self._fetch(symbol, exchange, interval, n_bars, priority)
+        if data is None:
+            return self._serve_degraded(symbol, exchange, interval, cached_data)
+        return data
+
+    def _serve_degraded(self, symbol: str, exchange: str, interval: Interval, cached_data):
+        """Answers from whatever the cache holds when upstream cannot; None if it holds nothing."""
+        if cached_data is None or cached_data.empty:
             return None
+        logger.warning(f"Upstream unavailable for {symbol}; serving {len(cached_data)} cached bars as a partial result.")
+        CACHE_LOOKUPS.inc(symbol=symbol, result="degraded")
+        self._degraded.add((symbol, exchange, interval.value))
+        return cached_data
+
+    def missing_bars(self, symbol: str, exchange: str, interval: Interval, data: pd.DataFrame) -> int:
+        """
+        Counts the closed bars expected by the symbol's trading session but absent from `data`.
+
+        A last bar fetched while it was still forming counts as missing once it
+        has closed. Bars known to be absent upstream at the last successful
+        fetch (holidays, halts) are not counted.
+        """
+        bar_seconds = INTERVAL_SECONDS.get(interval.value)
+        if bar_seconds is None or data.empty:
+            return 0
+        # Naive timestamps are read as UTC, as in the statistics.
+        last_ts = data.index[-1].timestamp()
+        since = last_ts + bar_seconds
+        verified_at = self._verified_at.get((symbol, exchange, interval.value))
+        if verified_at is not None:
+            since = last_ts if verified_at < since else max(since, verified_at - verified_at % bar_seconds)
+        profile = self.session_profiles.get(symbol, market_hours.CRYPTO)
+        return market_hours.missing_bars(
+            profile, datetime.fromtimestamp(since, timezone.utc), bar_seconds=bar_seconds, limit=self.max_stale_bars + 1
+        )
+
+    def freshness(self, symbol: str, exchange: str, interval: Interval, data: pd.DataFrame) -> dict:
+        """
+        Describes how current `data` is, for display next to a report.
 
+        Returns:
+            {"latest_bar": naive UTC timestamp of the newest bar, "missing_bars": int,
+             "refreshing": True if a background refresh of the series is running,
+             "degraded": True if upstream failed and the data is whatever the cache held}
+        """
+        latest_bar = data.index[-1] if not data.empty else None
+        if latest_bar is not None and latest_bar.tzinfo is not None:
+            # Watermarks are naive UTC, the way naive bar timestamps are read everywhere else.
+            latest_bar = latest_bar.tz_convert("UTC").tz_localize(None)
+        return {
+            "latest_bar": latest_bar,
+            "missing_bars": self.missing_bars(symbol, exchange, interval, data),
+            "refreshing": (symbol, exchange, interval.value) in self._revalidating,
+            "degraded": (symbol, exchange, interval.value) in self._degraded,
+        }
+
+    def _revalidate(self, symbol: str, exchange: str, interval: Interval, n_bars: int):
+        """Refreshes a series on a background thread, at most once at a time per series."""
+        key = (symbol, exchange, interval.value)
+        with self._revalidate_lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+
+        def run():
+            try:
+                self.refresh(symbol, exchange, interval, n_bars)
+            except Exception as e:
+                logger.warning(f"Background refresh of {symbol} failed: {e}")
+            finally:
+                with self._revalidate_lock:
+                    self._revalidating.discard(key)
+
+        threading.Thread(target=run, name=f"revalidate-{symbol}", daemon=True).start()
+
+    def refresh(self, symbol: str, exchange: str, interval: Interval, n_bars: int):
+        """
+        Brings the cached series up to date even if the cache already holds n_bars.
+
+        Fetches only the tail since the newest cached bar, or the full window
+        if nothing is cached yet. Used by background refreshers.
+
+        Returns:
+            True if the cache was refreshed, False if fetching failed.
+        """
+        if not self.cache or not self.wait_until_ready():
+            return False
+        cached_data = self.cache.get_data(symbol, exchange, interval.value, n_bars)
+        if cached_data is not None and self._top_up_tail(symbol, exchange, interval, n_bars, cached_data, BACKGROUND) is not None:
+            return True
+        self._transfer_stats["full_fetches"] += 1
+        return self._fetch(symbol, exchange, interval, n_bars, BACKGROUND) is not None
+
+    @staticmethod
+    def _tail_gap(interval: Interval, cached_data: pd.DataFrame) -> int | None:
+        """Bars elapsed since the newest cached bar, or None for intervals of unknown length."""
+        bar_seconds = INTERVAL_SECONDS.get(interval.value)
+        if bar_seconds is None:
+            return None
+        # Naive timestamps are read as UTC, as in the statistics and missing_bars().
+        elapsed = time.time() - cached_data.index.max().timestamp()
+        return max(0, math.ceil(elapsed / bar_seconds))
+
+    def _top_up_tail(self, symbol: str, exchange: str, interval: Interval, n_bars: int, cached_data: pd.DataFrame,
+                     priority: int = INTERACTIVE):
+        """
+        Fetches the bars missing since the newest cached bar and merges them in.
+
+        Returns:
+            The merged DataFrame, or None if the fetched tail does not connect
+            to the cached history.
+        """
+        missing_bars = self._tail_gap(interval, cached_data)
+        if missing_bars is None:
+            return None
+        latest = cached_data.index.max()
+        fetch_bars = min(missing_bars + DELTA_OVERLAP_BARS, n_bars)
+
+        logger.info(f"Partial cache hit for {symbol}: topping up {fetch_bars} recent bars.")
+        self._transfer_stats["tail_topups"] += 1
+        fresh = self._fetch(symbol, exchange, interval, fetch_bars, priority)
+        if fresh is None:
+            return None
+        if fresh.index.min() > latest:
+            logger.warning(f"Fetched tail for {symbol} does not overlap the cache. Falling back to a full fetch.")
+            return None
+
+        merged = pd.concat([cached_data, fresh[cached_data.columns.intersection(fresh.columns)]])
+        merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+        return merged
+
+    def _fetch(self, symbol: str, exchange: str, interval: Interval, n_bars: int, priority: int = INTERACTIVE):
+        """
+        Fetches the latest `n_bars` bars upstream.
+
+        Concurrent requests for the same series are coalesced into one upstream
+        call, and a request for fewer bars is served by a larger in-flight one.
+        A coalesced request waits at the priority of the call it joined.
+        """
+        if n_bars > MAX_BARS_PER_REQUEST:
+            logger.warning(f"Requested {n_bars} bars for {symbol}; TradingView serves at most {MAX_BARS_PER_REQUEST}.")
+            n_bars = MAX_BARS_PER_REQUEST
+        key = (symbol, exchange, interval.value)
         try:
-            logger.info(f"Fetching {n_bars} bars for {symbol} from TradingView API...")
-            data = self.tv.get_hist(symbol=symbol, exchange=exchange, interval=interval, n_bars=n_bars)
+            data, shared = self._flights.do(
+                key, n_bars, lambda: self._fetch_and_store(symbol, exchange, interval, n_bars, priority)
+            )
+        except Exception as e:
+            logger.error(f"An error occurred while fetching data for {symbol}: {e}", exc_info=True)
+            return None
+
+        if data is None:
+            return None
+        if shared:
+            # Each waiter gets its own copy so downstream mutation stays local.
+            return data.tail(n_bars).copy()
+        return data
+
+    def _fetch_and_store(self, symbol: str, exchange: str, interval: Interval, n_bars: int, priority: int):
+        """Performs one upstream fetch and writes the result to the cache."""
+        logger.info(f"Fetching {n_bars} bars for {symbol} from TradingView API...")
+        policy = self.retry_policy
+        deadline = time.monotonic() + policy.deadline
+        data = None
+        # A failing session is marked in the pool, so a retry runs on another one
+        # (or on a fresh replacement if that session has been retired).
+        for attempt in range(policy.max_attempts):
+            if attempt:
+                delay = policy.backoff(attempt)
+                if time.monotonic() + delay >= deadline:
+                    break
+                time.sleep(delay)
+            try:
+                data = self._get_hist(symbol, exchange, interval, n_bars, priority, deadline)
+            except CircuitOpenError as e:
+                logger.warning(f"Not fetching {symbol}: {e}")
+                break
+            except Exception as e:
+                logger.warning(f"Upstream fetch for {symbol} failed ({type(e).__name__}: {e}); attempt {attempt + 1}/{policy.max_attempts}.")
+                continue
+            if data is not None and not data.empty:
+                break
 
-            if data is None or data.empty:
-                logger.warning(f"No data returned for {symbol} on {exchange}.")
-                return None
+        if data is None or data.empty:
+            logger.warning(f"No data returned for {symbol} on {exchange}.")
+            return None
 
-            logger.info(f"Successfully fetched {len(data)} bars for {symbol}.")
+        logger.info(f"Successfully fetched {len(data)} bars for {symbol}.")
+        self._transfer_stats["bars_fetched"] += len(data)
+        self._verified_at[(symbol, exchange, interval.value)] = time.time()
+        self._degraded.discard((symbol, exchange, interval.value))
 
-            # 3. Save the newly fetched data to the cache for future use
-            if self.cache and not data.empty:
+        # Save the newly fetched data to the cache for future use
+        if self.cache and not data.empty:
+            with STAGE_SECONDS.time(stage="cache_save"):
                 self.cache.save_data(data, symbol, exchange, interval.value)
 
+        return data
+
+    def _get_hist(self, symbol: str, exchange: str, interval: Interval, n_bars: int, priority: int,
+                  deadline: float | None = None):
+        remaining = UPSTREAM_QUEUE_TIMEOUT_SECONDS if deadline is None else max(0.0, deadline - time.monotonic())
+        # Large fetches take more tokens, so a burst of big backfills is spread out.
+        cost = max(1, -(-n_bars // UPSTREAM_BARS_PER_TOKEN))
+        waited = self._limiter.acquire(priority, cost, timeout=min(UPSTREAM_QUEUE_TIMEOUT_SECONDS, remaining))
+        UPSTREAM_QUEUE_WAIT.observe(waited, priority=PRIORITY_NAMES.get(priority, str(priority)))
+        try:
+            # Asked only once admitted, so a half-open trial call really goes upstream.
+            breaker = self._breaker(exchange)
+            try:
+                breaker.before_call()
+            except CircuitOpenError:
+                UPSTREAM_REQUESTS.inc(exchange=exchange, outcome="circuit_open")
+                raise
+            try:
+                data = self._get_hist_from_pool(symbol, exchange, interval, n_bars)
+            except Exception:
+                breaker.record_failure()
+                raise
+            if data is not None and not data.empty:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
             return data
+        finally:
+            self._limiter.release()
 
-        except Exception as e:
-            logger.error(f"An error occurred while fetching data for {symbol}: {e}", exc_info=True)
-            return None
\ No newline at end of file
+    def _get_hist_from_pool(self, symbol: str, exchange: str, interval: Interval, n_bars: int):
+        session = self._pool.checkout(timeout=LOGIN_WAIT_SECONDS)
+        ok = False
+        outcome = "error"
+        call = None
+        try:
+            with STAGE_SECONDS.time(stage="upstream_fetch"):
+                call = self._upstream_calls.submit(
+                    session.client.get_hist, symbol=symbol, exchange=exchange, interval=interval, n_bars=n_bars
+                )
+                data = call.result(timeout=self.retry_policy.call_timeout)
+            # TvDatafeed logs websocket errors and returns None, so an empty result counts against the session.
+            ok = data is not None and not data.empty
+            outcome = "ok" if ok else "empty"
+            return data
+        except FutureTimeoutError:
+            outcome = "timeout"
+            raise TimeoutError(f"get_hist for {symbol} took longer than {self.retry_policy.call_timeout}s.")
+        finally:
+            UPSTREAM_REQUESTS.inc(exchange=exchange, outcome=outcome)
+            if outcome == "timeout":
+                # The session is still busy with the abandoned call; return it once that ends.
+                call.add_done_callback(lambda _: self._pool.checkin(session, ok=False))
+            else:
+                self._pool.checkin(session, ok=ok)
+
+    @property
+    def upstream_stats(self) -> dict:
+        """Counters of upstream calls, calls saved by coalescing, and bars transferred."""
+        return {**self._flights.stats, **self._transfer_stats}
@@ -0,0 +1,67 @@
+# your_bot_project/services/executor.py
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorShutdownError(RuntimeError):
+    """Raised when work is submitted after the executor has been shut down."""
+
+
+class TaskExecutor:
+    """
+    Runs blocking work off the asyncio event loop.
+
+    I/O-bound work (TradingView fetches, SQLite access) goes to a bounded
+    thread pool, while CPU-bound work (statistics) goes to a process pool.
+    Every call is awaited with a timeout so a stuck upstream request cannot
+    hold a handler forever.
+    """
+    def __init__(self, io_workers: int = 8, cpu_workers: int = 2,
+                 io_timeout: float = 60.0, cpu_timeout: float = 30.0):
+        self._io_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="io-worker")
+        self._cpu_pool = ProcessPoolExecutor(max_workers=cpu_workers) if cpu_workers > 0 else None
+        self.io_timeout = io_timeout
+        self.cpu_timeout = cpu_timeout
+        self._closed = False
+        logger.info(f"TaskExecutor initialized with {io_workers} I/O threads and {cpu_workers} CPU processes.")
+
+    async def _run(self, pool, func, args, kwargs, timeout):
+        if self._closed:
+            raise ExecutorShutdownError("TaskExecutor has been shut down.")
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(pool, partial(func, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Task {getattr(func, '__name__', func)} timed out after {timeout}s.")
+            raise
+
+    async def run_io(self, func, *args, timeout: float | None = None, **kwargs):
+        """Runs a blocking I/O-bound callable in the thread pool."""
+        return await self._run(self._io_pool, func, args, kwargs, timeout or self.io_timeout)
+
+    async def run_cpu(self, func, *args, timeout: float | None = None, **kwargs):
+        """
+        Runs a CPU-bound callable in the process pool.
+
+        The callable and its arguments must be picklable (module-level functions
+        and DataFrames are). Falls back to the thread pool if no process pool
+        was configured.
+        """
+        pool = self._cpu_pool if self._cpu_pool is not None else self._io_pool
+        return await self._run(pool, func, args, kwargs, timeout or self.cpu_timeout)
+
+    def shutdown(self):
+        """Cancels pending tasks and releases both pools without blocking."""
+        if self._closed:
+            return
+        self._closed = True
+        self._io_pool.shutdown(wait=False, cancel_futures=True)
+        if self._cpu_pool is not None:
+            self._cpu_pool.shutdown(wait=False, cancel_futures=True)
+        logger.info("TaskExecutor shut down.")
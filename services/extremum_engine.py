@@ -0,0 +1,104 @@
+# your_bot_project/services/extremum_engine.py
+
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta, timezone
+
+NS_PER_HOUR = 3600 * 10**9
+NS_PER_DAY = 24 * NS_PER_HOUR
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def utc_nanoseconds(index: pd.DatetimeIndex) -> np.ndarray:
+    """Returns a DatetimeIndex as int64 UTC nanoseconds. Naive indexes are taken as UTC."""
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return index.values.astype('datetime64[ns]').view(np.int64)
+
+
+def datetime_to_ns(dt: datetime) -> int:
+    """Converts a tz-aware datetime to int64 UTC nanoseconds without float rounding."""
+    return (dt - _EPOCH) // timedelta(microseconds=1) * 1000
+
+
+def local_nanoseconds(utc_ns: np.ndarray, tz) -> np.ndarray:
+    """Converts UTC nanoseconds to wall-clock nanoseconds in `tz`."""
+    index = pd.DatetimeIndex(utc_ns.view('datetime64[ns]')).tz_localize('UTC')
+    return index.tz_convert(tz).tz_localize(None).values.view(np.int64)
+
+
+def day_numbers(local_ns: np.ndarray) -> np.ndarray:
+    """Days since 1970-01-01 of each wall-clock timestamp."""
+    return local_ns // NS_PER_DAY
+
+
+def weekdays(days: np.ndarray) -> np.ndarray:
+    """Weekday of each day number, Monday=0 ... Sunday=6 (1970-01-01 was a Thursday)."""
+    return (days + 3) % 7
+
+
+def session_extremes(session_keys: np.ndarray, high: np.ndarray, low: np.ndarray):
+    """
+    Finds the first bar of each session that sets the session high and low.
+
+    Bars must be in chronological order so that equal session keys are
+    contiguous. NaN prices are ignored, as with pandas' max()/min().
+
+    Args:
+        session_keys (np.ndarray): Non-decreasing int64 session id per bar.
+        high (np.ndarray): High price per bar.
+        low (np.ndarray): Low price per bar.
+
+    Returns:
+        A tuple of int64 arrays (starts, high_pos, low_pos): the first bar
+        position of each session and the positions of its first high and low.
+        A position equals len(high) when a session has no valid price.
+    """
+    n = len(session_keys)
+    if n == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+
+    starts = np.flatnonzero(np.concatenate(([True], session_keys[1:] != session_keys[:-1])))
+    counts = np.diff(np.append(starts, n))
+    positions = np.arange(n)
+
+    session_high = np.repeat(np.fmax.reduceat(high, starts), counts)
+    session_low = np.repeat(np.fmin.reduceat(low, starts), counts)
+    high_pos = np.minimum.reduceat(np.where(high == session_high, positions, n), starts)
+    low_pos = np.minimum.reduceat(np.where(low == session_low, positions, n), starts)
+    return starts, high_pos, low_pos
+
+
+def _histogram(slots: np.ndarray, positions: np.ndarray, n_slots: int) -> np.ndarray:
+    valid = positions < len(slots)
+    return np.bincount(slots[positions[valid]], minlength=n_slots)
+
+
+def daily_histograms(local_ns: np.ndarray, high: np.ndarray, low: np.ndarray):
+    """
+    Hour-of-day histograms of daily highs and lows.
+
+    Returns:
+        A tuple (high_counts, low_counts, days) with two 24-element int64
+        arrays and the number of distinct days.
+    """
+    days = day_numbers(local_ns)
+    starts, high_pos, low_pos = session_extremes(days, high, low)
+    hours = (local_ns // NS_PER_HOUR) % 24
+    return _histogram(hours, high_pos, 24), _histogram(hours, low_pos, 24), len(starts)
+
+
+def weekly_histograms(local_ns: np.ndarray, high: np.ndarray, low: np.ndarray):
+    """
+    Weekday histograms of weekly (Monday-Sunday) highs and lows.
+
+    Returns:
+        A tuple (high_counts, low_counts, weeks) with two 7-element int64
+        arrays and the number of distinct weeks.
+    """
+    days = day_numbers(local_ns)
+    days_of_week = weekdays(days)
+    week_starts = days - days_of_week
+    starts, high_pos, low_pos = session_extremes(week_starts, high, low)
+    return _histogram(days_of_week, high_pos, 7), _histogram(days_of_week, low_pos, 7), len(starts)
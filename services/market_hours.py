@@ -0,0 +1,87 @@
+# your_bot_project/services/market_hours.py
+
+import logging
+from datetime import datetime, time
+from config import NEW_YORK_TIMEZONE
+
+logger = logging.getLogger(__name__)
+
+CME_FUTURES = "cme_futures"
+FX = "fx"
+CRYPTO = "crypto"
+
+# Weekly sessions in New York time as (open weekday, open time, close weekday, close time),
+# Monday=0 ... Sunday=6, plus an optional daily maintenance break.
+_WEEKLY_SESSIONS = {
+    # CME Globex equity index futures: Sunday 18:00 to Friday 17:00, halted 17:00-18:00 daily.
+    CME_FUTURES: ((6, time(18, 0)), (4, time(17, 0)), (time(17, 0), time(18, 0))),
+    # Spot FX / metals and broker CFDs: Sunday 17:00 to Friday 17:00.
+    FX: ((6, time(17, 0)), (4, time(17, 0)), None),
+}
+
+
+def _minute_of_week(now: datetime) -> int:
+    local = now.astimezone(NEW_YORK_TIMEZONE)
+    return (local.weekday() * 24 + local.hour) * 60 + local.minute
+
+
+def _to_minutes(weekday: int, t: time) -> int:
+    return (weekday * 24 + t.hour) * 60 + t.minute
+
+
+def is_market_open(profile: str, now: datetime | None = None) -> bool:
+    """
+    Returns whether a market with the given session profile is trading.
+
+    Args:
+        profile (str): One of CME_FUTURES, FX or CRYPTO.
+        now (datetime | None): tz-aware time to check, defaults to the current time.
+    """
+    if profile == CRYPTO:
+        return True
+    now = now or datetime.now(NEW_YORK_TIMEZONE)
+    (open_day, open_time), (close_day, close_time), daily_break = _WEEKLY_SESSIONS[profile]
+    minute = _minute_of_week(now)
+    opens, closes = _to_minutes(open_day, open_time), _to_minutes(close_day, close_time)
+    # The week wraps around Sunday: open from Sunday evening through Friday afternoon.
+    in_week = minute >= opens or minute < closes
+    if not in_week:
+        return False
+    if daily_break is not None:
+        local = now.astimezone(NEW_YORK_TIMEZONE).time()
+        if daily_break[0] <= local < daily_break[1]:
+            return False
+    return True
+
+
+
+def missing_bars(profile: str, since: datetime, now: datetime | None = None, bar_seconds: int = 3600,
+                 limit: int = 168) -> int:
+    """
+    Counts the bars a market should have closed between `since` and `now`.
+
+    A bar counts if it opens at or after `since` (aligned to the bar length),
+    has closed by `now`, and opens while the market is trading.
+
+    Args:
+        profile (str): One of CME_FUTURES, FX or CRYPTO; unknown profiles trade around the clock.
+        since (datetime): tz-aware open time of the first bar that may be missing.
+        now (datetime | None): tz-aware reference time, defaults to the current time.
+        bar_seconds (int): The bar length.
+        limit (int): Stop counting at this many bars.
+    """
+    now = now or datetime.now(NEW_YORK_TIMEZONE)
+    start = since.timestamp()
+    start -= start % bar_seconds
+    end = now.timestamp()
+    # Bars are only checked within the last week; every profile trades at some point in a week.
+    if end - start > 7 * 86400:
+        return limit
+    count = 0
+    t = start
+    while t + bar_seconds <= end and count < limit:
+        bar_open = datetime.fromtimestamp(t, NEW_YORK_TIMEZONE)
+        if profile not in _WEEKLY_SESSIONS or is_market_open(profile, bar_open):
+            count += 1
+        t += bar_seconds
+    return count
@@ -0,0 +1,129 @@
+# your_bot_project/services/prefetch.py
+
+import asyncio
+import logging
+import random
+from datetime import datetime
+
+from tvDatafeed import Interval
+
+from config import NEW_YORK_TIMEZONE
+from services import market_hours
+
+logger = logging.getLogger(__name__)
+
+
+class _SymbolStatus:
+    """Refresh bookkeeping for one symbol."""
+    __slots__ = ("last_attempt", "last_success", "last_error", "refreshes", "failures", "skipped", "was_open")
+
+    def __init__(self):
+        self.last_attempt = None
+        self.last_success = None
+        self.last_error = None
+        self.refreshes = 0
+        self.failures = 0
+        self.skipped = 0
+        # Start as "open" so every symbol is warmed once at startup.
+        self.was_open = True
+
+
+class PrefetchScheduler:
+    """
+    Periodically tops up the cache for every configured asset in the background.
+
+    Each round refreshes every symbol whose market is open, plus one final
+    refresh right after its market closes so the closing bars are captured.
+    Symbols are staggered with random jitter and refreshed under a
+    concurrency limit so the upstream never sees a burst.
+    """
+    def __init__(self, data_provider, executor, assets: dict, sessions: dict,
+                 interval: Interval = Interval.in_1_hour, n_bars: int = 2000,
+                 period_seconds: float = 300.0, jitter_seconds: float = 30.0, max_concurrency: int = 2):
+        self.data_provider = data_provider
+        self.executor = executor
+        self.assets = dict(assets)
+        self.sessions = sessions
+        self.interval = interval
+        self.n_bars = n_bars
+        self.period_seconds = period_seconds
+        self.jitter_seconds = jitter_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._status = {symbol: _SymbolStatus() for symbol in self.assets}
+        self._task = None
+
+    def start(self):
+        """Starts the refresh loop on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="prefetch-scheduler")
+            logger.info(f"Prefetch scheduler started for {len(self.assets)} assets every {self.period_seconds}s.")
+
+    async def stop(self):
+        """Cancels the refresh loop and waits for it to finish."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Prefetch scheduler stopped.")
+
+    async def _run(self):
+        while True:
+            await asyncio.gather(*(self._refresh_symbol(symbol, exchange) for symbol, exchange in self.assets.items()))
+            await self._check_sessions()
+            await asyncio.sleep(self.period_seconds)
+
+    async def _check_sessions(self):
+        """Probes upstream sessions left idle since the last round."""
+        try:
+            await self.executor.run_io(self.data_provider.check_sessions)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Session health check failed: {e}")
+
+    async def _refresh_symbol(self, symbol: str, exchange: str):
+        status = self._status[symbol]
+        profile = self.sessions.get(symbol, market_hours.CRYPTO)
+        is_open = market_hours.is_market_open(profile)
+        if not is_open and not status.was_open:
+            status.skipped += 1
+            return
+        status.was_open = is_open
+
+        await asyncio.sleep(random.uniform(0, self.jitter_seconds))
+        async with self._semaphore:
+            status.last_attempt = datetime.now(NEW_YORK_TIMEZONE)
+            try:
+                ok = await self.executor.run_io(self.data_provider.refresh, symbol, exchange, self.interval, self.n_bars)
+                error = None if ok else "upstream returned no data"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = str(e) or type(e).__name__
+        if error is None:
+            status.refreshes += 1
+            status.last_success = status.last_attempt
+            status.last_error = None
+        else:
+            status.failures += 1
+            status.last_error = error
+            logger.warning(f"Background refresh of {symbol} failed: {error}")
+
+    def status(self) -> dict:
+        """Returns a snapshot of the refresh state of every symbol."""
+        return {
+            symbol: {
+                "market_open": market_hours.is_market_open(self.sessions.get(symbol, market_hours.CRYPTO)),
+                "last_attempt": s.last_attempt,
+                "last_success": s.last_success,
+                "last_error": s.last_error,
+                "refreshes": s.refreshes,
+                "failures": s.failures,
+                "skipped": s.skipped,
+            }
+            for symbol, s in self._status.items()
+        }
@@ -0,0 +1,124 @@
+# your_bot_project/services/rate_limiter.py
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Lower values are served first.
+INTERACTIVE = 0
+BACKGROUND = 10
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+
+class UpstreamLimiter:
+    """
+    A token bucket combined with a priority queue in front of upstream calls.
+
+    Callers wait in a heap ordered by (priority, arrival), so interactive
+    requests overtake queued background refreshes. The head of the queue is
+    admitted once at most `max_in_flight` calls are running and the bucket
+    holds enough tokens. The bucket refills at `rate_per_second` up to `burst`.
+    """
+    def __init__(self, rate_per_second: float, burst: float, max_in_flight: int):
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._in_flight = 0
+        self._waiting = []  # heap of [priority, seq]
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stats = {}  # priority -> {"granted", "timeouts", "wait_seconds", "max_wait_seconds"}
+        self.max_queue_depth = 0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate_per_second)
+        self._refilled_at = now
+
+    def _priority_stats(self, priority: int) -> dict:
+        return self._stats.setdefault(priority, {"granted": 0, "timeouts": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0})
+
+    def acquire(self, priority: int = INTERACTIVE, cost: float = 1.0, timeout: float | None = None) -> float:
+        """
+        Blocks until this call may go upstream. Pair every acquire() with release().
+
+        Args:
+            priority (int): INTERACTIVE or BACKGROUND; lower is served first.
+            cost (float): Tokens to take, e.g. more for very large fetches. Capped at `burst`.
+            timeout (float | None): Maximum seconds to wait; raises TimeoutError after that.
+
+        Returns:
+            The seconds spent waiting.
+        """
+        cost = min(cost, self.burst)
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        entry = [priority, next(self._seq)]
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._waiting))
+            while True:
+                now = time.monotonic()
+                wait = None
+                if self._waiting[0] is entry and self._in_flight < self.max_in_flight:
+                    self._refill(now)
+                    if self._tokens >= cost:
+                        break
+                    wait = (cost - self._tokens) / self.rate_per_second
+                if deadline is not None:
+                    if now >= deadline:
+                        self._waiting.remove(entry)
+                        heapq.heapify(self._waiting)
+                        self._priority_stats(priority)["timeouts"] += 1
+                        self._cond.notify_all()
+                        raise TimeoutError(f"Upstream queue wait exceeded {timeout}s.")
+                    wait = deadline - now if wait is None else min(wait, deadline - now)
+                self._cond.wait(wait)
+            heapq.heappop(self._waiting)
+            self._tokens -= cost
+            self._in_flight += 1
+            waited = time.monotonic() - started
+            stats = self._priority_stats(priority)
+            stats["granted"] += 1
+            stats["wait_seconds"] += waited
+            stats["max_wait_seconds"] = max(stats["max_wait_seconds"], waited)
+            # The next caller in line may be admissible too.
+            self._cond.notify_all()
+        return waited
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority: int = INTERACTIVE, cost: float = 1.0, timeout: float | None = None):
+        """Context manager around acquire()/release(); yields the seconds waited."""
+        waited = self.acquire(priority, cost, timeout)
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    def status(self) -> dict:
+        """Returns queue depth, in-flight calls, available tokens and wait stats per priority."""
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                "queue_depth": len(self._waiting),
+                "max_queue_depth": self.max_queue_depth,
+                "in_flight": self._in_flight,
+                "tokens": round(self._tokens, 2),
+                "priorities": {
+                    PRIORITY_NAMES.get(p, str(p)): {
+                        **s, "mean_wait_seconds": s["wait_seconds"] / s["granted"] if s["granted"] else 0.0
+                    }
+                    for p, s in sorted(self._stats.items())
+                },
+            }
@@ -0,0 +1,97 @@
+# your_bot_project/services/replay_feed.py
+
+import logging
+import os
+import random
+import threading
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def replay_file_path(data_dir: str, symbol: str, exchange: str, interval_value: str) -> str:
+    """Returns the CSV path ReplayDatafeed reads for one series, e.g. data/replay/CME_MINI-NQ1!-1H.csv."""
+    return os.path.join(data_dir, f"{exchange}-{symbol}-{interval_value}.csv")
+
+
+def write_replay_file(data: pd.DataFrame, data_dir: str, symbol: str, exchange: str, interval_value: str) -> str:
+    """Writes a TvDatafeed-shaped DataFrame where ReplayDatafeed will find it."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = replay_file_path(data_dir, symbol, exchange, interval_value)
+    data.to_csv(path, index_label="datetime")
+    return path
+
+
+class ReplayDatafeed:
+    """
+    A drop-in replacement for TvDatafeed that serves bars from local CSV files.
+
+    get_hist() returns the last n_bars of the file for (symbol, exchange,
+    interval), shifted so the newest bar is the current hour, after an
+    artificial latency. Failures can be injected as raised connection errors
+    or as None results, which is how TvDatafeed reports websocket errors.
+    """
+    _files = {}  # Parsed files shared by every instance, keyed by path.
+    _files_lock = threading.Lock()
+
+    def __init__(self, username=None, password=None, *, data_dir: str,
+                 latency_seconds: float = 0.0, latency_jitter_seconds: float = 0.0,
+                 failure_rate: float = 0.0, empty_rate: float = 0.0, shift_to_now: bool = True, seed=None):
+        """
+        Args:
+            username, password: Accepted for TvDatafeed compatibility and ignored.
+            data_dir (str): Directory of replay files (see replay_file_path).
+            latency_seconds (float): Fixed delay added to every get_hist call.
+            latency_jitter_seconds (float): Extra uniformly random delay on top of latency_seconds.
+            failure_rate (float): Probability that a call raises ConnectionError.
+            empty_rate (float): Probability that a call returns None.
+            shift_to_now (bool): Move timestamps so the newest bar is the current hour.
+            seed: Seed for the latency and failure draws.
+        """
+        self.data_dir = data_dir
+        self.latency_seconds = latency_seconds
+        self.latency_jitter_seconds = latency_jitter_seconds
+        self.failure_rate = failure_rate
+        self.empty_rate = empty_rate
+        self.shift_to_now = shift_to_now
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.calls = 0
+
+    @classmethod
+    def _load(cls, path: str):
+        with cls._files_lock:
+            data = cls._files.get(path)
+            if data is None and os.path.exists(path):
+                data = pd.read_csv(path, index_col="datetime", parse_dates=["datetime"])
+                cls._files[path] = data
+            return data
+
+    def get_hist(self, symbol: str, exchange: str = "NSE", interval=None, n_bars: int = 10,
+                 fut_contract=None, extended_session: bool = False):
+        with self._random_lock:
+            self.calls += 1
+            delay = self.latency_seconds + self._random.uniform(0.0, self.latency_jitter_seconds)
+            draw = self._random.random()
+        if delay > 0:
+            time.sleep(delay)
+        if draw < self.failure_rate:
+            raise ConnectionError(f"Injected replay failure for {exchange}:{symbol}.")
+        if draw < self.failure_rate + self.empty_rate:
+            logger.error(f"Injected empty replay result for {exchange}:{symbol}.")
+            return None
+
+        interval_value = getattr(interval, "value", interval)
+        data = self._load(replay_file_path(self.data_dir, symbol, exchange, interval_value))
+        if data is None:
+            logger.error(f"No replay file for {exchange}:{symbol} ({interval_value}) in {self.data_dir}.")
+            return None
+        data = data.tail(n_bars).copy()
+        if self.shift_to_now and not data.empty:
+            # Keep the timestamps naive (read as UTC, like the cache's) and hour-aligned.
+            now = pd.Timestamp.now(tz="UTC").tz_localize(None).floor("h")
+            data.index = data.index + (now - data.index[-1])
+            data.index.name = "datetime"
+        return data
@@ -0,0 +1,64 @@
+# your_bot_project/services/report_cache.py
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class ReportCache:
+    """
+    An LRU + TTL cache of rendered reports.
+
+    Keys are (report kind, symbol, N, watermark) where the watermark is the
+    timestamp of the last closed bar the report was computed from. New bars
+    produce a new watermark and therefore a new key, so results invalidate
+    themselves; storing a newer watermark also drops older entries for the
+    same report. The TTL bounds how long a report can lag the still-forming bar.
+    """
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def put(self, key, value):
+        """Stores `value`, replacing entries for the same report with an older watermark."""
+        kind, symbol, n_value, watermark = key
+        with self._lock:
+            stale = [k for k in self._entries if k[:3] == (kind, symbol, n_value) and k[3] != watermark]
+            for k in stale:
+                del self._entries[k]
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate(self, symbol: str | None = None):
+        """Drops all entries for `symbol`, or everything if no symbol is given."""
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+                return
+            for k in [k for k in self._entries if k[1] == symbol]:
+                del self._entries[k]
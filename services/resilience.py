@@ -0,0 +1,105 @@
+# your_bot_project/services/resilience.py
+
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while a circuit breaker is open."""
+
+
+class RetryPolicy:
+    """
+    How upstream calls are bounded and retried.
+
+    Each call may run for `call_timeout` seconds. Failed calls are retried up
+    to `max_attempts` in total, after a jittered exponential backoff, and no
+    attempt starts once `deadline` seconds have passed since the first.
+    """
+    __slots__ = ("max_attempts", "base_delay", "max_delay", "call_timeout", "deadline")
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 4.0,
+                 call_timeout: float = 15.0, deadline: float = 30.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.call_timeout = call_timeout
+        self.deadline = deadline
+
+    def backoff(self, attempt: int) -> float:
+        """Seconds to wait before retry number `attempt` (1-based), with full jitter."""
+        return random.uniform(0.0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated upstream failures.
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    before_call() raises CircuitOpenError for `reset_seconds`. Then a single
+    trial call is let through (half-open): success closes the breaker, failure
+    opens it again.
+    """
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.stats = {"opened": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def before_call(self):
+        """Raises CircuitOpenError unless a call may go upstream now."""
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            if time.monotonic() - self._opened_at >= self.reset_seconds and not self._trial_running:
+                self._state = HALF_OPEN
+                self._trial_running = True
+                logger.info(f"Circuit '{self.name}' half-open; trying one upstream call.")
+                return
+            self.stats["rejected"] += 1
+            raise CircuitOpenError(f"Circuit '{self.name}' is open.")
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"Circuit '{self.name}' closed again.")
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                if self._state == CLOSED:
+                    self.stats["opened"] += 1
+                    logger.warning(f"Circuit '{self.name}' opened after {self._failures} consecutive failures.")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    def status(self) -> dict:
+        state = self.state
+        with self._lock:
+            retry_in = max(0.0, self.reset_seconds - (time.monotonic() - self._opened_at)) if state == OPEN else 0.0
+            return {"state": state, "failures": self._failures, "retry_in_seconds": round(retry_in, 1), **self.stats}
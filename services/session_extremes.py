@@ -0,0 +1,160 @@
+# your_bot_project/services/session_extremes.py
+
+import logging
+import sqlite3
+import numpy as np
+
+from config import NEW_YORK_TIMEZONE
+from services import extremum_engine as engine
+
+logger = logging.getLogger(__name__)
+
+EXTREMES_TABLE = "session_extremes"
+DAILY = "daily"
+WEEKLY = "weekly"
+
+# Slots per session kind: hour of day for daily sessions, weekday for weekly ones.
+SLOT_COUNTS = {DAILY: 24, WEEKLY: 7}
+
+# Loading this much extra history around a batch guarantees that every week it
+# touches is seen in full, whatever the timezone offset.
+_MARGIN_SECONDS = 8 * 86400
+
+UPSERT_EXTREMES_QUERY = f"""
+INSERT INTO {EXTREMES_TABLE} (symbol_id, kind, session, high_ts, low_ts, high, low, high_slot, low_slot)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (symbol_id, kind, session) DO UPDATE SET
+    high_ts = excluded.high_ts,
+    low_ts = excluded.low_ts,
+    high = excluded.high,
+    low = excluded.low,
+    high_slot = excluded.high_slot,
+    low_slot = excluded.low_slot
+"""
+
+
+def _sessions(local_ns: np.ndarray, kind: str):
+    """Returns (session key, slot) per bar. Sessions are New York day numbers or week-start day numbers."""
+    days = engine.day_numbers(local_ns)
+    if kind == DAILY:
+        return days, (local_ns // engine.NS_PER_HOUR) % 24
+    days_of_week = engine.weekdays(days)
+    return days - days_of_week, days_of_week
+
+
+def build_rows(symbol_id: int, ts: np.ndarray, high: np.ndarray, low: np.ndarray,
+               first_ts: int | None = None, last_ts: int | None = None) -> list[tuple]:
+    """
+    Computes daily and weekly extreme rows for a chronologically ordered bar series.
+
+    Args:
+        symbol_id (int): The series id the rows belong to.
+        ts (np.ndarray): int64 epoch seconds per bar (naive timestamps read as UTC).
+        high, low (np.ndarray): Prices per bar.
+        first_ts, last_ts (int | None): If given, only sessions overlapping this
+            range are returned; sessions at the edges of `ts` may be incomplete.
+
+    Returns:
+        A list of tuples ready for UPSERT_EXTREMES_QUERY.
+    """
+    if len(ts) == 0:
+        return []
+    local_ns = engine.local_nanoseconds(ts.astype(np.int64) * 10**9, NEW_YORK_TIMEZONE)
+    rows = []
+    for kind in (DAILY, WEEKLY):
+        keys, slots = _sessions(local_ns, kind)
+        starts, high_pos, low_pos = engine.session_extremes(keys, high, low)
+        valid = (high_pos < len(ts)) & (low_pos < len(ts))
+        if first_ts is not None:
+            edge_keys, _ = _sessions(
+                engine.local_nanoseconds(np.array([first_ts, last_ts], dtype=np.int64) * 10**9, NEW_YORK_TIMEZONE), kind
+            )
+            session_keys = keys[starts]
+            valid &= (session_keys >= edge_keys[0]) & (session_keys <= edge_keys[1])
+        for start, hp, lp in zip(starts[valid].tolist(), high_pos[valid].tolist(), low_pos[valid].tolist()):
+            rows.append((
+                symbol_id, kind, int(keys[start]),
+                int(ts[hp]), int(ts[lp]), float(high[hp]), float(low[lp]),
+                int(slots[hp]), int(slots[lp]),
+            ))
+    return rows
+
+
+def refresh(conn: sqlite3.Connection, symbol_id: int, first_ts: int, last_ts: int) -> int:
+    """
+    Recomputes the extremes of every session touched by bars in [first_ts, last_ts].
+
+    Runs on the writer connection, inside the transaction that saved the bars.
+
+    Returns:
+        The number of session rows written.
+    """
+    bars = conn.execute(
+        "SELECT ts, high, low FROM klines WHERE symbol_id = ? AND ts BETWEEN ? AND ? ORDER BY ts",
+        (symbol_id, first_ts - _MARGIN_SECONDS, last_ts + _MARGIN_SECONDS),
+    ).fetchall()
+    if not bars:
+        return 0
+    ts, high, low = (np.array(col, dtype=dtype) for col, dtype in zip(zip(*bars), (np.int64, np.float64, np.float64)))
+    rows = build_rows(symbol_id, ts, high, low, first_ts, last_ts)
+    conn.executemany(UPSERT_EXTREMES_QUERY, rows)
+    return len(rows)
+
+
+def rebuild_all(conn: sqlite3.Connection) -> int:
+    """Rebuilds the extremes table from every cached bar, e.g. after a schema migration."""
+    total = 0
+    for (symbol_id,) in conn.execute("SELECT id FROM symbols").fetchall():
+        bounds = conn.execute("SELECT MIN(ts), MAX(ts) FROM klines WHERE symbol_id = ?", (symbol_id,)).fetchone()
+        if bounds[0] is not None:
+            total += refresh(conn, symbol_id, bounds[0], bounds[1])
+    logger.info(f"Rebuilt {total} session extreme rows.")
+    return total
+
+
+def histogram(conn: sqlite3.Connection, symbol_id: int, kind: str, first_session: int, last_session: int):
+    """
+    Counts high and low slots over a session range with one indexed aggregate query.
+
+    Returns:
+        A tuple (high_counts, low_counts, sessions) where the counts are lists
+        of SLOT_COUNTS[kind] integers.
+    """
+    n_slots = SLOT_COUNTS[kind]
+    high_counts = [0] * n_slots
+    low_counts = [0] * n_slots
+    sessions = 0
+    rows = conn.execute(
+        f"""
+        SELECT high_slot, low_slot, COUNT(*) FROM {EXTREMES_TABLE}
+        WHERE symbol_id = ? AND kind = ? AND session BETWEEN ? AND ?
+        GROUP BY high_slot, low_slot
+        """,
+        (symbol_id, kind, first_session, last_session),
+    )
+    for high_slot, low_slot, count in rows:
+        high_counts[high_slot] += count
+        low_counts[low_slot] += count
+        sessions += count
+    return high_counts, low_counts, sessions
+
+
+def histogram_from_bars(ts: np.ndarray, high: np.ndarray, low: np.ndarray, kind: str,
+                        first_session: int, last_session: int):
+    """
+    Same result as histogram(), computed directly from bars instead of the extremes table.
+
+    `ts` must be chronological and cover every requested session in full;
+    sessions outside [first_session, last_session] are ignored.
+    """
+    n_slots = SLOT_COUNTS[kind]
+    if len(ts) == 0:
+        return [0] * n_slots, [0] * n_slots, 0
+    local_ns = engine.local_nanoseconds(ts.astype(np.int64) * 10**9, NEW_YORK_TIMEZONE)
+    keys, slots = _sessions(local_ns, kind)
+    starts, high_pos, low_pos = engine.session_extremes(keys, high, low)
+    session_keys = keys[starts]
+    valid = (high_pos < len(ts)) & (low_pos < len(ts)) & (session_keys >= first_session) & (session_keys <= last_session)
+    high_counts = np.bincount(slots[high_pos[valid]], minlength=n_slots)
+    low_counts = np.bincount(slots[low_pos[valid]], minlength=n_slots)
+    return high_counts.tolist(), low_counts.tolist(), int(valid.sum())
@@ -0,0 +1,169 @@
+# your_bot_project/services/session_pool.py
+
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+AUTHENTICATED = "auth"
+GUEST = "guest"
+
+
+class _Session:
+    """One upstream session and its health bookkeeping."""
+    __slots__ = ("client", "kind", "failures", "created_at", "last_used")
+
+    def __init__(self, client, kind: str):
+        self.client = client
+        self.kind = kind
+        self.failures = 0
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class SessionPool:
+    """
+    A fixed-size pool of upstream sessions with checkout/checkin.
+
+    Each session is used by one caller at a time, so the pool size caps how
+    many upstream requests run in parallel. Sessions that fail
+    `max_failures` times in a row are retired and replaced in the background
+    with exponential backoff, which also covers expired logins.
+    """
+    def __init__(self, factory, kinds: list[str], max_failures: int = 3):
+        """
+        Args:
+            factory (callable): factory(kind) -> a new client (e.g. TvDatafeed).
+            kinds (list[str]): The kind of each slot, AUTHENTICATED or GUEST.
+            max_failures (int): Consecutive failures before a session is retired.
+        """
+        self._factory = factory
+        self._kinds = list(kinds)
+        self.max_failures = max_failures
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._live = 0
+        self._closed = False
+        self.stats = {"created": 0, "retired": 0, "checkouts": 0, "wait_seconds": 0.0}
+
+    @property
+    def size(self) -> int:
+        return len(self._kinds)
+
+    @property
+    def live(self) -> int:
+        """Number of sessions currently usable (idle or checked out)."""
+        return self._live
+
+    def fill(self, on_first_session=None):
+        """
+        Creates every session slot. Slots that fail are retried in the background.
+
+        Args:
+            on_first_session (callable | None): Called once the first session is usable.
+        """
+        for kind in self._kinds:
+            if self._spawn(kind) and on_first_session is not None:
+                on_first_session()
+                on_first_session = None
+
+    def _spawn(self, kind: str) -> bool:
+        try:
+            client = self._factory(kind)
+        except Exception as e:
+            logger.error(f"Failed to create {kind} upstream session: {e}", exc_info=True)
+            self._replace_later(kind)
+            return False
+        with self._lock:
+            self._live += 1
+            self.stats["created"] += 1
+        self._idle.put(_Session(client, kind))
+        logger.info(f"Created {kind} upstream session ({self._live}/{self.size} live).")
+        return True
+
+    def _replace_later(self, kind: str):
+        def replace():
+            delay = 2.0
+            while not self._closed:
+                time.sleep(delay)
+                try:
+                    client = self._factory(kind)
+                except Exception as e:
+                    logger.warning(f"Retrying {kind} upstream session in {min(delay * 2, 300):.0f}s: {e}")
+                    delay = min(delay * 2, 300)
+                    continue
+                with self._lock:
+                    self._live += 1
+                    self.stats["created"] += 1
+                self._idle.put(_Session(client, kind))
+                logger.info(f"Replaced {kind} upstream session ({self._live}/{self.size} live).")
+                return
+        threading.Thread(target=replace, name=f"session-replace-{kind}", daemon=True).start()
+
+    def checkout(self, timeout: float | None = None) -> _Session:
+        """Takes an idle session, waiting up to `timeout` seconds. Raises TimeoutError."""
+        started = time.monotonic()
+        try:
+            session = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No upstream session available within {timeout}s.") from None
+        with self._lock:
+            self.stats["checkouts"] += 1
+            self.stats["wait_seconds"] += time.monotonic() - started
+        return session
+
+    def checkin(self, session: _Session, ok: bool = True):
+        """Returns a session; after too many consecutive failures it is retired and replaced."""
+        session.last_used = time.monotonic()
+        if ok:
+            session.failures = 0
+        else:
+            session.failures += 1
+            if session.failures >= self.max_failures:
+                with self._lock:
+                    self._live -= 1
+                    self.stats["retired"] += 1
+                logger.warning(f"Retiring {session.kind} upstream session after {session.failures} failures.")
+                self._replace_later(session.kind)
+                return
+        self._idle.put(session)
+
+    def health_check(self, probe, idle_seconds: float = 0.0) -> int:
+        """
+        Probes idle sessions with `probe(client)`, retiring ones that keep failing.
+
+        Only sessions idle for at least `idle_seconds` are probed; busy
+        sessions are proven healthy by their own traffic.
+
+        Returns:
+            The number of sessions that failed the probe.
+        """
+        failed = 0
+        for _ in range(self._idle.qsize()):
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if time.monotonic() - session.last_used < idle_seconds:
+                self._idle.put(session)
+                continue
+            try:
+                ok = bool(probe(session.client))
+            except Exception:
+                ok = False
+            if not ok:
+                failed += 1
+                # Probe failures retire immediately; an idle broken session helps nobody.
+                session.failures = self.max_failures - 1
+            self.checkin(session, ok=ok)
+        return failed
+
+    def status(self) -> dict:
+        """Returns pool size, live and idle sessions, and usage counters."""
+        return {"size": self.size, "live": self._live, "idle": self._idle.qsize(), **self.stats}
+
+    def close(self):
+        """Stops background replacement; checked-in sessions are dropped."""
+        self._closed = True
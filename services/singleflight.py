@@ -0,0 +1,80 @@
+# your_bot_project/services/singleflight.py
+
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """A single in-flight upstream call that other callers can wait on."""
+    __slots__ = ("size", "done", "result", "error", "waiters")
+
+    def __init__(self, size: int):
+        self.size = size
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one upstream call.
+
+    Each call carries a `size` (e.g. number of bars). A caller joins an
+    in-flight call for the same key if that call is at least as large as what
+    it needs; otherwise it starts its own. Callers that join share the leader's
+    result and are expected to trim it to their own size.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.stats = {"upstream_calls": 0, "coalesced_calls": 0}
+
+    def do(self, key, size: int, func):
+        """
+        Runs `func()` for `key` unless a large enough call is already in flight.
+
+        Args:
+            key: A hashable identifier of the upstream resource.
+            size (int): How much of the resource this caller needs.
+            func (callable): The upstream call, invoked without arguments.
+
+        Returns:
+            A tuple (result, shared) where `shared` is True if the result came
+            from another caller's in-flight call.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and flight.size >= size:
+                flight.waiters += 1
+                self.stats["coalesced_calls"] += 1
+                leader = False
+            else:
+                # Either nothing is in flight or it is too small to serve us.
+                # A smaller in-flight call keeps running for its own waiters.
+                flight = _Flight(size)
+                self._flights[key] = flight
+                self.stats["upstream_calls"] += 1
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = func()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+            if flight.waiters:
+                logger.info(f"Shared one upstream call for {key} with {flight.waiters} waiting request(s).")
+        return flight.result, False
@@ -0,0 +1,141 @@
+# your_bot_project/services/sqlite_store.py
+
+import asyncio
+import logging
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class SQLiteStore:
+    """
+    Thread-safe access to one SQLite database file.
+
+    The database runs in WAL mode so readers never block the writer. Reads go
+    through a small pool of read-only connections; all writes are funnelled
+    through a single writer thread, which is the only connection allowed to
+    modify the file. Both sides have awaitable variants for use from handlers.
+    """
+    def __init__(self, db_path: str, read_connections: int = 4,
+                 mmap_size: int = 256 * 1024 * 1024, cache_size_kb: int = 64 * 1024):
+        if db_path == ":memory:":
+            raise ValueError("SQLiteStore needs a database file; ':memory:' cannot be shared between connections.")
+        self.db_path = db_path
+        self._mmap_size = mmap_size
+        self._cache_size_kb = cache_size_kb
+
+        self._writer_conn = self._connect(readonly=False)
+        self._writer_conn.execute("PRAGMA journal_mode=WAL")
+        self._write_queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="sqlite-writer", daemon=True)
+        self._writer.start()
+
+        self._max_readers = read_connections
+        self._readers = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
+        self._closed = False
+        logger.info(f"SQLiteStore opened '{db_path}' in WAL mode with up to {read_connections} readers.")
+
+    def _connect(self, readonly: bool) -> sqlite3.Connection:
+        if readonly:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(f"PRAGMA mmap_size={int(self._mmap_size)}")
+        # A negative cache_size is interpreted by SQLite as KiB rather than pages.
+        conn.execute(f"PRAGMA cache_size={-int(self._cache_size_kb)}")
+        return conn
+
+    # --- Writes ---
+
+    def _write_loop(self):
+        while True:
+            item = self._write_queue.get()
+            if item is _STOP:
+                break
+            func, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                with self._writer_conn:
+                    result = func(self._writer_conn)
+                future.set_result(result)
+            except BaseException as e:
+                future.set_exception(e)
+
+    def submit_write(self, func) -> Future:
+        """
+        Queues `func(conn)` for the writer thread, inside one transaction.
+
+        Returns:
+            A concurrent.futures.Future with the callable's return value.
+        """
+        if self._closed:
+            raise RuntimeError("SQLiteStore is closed.")
+        future = Future()
+        self._write_queue.put((func, future))
+        return future
+
+    def write(self, func):
+        """Runs `func(conn)` on the writer thread and waits for its result."""
+        return self.submit_write(func).result()
+
+    async def awrite(self, func):
+        """Awaitable variant of write()."""
+        return await asyncio.wrap_future(self.submit_write(func))
+
+    # --- Reads ---
+
+    def _checkout(self) -> sqlite3.Connection:
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._reader_lock:
+            if self._reader_count < self._max_readers:
+                self._reader_count += 1
+                try:
+                    return self._connect(readonly=True)
+                except Exception:
+                    # Give the slot back, or after enough failures every reader would wait forever.
+                    self._reader_count -= 1
+                    raise
+        # Pool exhausted: wait for another thread to hand one back.
+        return self._readers.get()
+
+    def read(self, func):
+        """Runs `func(conn)` with a pooled read-only connection."""
+        if self._closed:
+            raise RuntimeError("SQLiteStore is closed.")
+        conn = self._checkout()
+        try:
+            return func(conn)
+        finally:
+            self._readers.put(conn)
+
+    async def aread(self, func):
+        """Awaitable variant of read(), run in the loop's default executor."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.read, func)
+
+    def close(self):
+        """Drains pending writes, stops the writer and closes all connections."""
+        if self._closed:
+            return
+        self._closed = True
+        self._write_queue.put(_STOP)
+        self._writer.join()
+        self._writer_conn.close()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,43 @@
+# your_bot_project/services/startup_profile.py
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """
+    Records when each startup milestone was first reached.
+
+    Milestones are measured from the moment this module was imported, which
+    main.py does first, and reported as a breakdown of where the time to the
+    first user response went.
+    """
+    def __init__(self):
+        self._origin = time.perf_counter()
+        self._marks = {}
+        self._lock = threading.Lock()
+
+    def mark(self, name: str) -> bool:
+        """Records milestone `name` if not seen before. Returns True on the first call."""
+        with self._lock:
+            if name in self._marks:
+                return False
+            self._marks[name] = time.perf_counter() - self._origin
+            return True
+
+    def report(self) -> str:
+        """Returns the milestones in order with elapsed and per-step times."""
+        with self._lock:
+            marks = sorted(self._marks.items(), key=lambda item: item[1])
+        lines = ["Startup timing:"]
+        previous = 0.0
+        for name, elapsed in marks:
+            lines.append(f"  {name:<24} +{elapsed - previous:7.3f}s  (at {elapsed:7.3f}s)")
+            previous = elapsed
+        return "\n".join(lines)
+
+
+startup_timer = StartupTimer()
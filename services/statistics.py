@@ -1,19 +1,71 @@
 # your_bot_project/services/statistics.py
 
 import logging
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from config import NEW_YORK_TIMEZONE
+from services import extremum_engine as engine
+from services import session_extremes
 
 logger = logging.getLogger(__name__)
 
-def calculate_daily_stats(data: pd.DataFrame, days_n: int):
+def _resolve_now(now: datetime | None) -> datetime:
+    """Returns `now` in New York time, defaulting to the current time."""
+    return datetime.now(NEW_YORK_TIMEZONE) if now is None else now.astimezone(NEW_YORK_TIMEZONE)
+
+
+def _last_full_weeks(weeks_n: int, now: datetime | None = None):
+    """Returns the start (Monday 00:00) and end (Sunday 23:59:59.999999) of the last N complete weeks."""
+    today = _resolve_now(now).date()
+    # Find the end of the last complete week (last Sunday)
+    end_of_last_full_week_date = today - timedelta(days=(today.weekday() + 1) % 7)
+    end_of_last_full_week = datetime.combine(end_of_last_full_week_date, datetime.max.time()).replace(tzinfo=NEW_YORK_TIMEZONE)
+
+    # Find the start of the N-week period (the Monday N-1 weeks before the start of the last full week)
+    start_of_period_date = end_of_last_full_week_date - timedelta(weeks=weeks_n -1, days=6)
+    start_of_period = datetime.combine(start_of_period_date, datetime.min.time()).replace(tzinfo=NEW_YORK_TIMEZONE)
+    return start_of_period, end_of_last_full_week
+
+
+def _daily_period(days_n: int, now: datetime | None = None):
+    """Returns the start and end of the rolling N-day window that ends at `now`."""
+    end = _resolve_now(now)
+    return end - timedelta(days=days_n), end
+
+
+def stats_period(stats_type: str, n_value: int, now: datetime | None = None):
+    """Returns the (start, end) New York datetimes covered by a 'daily' or 'weekly' report."""
+    if stats_type == 'daily':
+        return _daily_period(n_value, now)
+    return _last_full_weeks(n_value, now)
+
+
+def _day_number(d: date) -> int:
+    """Days since 1970-01-01, the session key used by the session extremes table."""
+    return d.toordinal() - date(1970, 1, 1).toordinal()
+
+
+def _prepare_arrays(data: pd.DataFrame):
+    """Extracts chronologically ordered UTC nanoseconds and high/low arrays."""
+    utc_ns = engine.utc_nanoseconds(data.index)
+    high = data['high'].to_numpy(dtype=np.float64)
+    low = data['low'].to_numpy(dtype=np.float64)
+    if len(utc_ns) > 1 and not (utc_ns[1:] >= utc_ns[:-1]).all():
+        order = np.argsort(utc_ns, kind='stable')
+        utc_ns, high, low = utc_ns[order], high[order], low[order]
+    return utc_ns, high, low
+
+
+def calculate_daily_stats(data: pd.DataFrame, days_n: int, now: datetime | None = None):
     """
     Calculates the hourly distribution of daily highs and lows.
 
     Args:
         data (pd.DataFrame): The raw historical data from the data provider.
         days_n (int): The number of days to look back for the analysis.
+        now (datetime | None): tz-aware reference time that ends the period.
+            Defaults to the current time; pass it explicitly for reproducible results.
 
     Returns:
         A tuple containing:
@@ -26,65 +78,33 @@ def calculate_daily_stats(data: pd.DataFrame, days_n: int):
         logger.warning("Daily stats calculation received no data.")
         return None
 
-    # --- Timezone and Data Preparation ---
-    if data.index.tz is None:
-        data.index = data.index.tz_localize('UTC')
-    data.index = data.index.tz_convert(NEW_YORK_TIMEZONE)
-    logger.debug(f"Data index converted to '{NEW_YORK_TIMEZONE}' for daily stats.")
-
-    data_reset = data.reset_index()
-    data_reset.rename(columns={'datetime': 'Datetime'}, inplace=True)
+    # Naive timestamps are treated as UTC; days are New York calendar days.
+    utc_ns, high, low = _prepare_arrays(data)
 
     # --- Filtering for the exact N-day period in the specified timezone ---
-    end_date_filter = datetime.now(NEW_YORK_TIMEZONE)
-    start_date_filter = end_date_filter - timedelta(days=days_n)
-
-    data_filtered = data_reset[
-        (data_reset['Datetime'] >= start_date_filter) &
-        (data_reset['Datetime'] <= end_date_filter)
-    ].copy()
+    start_date_filter, end_date_filter = _daily_period(days_n, now)
+    in_range = (utc_ns >= engine.datetime_to_ns(start_date_filter)) & (utc_ns <= engine.datetime_to_ns(end_date_filter))
 
-    if data_filtered.empty:
+    if not in_range.any():
         logger.warning(f"Insufficient data after filtering for the last {days_n} days.")
         return None
 
-    data_filtered['DateOnly'] = data_filtered['Datetime'].dt.date
-    
-    high_point_hourly_counts = [0] * 24
-    low_point_hourly_counts = [0] * 24
-
-    unique_days_processed = data_filtered['DateOnly'].nunique()
-    logger.info(f"Processing daily stats for {unique_days_processed} unique days.")
-
-    # --- Calculation Loop ---
-    for date_only, daily_data in data_filtered.groupby('DateOnly'):
-        if daily_data.empty:
-            continue
-
-        daily_max_high = daily_data['high'].max()
-        daily_min_low = daily_data['low'].min()
-
-        # Find the first occurrence of the high and low
-        high_hour_of_day = daily_data[daily_data['high'] == daily_max_high]['Datetime'].min().hour
-        low_hour_of_day = daily_data[daily_data['low'] == daily_min_low]['Datetime'].min().hour
-        
-        logger.debug(f"Date: {date_only}, Daily High Hour: {high_hour_of_day}, Daily Low Hour: {low_hour_of_day}")
+    local_ns = engine.local_nanoseconds(utc_ns[in_range], NEW_YORK_TIMEZONE)
+    high_counts, low_counts, unique_days_processed = engine.daily_histograms(local_ns, high[in_range], low[in_range])
+    logger.info(f"Processed daily stats for {unique_days_processed} unique days.")
 
-        if high_hour_of_day is not None:
-            high_point_hourly_counts[high_hour_of_day] += 1
-        if low_hour_of_day is not None:
-            low_point_hourly_counts[low_hour_of_day] += 1
-            
-    return high_point_hourly_counts, low_point_hourly_counts, unique_days_processed
+    return high_counts.tolist(), low_counts.tolist(), unique_days_processed
 
 
-def calculate_weekly_stats(data: pd.DataFrame, weeks_n: int):
+def calculate_weekly_stats(data: pd.DataFrame, weeks_n: int, now: datetime | None = None):
     """
     Calculates the weekday distribution of weekly highs and lows for N complete weeks.
 
     Args:
         data (pd.DataFrame): The raw historical data from the data provider.
         weeks_n (int): The number of complete weeks to analyze.
+        now (datetime | None): tz-aware reference time; the period ends with the
+            last complete week before it. Defaults to the current time.
 
     Returns:
         A tuple containing:
@@ -97,65 +117,179 @@ def calculate_weekly_stats(data: pd.DataFrame, weeks_n: int):
         logger.warning("Weekly stats calculation received no data.")
         return None
 
-    # --- Timezone and Data Preparation ---
-    if data.index.tz is None:
-        data.index = data.index.tz_localize('UTC')
-    data.index = data.index.tz_convert(NEW_YORK_TIMEZONE)
-    logger.debug(f"Data index converted to '{NEW_YORK_TIMEZONE}' for weekly stats.")
-
-    data_reset = data.reset_index()
-    data_reset.rename(columns={'datetime': 'Datetime'}, inplace=True)
+    # Naive timestamps are treated as UTC; weeks run Monday-Sunday in New York time.
+    utc_ns, high, low = _prepare_arrays(data)
 
     # --- Find the boundaries of the last N complete weeks ---
-    today = datetime.now(NEW_YORK_TIMEZONE).date()
-    # Find the end of the last complete week (last Sunday)
-    end_of_last_full_week_date = today - timedelta(days=(today.weekday() + 1) % 7)
-    end_of_last_full_week = datetime.combine(end_of_last_full_week_date, datetime.max.time()).replace(tzinfo=NEW_YORK_TIMEZONE)
-
-    # Find the start of the N-week period (the Monday N-1 weeks before the start of the last full week)
-    start_of_period_date = end_of_last_full_week_date - timedelta(weeks=weeks_n -1, days=6)
-    start_of_period = datetime.combine(start_of_period_date, datetime.min.time()).replace(tzinfo=NEW_YORK_TIMEZONE)
-    
+    start_of_period, end_of_last_full_week = _last_full_weeks(weeks_n, now)
     logger.info(f"Filtering for {weeks_n} full weeks from {start_of_period} to {end_of_last_full_week}")
 
-    data_filtered = data_reset[
-        (data_reset['Datetime'] >= start_of_period) &
-        (data_reset['Datetime'] <= end_of_last_full_week)
-    ].copy()
+    in_range = (utc_ns >= engine.datetime_to_ns(start_of_period)) & (utc_ns <= engine.datetime_to_ns(end_of_last_full_week))
 
-    if data_filtered.empty:
+    if not in_range.any():
         logger.warning(f"No data after filtering for {weeks_n} full weeks.")
         return None
 
-    # Use the Monday of the week as the unique week identifier
-    data_filtered['WeekStart'] = data_filtered['Datetime'].dt.to_period('W-SUN').apply(lambda r: r.start_time).dt.date
-
-    weekly_high_weekday_counts = [0] * 7  # Monday=0, Sunday=6
-    weekly_low_weekday_counts = [0] * 7
-
-    unique_weeks_processed = data_filtered['WeekStart'].nunique()
-    logger.info(f"Processing weekly stats for {unique_weeks_processed} unique weeks.")
-    
-    # --- Calculation Loop ---
-    for week_start_date, weekly_data in data_filtered.groupby('WeekStart'):
-        if weekly_data.empty:
-            continue
-
-        weekly_max_high = weekly_data['high'].max()
-        weekly_min_low = weekly_data['low'].min()
-        
-        # Find the first occurrence of the high and low
-        high_day = weekly_data[weekly_data['high'] == weekly_max_high]['Datetime'].min()
-        low_day = weekly_data[weekly_data['low'] == weekly_min_low]['Datetime'].min()
-
-        high_weekday = high_day.weekday() # Monday=0, Sunday=6
-        low_weekday = low_day.weekday()
-
-        logger.debug(f"Week of {week_start_date}, High on: {high_weekday}, Low on: {low_weekday}")
-
-        if high_weekday is not None:
-            weekly_high_weekday_counts[high_weekday] += 1
-        if low_weekday is not None:
-            weekly_low_weekday_counts[low_weekday] += 1
-            
-    return weekly_high_weekday_counts, weekly_low_weekday_counts, unique_weeks_processed
\ No newline at end of file
+    local_ns = engine.local_nanoseconds(utc_ns[in_range], NEW_YORK_TIMEZONE)
+    high_counts, low_counts, unique_weeks_processed = engine.weekly_histograms(local_ns, high[in_range], low[in_range])
+    logger.info(f"Processed weekly stats for {unique_weeks_processed} unique weeks.")
+
+    return high_counts.tolist(), low_counts.tolist(), unique_weeks_processed
+
+
+def calculate_stats_from_bar_cache(cache, stats_type: str, symbol: str, exchange: str, interval_str: str,
+                                   n_bars: int, n_value: int, now: datetime | None = None):
+    """
+    Calculates the same result as calculate_daily_stats / calculate_weekly_stats
+    over the most recent `n_bars` held by an in-process BarCache.
+
+    The cached arrays are sorted and already carry New York time, so the
+    period is found by binary search and the histograms read slices of the
+    arrays without copying or converting them.
+
+    Returns:
+        The same tuple as calculate_daily_stats, or None if the cache cannot
+        serve the bars or has none in the period.
+    """
+    bars = cache.get_bars(symbol, exchange, interval_str, n_bars)
+    if bars is None:
+        return None
+    start, end = stats_period(stats_type, n_value, now)
+    first = int(np.searchsorted(bars.utc_ns, engine.datetime_to_ns(start), side='left'))
+    stop = int(np.searchsorted(bars.utc_ns, engine.datetime_to_ns(end), side='right'))
+    if stop <= first:
+        logger.warning(f"No in-memory bars of {symbol} in the last {n_value} {stats_type} periods.")
+        return None
+    histograms = engine.daily_histograms if stats_type == 'daily' else engine.weekly_histograms
+    high_counts, low_counts, sessions = histograms(bars.local_ns[first:stop], bars.high[first:stop], bars.low[first:stop])
+    logger.info(f"Processed {stats_type} stats for {sessions} sessions of {symbol} from in-memory bars.")
+    return high_counts.tolist(), low_counts.tolist(), sessions
+
+
+def calculate_weekly_stats_from_cache(cache, symbol: str, exchange: str, interval_str: str, weeks_n: int,
+                                      now: datetime | None = None):
+    """
+    Calculates the same result as calculate_weekly_stats from the cache's
+    materialized weekly extremes, without loading any OHLC bars.
+
+    Args:
+        cache (DataCache): The cache holding the symbol's bars.
+        symbol (str): The asset symbol (e.g., "NQ1!").
+        exchange (str): The exchange code (e.g., "CME_MINI").
+        interval_str (str): The interval value the bars were cached under.
+        weeks_n (int): The number of complete weeks to analyze.
+        now (datetime | None): tz-aware reference time, as in calculate_weekly_stats.
+
+    Returns:
+        The same tuple as calculate_weekly_stats, or None if the cache has no
+        weeks in the period.
+    """
+    start_of_period, _ = _last_full_weeks(weeks_n, now)
+    first_week = _day_number(start_of_period.date())
+    last_week = first_week + 7 * (weeks_n - 1)
+
+    result = cache.get_session_histogram(symbol, exchange, interval_str, session_extremes.WEEKLY, first_week, last_week)
+    if result is None or result[2] == 0:
+        logger.warning(f"No cached weekly extremes for {symbol} in the last {weeks_n} full weeks.")
+        return None
+    logger.info(f"Read weekly stats for {result[2]} weeks of {symbol} from cached extremes.")
+    return result
+
+
+class StreamingStats:
+    """
+    Daily or weekly extreme histograms accumulated over chunks of bars.
+
+    Chunks must arrive in chronological order without overlapping. The last
+    session of each chunk may continue in the next one, so it is carried over
+    rather than counted. The result equals calculate_daily_stats or
+    calculate_weekly_stats over all the chunks together, while only one chunk
+    is held in memory.
+    """
+    def __init__(self, stats_type: str, n_value: int, now: datetime | None = None):
+        self.stats_type = stats_type
+        start, end = stats_period(stats_type, n_value, now)
+        self._start_ns = engine.datetime_to_ns(start)
+        self._end_ns = engine.datetime_to_ns(end)
+        self._histograms = engine.daily_histograms if stats_type == 'daily' else engine.weekly_histograms
+        n_slots = 24 if stats_type == 'daily' else 7
+        self.high_counts = np.zeros(n_slots, dtype=np.int64)
+        self.low_counts = np.zeros(n_slots, dtype=np.int64)
+        self.sessions = 0
+        self.bars = 0
+        self._carry = (np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+
+    def _session_keys(self, local_ns: np.ndarray) -> np.ndarray:
+        days = engine.day_numbers(local_ns)
+        return days if self.stats_type == 'daily' else days - engine.weekdays(days)
+
+    def _count(self, utc_ns: np.ndarray, high: np.ndarray, low: np.ndarray):
+        if len(utc_ns):
+            local_ns = engine.local_nanoseconds(utc_ns, NEW_YORK_TIMEZONE)
+            high_counts, low_counts, sessions = self._histograms(local_ns, high, low)
+            self.high_counts += high_counts
+            self.low_counts += low_counts
+            self.sessions += sessions
+
+    def add(self, data: pd.DataFrame):
+        """Counts the complete sessions in `data` and keeps the last one for the next chunk."""
+        if data is None or data.empty:
+            return
+        utc_ns, high, low = _prepare_arrays(data)
+        in_range = (utc_ns >= self._start_ns) & (utc_ns <= self._end_ns)
+        self.bars += int(in_range.sum())
+        utc_ns, high, low = (np.concatenate((carried, values[in_range]))
+                             for carried, values in zip(self._carry, (utc_ns, high, low)))
+        if len(utc_ns) == 0:
+            return
+        keys = self._session_keys(engine.local_nanoseconds(utc_ns, NEW_YORK_TIMEZONE))
+        split = int(np.searchsorted(keys, keys[-1]))
+        self._count(utc_ns[:split], high[:split], low[:split])
+        self._carry = (utc_ns[split:], high[split:], low[split:])
+
+    def result(self):
+        """Counts the carried-over session and returns the same tuple as calculate_*_stats, or None."""
+        self._count(*self._carry)
+        self._carry = (np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+        if self.sessions == 0:
+            return None
+        return self.high_counts.tolist(), self.low_counts.tolist(), self.sessions
+
+
+def calculate_stats_from_cache_chunks(cache, stats_type: str, symbol: str, exchange: str, interval_str: str,
+                                      n_value: int, now: datetime | None = None, chunk_bars: int = 5000,
+                                      on_progress=None):
+    """
+    Calculates daily or weekly statistics over cached bars read in bounded chunks.
+
+    Used for periods longer than one upstream request can return: the cache
+    holds the accumulated history, and memory stays bounded by `chunk_bars`
+    whatever N is.
+
+    Args:
+        cache: A DataCache or ColumnarCache.
+        stats_type (str): 'daily' or 'weekly'.
+        on_progress (callable | None): Called with the fraction of the period
+            processed (0.0-1.0) after each chunk, from the calling thread.
+
+    Returns:
+        The same tuple as calculate_daily_stats / calculate_weekly_stats, or
+        None if the cache has no bars in the period.
+    """
+    start, end = stats_period(stats_type, n_value, now)
+    first_ts, last_ts = int(start.timestamp()), int(end.timestamp())
+    accumulator = StreamingStats(stats_type, n_value, now)
+    chunk_start = first_ts
+    while chunk_start <= last_ts:
+        chunk = cache.get_range(symbol, exchange, interval_str, chunk_start, last_ts, limit=chunk_bars)
+        if chunk is None or chunk.empty:
+            break
+        accumulator.add(chunk)
+        chunk_end = int(engine.utc_nanoseconds(chunk.index[-1:])[0] // 10**9)
+        if on_progress is not None:
+            on_progress(min(1.0, (chunk_end - first_ts) / max(1, last_ts - first_ts)))
+        if len(chunk) < chunk_bars:
+            break
+        chunk_start = chunk_end + 1
+    logger.info(f"Streamed {accumulator.bars} cached bars of {symbol} for {stats_type} stats over {n_value} periods.")
+    return accumulator.result()
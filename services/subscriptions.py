@@ -0,0 +1,196 @@
+# your_bot_project/services/subscriptions.py
+
+import asyncio
+import logging
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from services.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+CREATE_SUBSCRIPTIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS subscriptions (
+    chat_id        INTEGER NOT NULL,
+    asset          TEXT NOT NULL,
+    kind           TEXT NOT NULL,
+    n_value        INTEGER NOT NULL,
+    delivery_time  TEXT NOT NULL,
+    last_delivered REAL NOT NULL,
+    PRIMARY KEY (chat_id, asset, kind, n_value)
+)
+"""
+UPSERT_SUBSCRIPTION_QUERY = (
+    "INSERT INTO subscriptions (chat_id, asset, kind, n_value, delivery_time, last_delivered) "
+    "VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(chat_id, asset, kind, n_value) DO UPDATE SET delivery_time = excluded.delivery_time"
+)
+
+Subscription = namedtuple("Subscription", "chat_id asset kind n_value delivery_time last_delivered")
+
+
+def last_occurrence(kind: str, delivery_time: str, now: datetime) -> datetime:
+    """
+    Returns the most recent scheduled delivery at or before `now`.
+
+    Daily reports are delivered every day at `delivery_time` ("HH:MM" in now's
+    timezone); weekly reports only change once a week, so they go out on Mondays.
+    """
+    hour, minute = map(int, delivery_time.split(":"))
+    occurrence = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if occurrence > now:
+        occurrence -= timedelta(days=1)
+    if kind == 'weekly':
+        occurrence -= timedelta(days=occurrence.weekday())
+    return occurrence
+
+
+class SubscriptionStore:
+    """Scheduled report subscriptions per chat, kept in SQLite."""
+    def __init__(self, db_path: str):
+        self._store = SQLiteStore(db_path, read_connections=2, mmap_size=0, cache_size_kb=2048)
+        self._store.write(lambda conn: conn.execute(CREATE_SUBSCRIPTIONS_TABLE))
+
+    async def add(self, chat_id: int, asset: str, kind: str, n_value: int, delivery_time: str):
+        """Adds a subscription, or moves an existing one to a new delivery time."""
+        # The first delivery is the next scheduled one, not a catch-up of today's.
+        row = (chat_id, asset, kind, n_value, delivery_time, time.time())
+        await self._store.awrite(lambda conn: conn.execute(UPSERT_SUBSCRIPTION_QUERY, row))
+
+    async def remove(self, chat_id: int, asset: str | None = None, kind: str | None = None,
+                     n_value: int | None = None) -> int:
+        """Removes one subscription, or all of a chat's if no asset is given. Returns the number removed."""
+        if asset is None:
+            return await self._store.awrite(
+                lambda conn: conn.execute("DELETE FROM subscriptions WHERE chat_id = ?", (chat_id,)).rowcount
+            )
+        return await self._store.awrite(lambda conn: conn.execute(
+            "DELETE FROM subscriptions WHERE chat_id = ? AND asset = ? AND kind = ? AND n_value = ?",
+            (chat_id, asset, kind, n_value)
+        ).rowcount)
+
+    async def remove_chats(self, chat_ids: list) -> int:
+        rows = [(chat_id,) for chat_id in chat_ids]
+        return await self._store.awrite(
+            lambda conn: conn.executemany("DELETE FROM subscriptions WHERE chat_id = ?", rows).rowcount
+        )
+
+    async def for_chat(self, chat_id: int) -> list:
+        rows = await self._store.aread(lambda conn: conn.execute(
+            "SELECT * FROM subscriptions WHERE chat_id = ? ORDER BY asset, kind, n_value", (chat_id,)
+        ).fetchall())
+        return [Subscription(*row) for row in rows]
+
+    async def due(self, now: datetime) -> list:
+        """Returns the subscriptions whose latest scheduled delivery has not been made yet."""
+        rows = await self._store.aread(lambda conn: conn.execute("SELECT * FROM subscriptions").fetchall())
+        subscriptions = (Subscription(*row) for row in rows)
+        return [s for s in subscriptions
+                if last_occurrence(s.kind, s.delivery_time, now).timestamp() > s.last_delivered]
+
+    async def mark_delivered(self, subscriptions: list, delivered_at: float):
+        rows = [(delivered_at, s.chat_id, s.asset, s.kind, s.n_value) for s in subscriptions]
+        await self._store.awrite(lambda conn: conn.executemany(
+            "UPDATE subscriptions SET last_delivered = ? WHERE chat_id = ? AND asset = ? AND kind = ? AND n_value = ?",
+            rows
+        ))
+
+    def close(self):
+        self._store.close()
+
+
+class SubscriptionScheduler:
+    """
+    Delivers due subscriptions every `check_seconds`.
+
+    Each run computes every distinct (asset, kind, N) once, with at most
+    `max_concurrency` reports in progress, and hands the messages for all
+    subscribers to the Broadcaster. Subscriptions whose report could not be
+    computed stay due and are retried on the next check; chats that blocked
+    the bot are unsubscribed.
+    """
+    def __init__(self, store: SubscriptionStore, build_report, broadcaster, timezone,
+                 check_seconds: float = 30.0, max_concurrency: int = 2):
+        """`build_report(asset, kind, n_value)` is a coroutine returning the report text or None."""
+        self.store = store
+        self.build_report = build_report
+        self.broadcaster = broadcaster
+        self.timezone = timezone
+        self.check_seconds = check_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._task = None
+        self.stats = {"runs": 0, "reports": 0, "report_failures": 0, "sent": 0, "failed": 0, "unsubscribed": 0}
+
+    def start(self):
+        """Starts the delivery loop on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="subscription-scheduler")
+            logger.info(f"Subscription scheduler started, checking every {self.check_seconds}s.")
+
+    async def stop(self):
+        """Cancels the delivery loop and waits for it to finish."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Subscription scheduler stopped.")
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Subscription delivery run failed: {e}", exc_info=True)
+            await asyncio.sleep(self.check_seconds)
+
+    async def _report(self, key: tuple):
+        async with self._semaphore:
+            try:
+                return await self.build_report(*key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Could not build subscribed report {key}: {e}")
+                return None
+
+    async def run_once(self, now: datetime | None = None) -> dict:
+        """Delivers every due subscription once. Returns the broadcast summary (empty if nothing was due)."""
+        now = now or datetime.now(self.timezone)
+        due = await self.store.due(now)
+        if not due:
+            return {}
+        self.stats["runs"] += 1
+        groups = {}
+        for subscription in due:
+            groups.setdefault((subscription.asset, subscription.kind, subscription.n_value), []).append(subscription)
+        logger.info(f"Delivering {len(due)} subscriptions covering {len(groups)} distinct reports.")
+
+        keys = list(groups)
+        reports = dict(zip(keys, await asyncio.gather(*(self._report(key) for key in keys))))
+        recipients, messages = [], []
+        for key, subscriptions in groups.items():
+            if reports[key] is None:
+                self.stats["report_failures"] += 1
+                continue
+            self.stats["reports"] += 1
+            recipients.extend(subscriptions)
+            messages.extend((s.chat_id, reports[key]) for s in subscriptions)
+
+        async def record(indices):
+            # Recorded per batch, so a restart mid-broadcast resumes with the chats not yet reached.
+            # Failed sends are not retried on the next check; a resend would duplicate delivered messages.
+            await self.store.mark_delivered([recipients[i] for i in indices], now.timestamp())
+
+        summary = await self.broadcaster.broadcast(messages, on_batch=record)
+        if summary["blocked"]:
+            self.stats["unsubscribed"] += await self.store.remove_chats(summary["blocked"])
+        self.stats["sent"] += summary["sent"]
+        self.stats["failed"] += summary["failed"]
+        return summary
@@ -0,0 +1,7 @@
+# your_bot_project/tests/conftest.py
+
+import os
+import sys
+
+# The bot is run from the project root, so tests import its packages the same way.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
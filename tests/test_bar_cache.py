@@ -0,0 +1,198 @@
+# your_bot_project/tests/test_bar_cache.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.bar_cache import BarCache, _frame_columns, _Window
+from services.data_cache import DataCache
+
+WINDOW_BARS = 40
+CAPACITY = WINDOW_BARS + 16
+START = pd.Timestamp("2025-03-01")
+
+
+def _bars(first_hour: int, count: int, price: float = 100.0) -> pd.DataFrame:
+    """Hourly bars starting `first_hour` hours after START, with prices tagged by `price`."""
+    offsets = np.arange(first_hour, first_hour + count)
+    close = price + offsets / 1000
+    return pd.DataFrame(
+        {"open": close, "high": close + 1, "low": close - 1, "close": close, "volume": offsets.astype(float)},
+        index=pd.DatetimeIndex(START + pd.to_timedelta(offsets, unit="h"), name="datetime"),
+    )
+
+
+def _window(df: pd.DataFrame, complete: bool = False) -> _Window:
+    window = _Window(CAPACITY)
+    window.fill(_frame_columns(df), WINDOW_BARS)
+    window.complete = complete
+    return window
+
+
+def _frame(window: _Window) -> pd.DataFrame:
+    bars = window.bars(window.length)
+    return pd.DataFrame(
+        {col: getattr(bars, col) for col in ("open", "high", "low", "close", "volume")},
+        index=pd.DatetimeIndex(bars.utc_ns.view("datetime64[ns]"), name="datetime"),
+    )
+
+
+def _upsert(series: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame:
+    """What the backing cache holds after saving `df`: new bars win."""
+    merged = pd.concat([series, df])
+    return merged[~merged.index.duplicated(keep="last")].sort_index()
+
+
+def _assert_window_is_suffix(window: _Window, series: pd.DataFrame):
+    """The window must hold exactly the newest bars of the full series."""
+    assert window.length <= WINDOW_BARS
+    expected = series.iloc[len(series) - window.length:]
+    if window.complete:
+        assert window.length == len(series)
+    actual = _frame(window)
+    np.testing.assert_array_equal(actual.index.values, expected.index.values.astype("datetime64[ns]"))
+    for col in ("open", "high", "low", "close"):
+        np.testing.assert_array_equal(actual[col].to_numpy(), expected[col].to_numpy())
+    np.testing.assert_array_equal(actual["volume"].to_numpy(), expected["volume"].to_numpy(dtype=np.float32))
+
+
+def test_append_uses_the_spare_room_in_place():
+    window = _window(_bars(0, 30), complete=True)
+    columns = window.columns
+    window.merge(_frame_columns(_bars(30, 5)), WINDOW_BARS)
+    assert window.columns is columns
+    assert (window.start, window.stop) == (0, 35)
+    assert window.complete
+    _assert_window_is_suffix(window, _bars(0, 35))
+
+
+def test_append_past_the_window_slides_and_marks_incomplete():
+    window = _window(_bars(0, 38), complete=True)
+    window.merge(_frame_columns(_bars(38, 5)), WINDOW_BARS)
+    assert window.length == WINDOW_BARS
+    assert not window.complete
+    _assert_window_is_suffix(window, _bars(0, 43))
+
+
+def test_append_past_the_capacity_compacts():
+    window = _window(_bars(0, WINDOW_BARS))
+    for first in range(WINDOW_BARS, WINDOW_BARS + 30, 3):
+        window.merge(_frame_columns(_bars(first, 3)), WINDOW_BARS)
+        assert window.stop <= CAPACITY
+    assert window.start == window.stop - WINDOW_BARS
+    _assert_window_is_suffix(window, _bars(0, WINDOW_BARS + 30))
+
+
+def test_tail_overlap_rewrites_the_last_bars():
+    series = _bars(0, 30)
+    window = _window(series, complete=True)
+    update = _bars(27, 6, price=200.0)
+    window.merge(_frame_columns(update), WINDOW_BARS)
+    _assert_window_is_suffix(window, _upsert(series, update))
+    assert window.length == 33
+
+
+def test_tail_overlap_pushed_out_by_appended_bars():
+    series = _bars(0, WINDOW_BARS)
+    window = _window(series)
+    update = _bars(WINDOW_BARS - 2, WINDOW_BARS + 5, price=200.0)
+    window.merge(_frame_columns(update), WINDOW_BARS)
+    _assert_window_is_suffix(window, _upsert(series, update))
+
+
+def test_gap_inside_the_window_is_merged():
+    series = pd.concat([_bars(0, 10), _bars(15, 10)])
+    window = _window(series, complete=True)
+    update = _bars(8, 5, price=200.0)
+    window.merge(_frame_columns(update), WINDOW_BARS)
+    _assert_window_is_suffix(window, _upsert(series, update))
+    assert window.complete
+
+
+def test_bars_older_than_an_incomplete_window_are_ignored():
+    window = _window(_bars(100, 20))
+    window.merge(_frame_columns(_bars(90, 12, price=200.0)), WINDOW_BARS)
+    # Only the two bars at the window's start are rewritten.
+    _assert_window_is_suffix(window, _upsert(_bars(100, 20), _bars(100, 2, price=200.0)))
+
+
+def test_bars_older_than_a_complete_window_are_merged():
+    window = _window(_bars(100, 20), complete=True)
+    update = _bars(90, 5, price=200.0)
+    window.merge(_frame_columns(update), WINDOW_BARS)
+    _assert_window_is_suffix(window, _upsert(_bars(100, 20), update))
+
+
+def test_merge_into_an_empty_window_fills_it():
+    window = _Window(CAPACITY)
+    window.merge(_frame_columns(_bars(0, 50)), WINDOW_BARS)
+    _assert_window_is_suffix(window, _bars(0, 50))
+
+
+@pytest.mark.parametrize("update", [
+    _bars(30, 3),                    # append
+    _bars(28, 4, price=200.0),       # tail overlap and append
+    _bars(29, 1, price=200.0),       # rewrite of the forming bar
+    _bars(5, 3, price=200.0),        # rewrite inside the window
+    _bars(0, 60, price=200.0),       # rewrite everything and slide
+], ids=["append", "overlap", "last_bar", "inside", "all"])
+def test_views_handed_out_earlier_never_change(update):
+    window = _window(_bars(0, 30), complete=True)
+    held = window.bars(30)
+    before = [column.copy() for column in held]
+    window.merge(_frame_columns(update), WINDOW_BARS)
+    for column, expected in zip(held, before):
+        np.testing.assert_array_equal(column, expected)
+        assert not column.flags.writeable
+
+
+def test_random_merges_match_the_full_series():
+    rng = np.random.default_rng(11)
+    series = _bars(0, 25)
+    window = _window(series, complete=True)
+    held = []
+    for step in range(400):
+        last = int((series.index[-1] - START) / pd.Timedelta(hours=1))
+        kind = rng.integers(4)
+        if kind == 0:
+            update = _bars(last + 1 + int(rng.integers(3)), int(rng.integers(1, 8)), price=step)
+        elif kind == 1:
+            update = _bars(last - int(rng.integers(0, 5)), int(rng.integers(1, 10)), price=step)
+        elif kind == 2:
+            update = _bars(last - int(rng.integers(5, 60)), int(rng.integers(1, 4)), price=step)
+        else:
+            update = _bars(last + 1, int(rng.integers(20, 60)), price=step)
+        if rng.random() < 0.3:
+            # Saves may arrive unsorted and with duplicates; the last one wins.
+            update = pd.concat([update.sample(frac=1.0, random_state=step), update.iloc[-1:]])
+        series = _upsert(series, update)
+        window.merge(_frame_columns(update), WINDOW_BARS)
+        _assert_window_is_suffix(window, series)
+
+        held.append((window.bars(10), [column.copy() for column in window.bars(10)]))
+        for views, expected in held[-20:]:
+            for column, values in zip(views, expected):
+                np.testing.assert_array_equal(column, values)
+
+
+def test_bar_cache_reads_match_the_backing_cache(tmp_path):
+    backing = DataCache(str(tmp_path / "cache.db"), read_connections=1)
+    cache = BarCache(backing, window_bars=WINDOW_BARS)
+    key = ("BTCUSD", "BITSTAMP", "1H")
+    try:
+        cache.save_data(_bars(0, 30), *key)
+        for step, update in enumerate([_bars(30, 5), _bars(33, 4, price=200.0), _bars(10, 3, price=300.0),
+                                       _bars(37, 50, price=400.0), _bars(86, 1, price=500.0)]):
+            assert cache.get_bars(*key, 20) is not None
+            cache.save_data(update, *key)
+            for n_bars in (1, 20, WINDOW_BARS):
+                expected = backing.get_data(*key, n_bars)
+                actual = cache.get_data(*key, n_bars)
+                np.testing.assert_array_equal(actual.index.values, expected.index.values.astype("datetime64[ns]"))
+                np.testing.assert_array_equal(actual["high"].to_numpy(), expected["high"].to_numpy())
+                np.testing.assert_array_equal(actual["close"].to_numpy(), expected["close"].to_numpy())
+        assert cache.stats["misses"] == 1
+        assert cache.get_data(*key, WINDOW_BARS + 1).shape[0] == WINDOW_BARS + 1
+        assert cache.stats["bypassed"] == 1
+    finally:
+        cache.close()
@@ -0,0 +1,144 @@
+# your_bot_project/tests/test_broadcast.py
+
+import asyncio
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+from bot.broadcast import Broadcaster
+from services.subscriptions import SubscriptionScheduler, SubscriptionStore, last_occurrence
+
+TAIPEI = ZoneInfo("Asia/Taipei")
+
+
+class FakeSend:
+    """Records sends with their loop time; `errors` maps chat_id -> exceptions to raise first."""
+    def __init__(self, errors: dict | None = None):
+        self.errors = {chat_id: list(excs) for chat_id, excs in (errors or {}).items()}
+        self.sent = []
+
+    async def __call__(self, chat_id, text):
+        pending = self.errors.get(chat_id)
+        if pending:
+            raise pending.pop(0)
+        self.sent.append((chat_id, text, asyncio.get_running_loop().time()))
+
+
+def _fast(send, batch_size: int = 25) -> Broadcaster:
+    return Broadcaster(send, rate_per_second=1000.0, per_chat_interval=0.0, batch_size=batch_size)
+
+
+def test_every_message_is_sent_once():
+    send = FakeSend()
+    messages = [(chat_id, f"report {chat_id}") for chat_id in range(60)]
+    summary = asyncio.run(_fast(send).broadcast(messages))
+    assert summary["sent"] == 60
+    assert summary["failed"] == 0 and summary["blocked"] == []
+    assert sorted((chat_id, text) for chat_id, text, _ in send.sent) == messages
+
+
+@pytest.mark.filterwarnings("ignore::telegram.warnings.PTBDeprecationWarning")
+def test_retry_after_pauses_the_whole_broadcast():
+    send = FakeSend({0: [RetryAfter(timedelta(milliseconds=200))]})
+    messages = [(chat_id, "report") for chat_id in range(5)]
+
+    async def run():
+        started = asyncio.get_running_loop().time()
+        summary = await _fast(send, batch_size=1).broadcast(messages)
+        return started, summary
+
+    started, summary = asyncio.run(run())
+    assert summary["sent"] == 5
+    # Chat 0 is retried after the pause, and nothing else goes out during it.
+    assert [chat_id for chat_id, _, _ in send.sent] == [0, 1, 2, 3, 4]
+    assert send.sent[0][2] - started >= 0.2
+
+
+def test_blocked_and_failed_chats_are_reported():
+    send = FakeSend({1: [Forbidden("bot was blocked by the user")], 2: [BadRequest("chat not found")]})
+    summary = asyncio.run(_fast(send).broadcast([(chat_id, "report") for chat_id in range(4)]))
+    assert summary["blocked"] == [1]
+    assert summary["failed"] == 1
+    assert summary["sent"] == 2
+    assert sorted(chat_id for chat_id, _, _ in send.sent) == [0, 3]
+
+
+def test_on_batch_gets_the_indices_of_each_finished_batch():
+    send = FakeSend({3: [Forbidden("blocked")]})
+    # Chat 7 has two messages; interleaving spreads them over different batches.
+    messages = [(chat_id, "report") for chat_id in range(8)] + [(7, "second report")]
+    batches = []
+
+    async def on_batch(indices):
+        # Every message of the batch has been attempted before it is recorded.
+        attempted = {chat_id for chat_id, _, _ in send.sent} | {3}
+        assert {messages[i][0] for i in indices} <= attempted
+        batches.append(indices)
+
+    asyncio.run(_fast(send, batch_size=4).broadcast(messages, on_batch=on_batch))
+    assert [len(indices) for indices in batches] == [4, 4, 1]
+    assert sorted(i for indices in batches for i in indices) == list(range(len(messages)))
+
+
+@pytest.mark.parametrize("now, expected", [
+    (datetime(2026, 3, 4, 8, 30), datetime(2026, 3, 4, 8, 0)),   # after today's delivery
+    (datetime(2026, 3, 4, 7, 59), datetime(2026, 3, 3, 8, 0)),   # before it: yesterday's
+    (datetime(2026, 3, 4, 8, 0), datetime(2026, 3, 4, 8, 0)),    # exactly at it
+    (datetime(2026, 3, 1, 0, 5), datetime(2026, 2, 28, 8, 0)),   # just after midnight, across a month
+])
+def test_daily_last_occurrence(now, expected):
+    assert last_occurrence("daily", "08:00", now.replace(tzinfo=TAIPEI)) == expected.replace(tzinfo=TAIPEI)
+
+
+@pytest.mark.parametrize("now, expected", [
+    (datetime(2026, 3, 2, 9, 0), datetime(2026, 3, 2, 8, 0)),    # Monday after delivery
+    (datetime(2026, 3, 2, 7, 0), datetime(2026, 2, 23, 8, 0)),   # Monday before it: last week's
+    (datetime(2026, 3, 2, 0, 1), datetime(2026, 2, 23, 8, 0)),   # just after Sunday midnight
+    (datetime(2026, 3, 8, 23, 59), datetime(2026, 3, 2, 8, 0)),  # Sunday night
+    (datetime(2026, 3, 4, 12, 0), datetime(2026, 3, 2, 8, 0)),   # midweek
+])
+def test_weekly_last_occurrence_is_on_monday(now, expected):
+    occurrence = last_occurrence("weekly", "08:00", now.replace(tzinfo=TAIPEI))
+    assert occurrence == expected.replace(tzinfo=TAIPEI)
+    assert occurrence.weekday() == 0
+
+
+def test_interrupted_broadcast_leaves_only_unsent_subscriptions_due(tmp_path):
+    class Interrupted(Exception):
+        pass
+
+    async def run():
+        store = SubscriptionStore(str(tmp_path / "subscriptions.db"))
+        try:
+            for chat_id in range(10):
+                await store.add(chat_id, "NQ1!", "daily", 30, "08:00")
+            now = datetime.now(TAIPEI) + timedelta(days=1)
+
+            async def build_report(asset, kind, n_value):
+                return "report"
+
+            sent = []
+
+            async def send(chat_id, text):
+                if len(sent) == 6:
+                    raise Interrupted()
+                sent.append(chat_id)
+
+            scheduler = SubscriptionScheduler(store, build_report, _fast(send, batch_size=3), TAIPEI)
+            # Interrupted is not a Telegram error, so it aborts the broadcast mid-way, like a crash.
+            with pytest.raises(Interrupted):
+                await scheduler.run_once(now)
+            still_due = {s.chat_id for s in await store.due(now)}
+            assert still_due.isdisjoint(sent)
+            assert len(still_due) == 10 - len(sent)
+
+            scheduler.broadcaster = _fast(FakeSend())
+            summary = await scheduler.run_once(now)
+            assert summary["sent"] == len(still_due)
+            assert await store.due(now) == []
+        finally:
+            store.close()
+
+    asyncio.run(run())
@@ -0,0 +1,167 @@
+# your_bot_project/tests/test_cache_schema.py
+
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services import session_extremes
+from services.cache_schema import SCHEMA_VERSION, get_schema_version, migrate
+from services.data_cache import DataCache
+
+V1_TABLE = """
+CREATE TABLE klines (
+    symbol TEXT NOT NULL,
+    exchange TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    datetime TEXT NOT NULL,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    volume REAL,
+    PRIMARY KEY (symbol, exchange, interval, datetime)
+)
+"""
+
+
+def _bars(start: str, periods: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 + rng.standard_normal(periods).cumsum()
+    return pd.DataFrame(
+        {"open": close, "high": close + 1, "low": close - 1, "close": close, "volume": rng.integers(1, 1000, periods)},
+        index=pd.date_range(start, periods=periods, freq="h"),
+    ).astype(float)
+
+
+def _write_v1(conn: sqlite3.Connection, df: pd.DataFrame, symbol: str, exchange: str, interval_str: str):
+    """Saves bars the way the v1 DataCache did: naive datetimes via astype(str)."""
+    rows = df.copy()
+    rows["symbol"], rows["exchange"], rows["interval"] = symbol, exchange, interval_str
+    rows.index.name = "datetime"
+    rows = rows.reset_index()
+    rows["datetime"] = rows["datetime"].astype(str)
+    rows.to_sql("klines", conn, if_exists="append", index=False)
+
+
+@pytest.fixture
+def v1_database(tmp_path):
+    path = tmp_path / "v1.db"
+    conn = sqlite3.connect(path)
+    conn.execute(V1_TABLE)
+    _write_v1(conn, _bars("2024-03-01", 300), "BTCUSD", "BITSTAMP", "1H")
+    _write_v1(conn, _bars("2024-03-05", 50, seed=1), "ETHUSD", "BITSTAMP", "1H")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_empty_database_is_created_at_current_version():
+    conn = sqlite3.connect(":memory:")
+    assert get_schema_version(conn) == 0
+    assert migrate(conn) == 0
+    assert get_schema_version(conn) == SCHEMA_VERSION
+
+
+def test_v1_database_is_migrated_with_utc_epoch_seconds(v1_database):
+    conn = sqlite3.connect(v1_database)
+    assert get_schema_version(conn) == 1
+
+    assert migrate(conn) == 1
+    assert get_schema_version(conn) == SCHEMA_VERSION
+
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert "klines_v1" not in tables
+    assert {"symbols", "klines", "session_extremes", "schema_version"} <= tables
+    symbols = conn.execute("SELECT symbol, exchange, interval FROM symbols ORDER BY symbol").fetchall()
+    assert symbols == [("BTCUSD", "BITSTAMP", "1H"), ("ETHUSD", "BITSTAMP", "1H")]
+
+    ts = [row[0] for row in conn.execute(
+        "SELECT ts FROM klines JOIN symbols ON symbols.id = klines.symbol_id WHERE symbol = 'BTCUSD' ORDER BY ts"
+    )]
+    expected = pd.date_range("2024-03-01", periods=300, freq="h").values.astype("datetime64[s]").astype(np.int64)
+    assert ts == expected.tolist()
+
+
+def test_migrated_bars_read_back_unchanged(v1_database):
+    cache = DataCache(str(v1_database), read_connections=1)
+    try:
+        df = cache.get_data("BTCUSD", "BITSTAMP", "1H", 1000)
+        pd.testing.assert_frame_equal(df, _bars("2024-03-01", 300), check_names=False, check_freq=False,
+                                      check_index_type=False)
+        assert len(cache.get_data("ETHUSD", "BITSTAMP", "1H", 1000)) == 50
+    finally:
+        cache.close()
+
+
+def test_migrate_is_idempotent(v1_database):
+    conn = sqlite3.connect(v1_database)
+    migrate(conn)
+    before = conn.execute("SELECT COUNT(*) FROM klines").fetchone()
+    assert migrate(conn) == SCHEMA_VERSION
+    assert conn.execute("SELECT COUNT(*) FROM klines").fetchone() == before
+
+
+def test_newer_schema_is_rejected():
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    conn.execute("UPDATE schema_version SET version = ?", (SCHEMA_VERSION + 1,))
+    with pytest.raises(RuntimeError):
+        migrate(conn)
+
+
+def _histograms(cache: DataCache, symbol: str, kind: str, first_session: int, last_session: int):
+    from_table = cache.get_session_histogram(symbol, "BITSTAMP", "1H", kind, first_session, last_session)
+    bars = cache.get_data(symbol, "BITSTAMP", "1H", 100_000)
+    ts = bars.index.values.astype("datetime64[s]").astype(np.int64)
+    from_bars = session_extremes.histogram_from_bars(
+        ts, bars["high"].to_numpy(), bars["low"].to_numpy(), kind, first_session, last_session
+    )
+    return from_table, from_bars
+
+
+def test_v2_database_gets_session_extremes_rebuilt(tmp_path):
+    path = tmp_path / "v2.db"
+    cache = DataCache(str(path), read_connections=1)
+    cache.save_data(_bars("2024-03-01", 24 * 30), "BTCUSD", "BITSTAMP", "1H")
+    cache.close()
+    conn = sqlite3.connect(path)
+    conn.execute("DROP TABLE session_extremes")
+    conn.execute("UPDATE schema_version SET version = 2")
+    conn.commit()
+    conn.close()
+
+    cache = DataCache(str(path), read_connections=1)
+    try:
+        # 2024-03-04 is a Monday; only whole sessions are compared.
+        first, last = _day_number("2024-03-04"), _day_number("2024-03-25")
+        for kind in (session_extremes.DAILY, session_extremes.WEEKLY):
+            from_table, from_bars = _histograms(cache, "BTCUSD", kind, first, last)
+            assert from_table == from_bars
+            assert from_table[2] > 0
+    finally:
+        cache.close()
+
+
+def test_overlapping_saves_keep_session_extremes_in_sync(tmp_path):
+    cache = DataCache(str(tmp_path / "cache.db"), read_connections=1)
+    try:
+        bars = _bars("2024-03-01", 24 * 21, seed=2)
+        cache.save_data(bars.iloc[:300], "BTCUSD", "BITSTAMP", "1H")
+        # Rewrite the tail with a new extreme, then append the rest.
+        revised = bars.iloc[280:].copy()
+        revised.iloc[5, revised.columns.get_loc("high")] = 1_000.0
+        cache.save_data(revised, "BTCUSD", "BITSTAMP", "1H")
+
+        first, last = _day_number("2024-03-04"), _day_number("2024-03-18")
+        for kind in (session_extremes.DAILY, session_extremes.WEEKLY):
+            from_table, from_bars = _histograms(cache, "BTCUSD", kind, first, last)
+            assert from_table == from_bars
+            assert from_table[2] > 0
+    finally:
+        cache.close()
+
+
+def _day_number(day: str) -> int:
+    return int(np.datetime64(day, "D").astype(np.int64))
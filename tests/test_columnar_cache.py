@@ -0,0 +1,120 @@
+# your_bot_project/tests/test_columnar_cache.py
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.columnar_cache import COLUMN_DTYPES, ColumnarCache
+from services.data_cache import DataCache
+
+KEY = ("BTCUSD", "BITSTAMP", "1H")
+START = pd.Timestamp("2025-03-01")
+
+
+def _bars(first_hour: int, count: int, price: float = 100.0) -> pd.DataFrame:
+    """Hourly bars starting `first_hour` hours after START, with prices tagged by `price`."""
+    offsets = np.arange(first_hour, first_hour + count)
+    close = price + offsets / 1000
+    return pd.DataFrame(
+        {"open": close, "high": close + 1, "low": close - 1, "close": close, "volume": offsets.astype(float)},
+        index=pd.DatetimeIndex(START + pd.to_timedelta(offsets, unit="h"), name="datetime"),
+    )
+
+
+def _epoch(hours: int) -> int:
+    return int((START + pd.Timedelta(hours=hours)).timestamp())
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ColumnarCache(str(tmp_path / "columnar"))
+    yield cache
+    cache.close()
+
+
+def _generations(cache: ColumnarCache) -> list:
+    series_dir = cache._series_dir(KEY)
+    return sorted(name for name in os.listdir(series_dir) if name.startswith("g"))
+
+
+@pytest.mark.parametrize("update", [
+    _bars(50, 5),                    # append past the end
+    _bars(47, 6, price=200.0),       # rewrite the tail and append
+    _bars(49, 1, price=200.0),       # rewrite the forming bar
+    _bars(10, 3, price=200.0),       # rewrite inside the series
+    _bars(-5, 10, price=200.0),      # backfill older history
+], ids=["append", "overlap", "last_bar", "inside", "backfill"])
+def test_views_taken_before_a_save_keep_their_contents(cache, update):
+    cache.save_data(_bars(0, 50), *KEY)
+    held = cache.get_data(*KEY, 50)
+    held_range = cache.get_range(*KEY, _epoch(0), _epoch(49))
+    before = held.copy()
+
+    cache.save_data(update, *KEY)
+
+    pd.testing.assert_frame_equal(held, before)
+    pd.testing.assert_frame_equal(held_range, before)
+    # Later reads see the update, and the replaced generation is gone.
+    latest = cache.get_data(*KEY, 1000)
+    expected = pd.concat([_bars(0, 50), update])
+    expected = expected[~expected.index.duplicated(keep="last")].sort_index()
+    np.testing.assert_array_equal(latest["close"].to_numpy(), expected["close"].to_numpy())
+    assert len(_generations(cache)) == 1
+
+
+def test_saves_report_the_same_counts_as_the_sqlite_cache(cache, tmp_path):
+    sqlite = DataCache(str(tmp_path / "cache.db"), read_connections=1)
+    try:
+        for update in [_bars(0, 30), _bars(30, 5), _bars(33, 4, price=200.0), _bars(10, 3, price=300.0),
+                       _bars(-5, 10, price=400.0), _bars(35, 1, price=500.0)]:
+            assert cache.save_data(update, *KEY) == sqlite.save_data(update, *KEY)
+        expected = sqlite.get_data(*KEY, 1000)
+        actual = cache.get_data(*KEY, 1000)
+        np.testing.assert_array_equal(actual.index.values, expected.index.values)
+        for col in ("open", "high", "low", "close", "volume"):
+            np.testing.assert_array_equal(actual[col].to_numpy(), expected[col].to_numpy())
+    finally:
+        sqlite.close()
+
+
+def test_get_range_outside_the_series_returns_none(cache):
+    cache.save_data(_bars(0, 50), *KEY)
+    assert cache.get_range(*KEY, _epoch(60), _epoch(100)) is None
+    assert cache.get_range(*KEY, _epoch(-100), _epoch(-1)) is None
+    assert cache.get_range(*KEY, _epoch(49), np.iinfo(np.int64).max).index[0] == START + pd.Timedelta(hours=49)
+    assert cache.get_range("ETHUSD", "BITSTAMP", "1H", _epoch(0), _epoch(10)) is None
+
+
+def test_get_range_limit_reads_chunks_oldest_first(cache):
+    cache.save_data(_bars(0, 50), *KEY)
+    chunk = cache.get_range(*KEY, _epoch(5), _epoch(49), limit=10)
+    assert len(chunk) == 10
+    assert chunk.index[0] == START + pd.Timedelta(hours=5)
+
+
+def test_get_range_on_damaged_files_returns_none(cache):
+    cache.save_data(_bars(0, 50), *KEY)
+    generation = cache._current_generation(cache._series_dir(KEY))
+    cache.close()
+    # An unreadable column instead of a raw array file.
+    column = os.path.join(generation, "ts")
+    os.remove(column)
+    os.mkdir(column)
+    assert cache.get_range(*KEY, _epoch(0), _epoch(10)) is None
+    assert cache.get_data(*KEY, 10) is None
+
+
+def test_interrupted_append_is_trimmed_on_the_next_save(cache):
+    cache.save_data(_bars(0, 20), *KEY)
+    generation = cache._current_generation(cache._series_dir(KEY))
+    # Half of an append made it to one column only.
+    with open(os.path.join(generation, "close"), "ab") as f:
+        f.write(np.zeros(3, dtype=COLUMN_DTYPES["close"]).tobytes())
+    cache.close()
+    assert len(cache.get_data(*KEY, 100)) == 20
+
+    cache.save_data(_bars(20, 5), *KEY)
+    data = cache.get_data(*KEY, 100)
+    np.testing.assert_array_equal(data["close"].to_numpy(), _bars(0, 25)["close"].to_numpy())
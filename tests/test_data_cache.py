@@ -0,0 +1,53 @@
+# your_bot_project/tests/test_data_cache.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.data_cache import DataCache
+
+KEY = ("BTCUSD", "BITSTAMP", "1H")
+START = pd.Timestamp("2025-03-01")
+
+
+def _bars(first_hour: int, count: int, price: float = 100.0) -> pd.DataFrame:
+    """Hourly bars starting `first_hour` hours after START, with prices tagged by `price`."""
+    offsets = np.arange(first_hour, first_hour + count)
+    close = price + offsets / 1000
+    return pd.DataFrame(
+        {"open": close, "high": close + 1, "low": close - 1, "close": close, "volume": offsets.astype(float)},
+        index=pd.DatetimeIndex(START + pd.to_timedelta(offsets, unit="h"), name="datetime"),
+    )
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = DataCache(str(tmp_path / "cache.db"), read_connections=1)
+    yield cache
+    cache.close()
+
+
+def test_save_counts_inserted_and_updated_rows(cache):
+    assert cache.save_data(_bars(0, 500), *KEY) == (500, 0)
+    assert cache.save_data(_bars(490, 30, price=200.0), *KEY) == (20, 10)
+    assert cache.save_data(_bars(-10, 10), *KEY) == (10, 0)
+    # A batch spanning a gap: only the bars actually stored count as updated.
+    assert cache.save_data(pd.concat([_bars(-20, 9), _bars(0, 11, price=300.0)]), *KEY) == (9, 11)
+    assert len(cache.get_data(*KEY, 10_000)) == 539
+
+
+def test_repeated_bars_in_one_batch_are_written_once(cache):
+    batch = pd.concat([_bars(0, 10), _bars(5, 3, price=200.0)])
+    assert cache.save_data(batch, *KEY) == (10, 0)
+    data = cache.get_data(*KEY, 100)
+    assert len(data) == 10
+    # The last of the repeated bars wins.
+    np.testing.assert_array_equal(data["close"].to_numpy()[5:8], _bars(5, 3, price=200.0)["close"].to_numpy())
+
+    assert cache.save_data(pd.concat([_bars(9, 2), _bars(9, 2, price=300.0)]), *KEY) == (1, 1)
+    assert cache.get_data(*KEY, 1)["close"].iloc[0] == _bars(10, 1, price=300.0)["close"].iloc[0]
+
+
+def test_empty_batch_writes_nothing(cache):
+    assert cache.save_data(_bars(0, 0), *KEY) == (0, 0)
+    assert cache.get_data(*KEY, 10) is None
@@ -0,0 +1,86 @@
+# your_bot_project/tests/test_data_provider.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("tvDatafeed")
+
+from tvDatafeed import Interval
+
+from services.data_cache import DataCache
+from services.data_provider import TradingViewDataProvider
+
+SYMBOL, EXCHANGE = "BTCUSD", "BITSTAMP"
+
+
+def _bars(count: int, hours_behind: int = 0) -> pd.DataFrame:
+    """Hourly bars whose newest one is `hours_behind` hours before the current UTC hour."""
+    end = pd.Timestamp.now(tz="UTC").tz_localize(None).floor("h") - pd.Timedelta(hours=hours_behind)
+    close = 100 + np.arange(count) / 100
+    return pd.DataFrame(
+        {"open": close, "high": close + 1, "low": close - 1, "close": close, "volume": 1.0},
+        index=pd.date_range(end=end, periods=count, freq="h", name="datetime"),
+    )
+
+
+class FakeDatafeed:
+    """Serves the latest n_bars of an always up-to-date series."""
+    def get_hist(self, symbol, exchange, interval, n_bars):
+        return _bars(n_bars)
+
+
+@pytest.fixture
+def provider(tmp_path, monkeypatch):
+    TradingViewDataProvider._instance = None
+    cache = DataCache(str(tmp_path / "cache.db"), read_connections=1)
+    provider = TradingViewDataProvider(cache=cache, datafeed_factory=FakeDatafeed)
+    assert provider.wait_until_ready(5)
+    calls = []
+    get_hist = provider._get_hist
+
+    def counting_get_hist(symbol, exchange, interval, n_bars, *args, **kwargs):
+        calls.append(n_bars)
+        return get_hist(symbol, exchange, interval, n_bars, *args, **kwargs)
+
+    monkeypatch.setattr(provider, "_get_hist", counting_get_hist)
+    provider.upstream_calls = calls
+    yield provider
+    provider.close()
+    cache.close()
+    TradingViewDataProvider._instance = None
+
+
+def test_full_cache_hit_makes_no_upstream_call(provider):
+    provider.cache.save_data(_bars(500), SYMBOL, EXCHANGE, Interval.in_1_hour.value)
+    data = provider.get_historical_data(SYMBOL, EXCHANGE, Interval.in_1_hour, 300)
+    assert len(data) == 300
+    assert provider.upstream_calls == []
+
+
+def test_stale_tail_is_topped_up_with_one_small_call(provider):
+    provider.cache.save_data(_bars(500, hours_behind=10), SYMBOL, EXCHANGE, Interval.in_1_hour.value)
+    data = provider.get_historical_data(SYMBOL, EXCHANGE, Interval.in_1_hour, 300)
+    assert len(data) == 300
+    assert data.index[-1] == _bars(1).index[-1]
+    assert len(provider.upstream_calls) == 1
+    assert provider.upstream_calls[0] < 20
+    assert provider.upstream_stats["tail_topups"] == 1
+    assert provider.upstream_stats["full_fetches"] == 0
+
+
+def test_short_cache_goes_straight_to_one_full_fetch(provider):
+    provider.cache.save_data(_bars(200, hours_behind=10), SYMBOL, EXCHANGE, Interval.in_1_hour.value)
+    data = provider.get_historical_data(SYMBOL, EXCHANGE, Interval.in_1_hour, 1000)
+    assert len(data) == 1000
+    assert provider.upstream_calls == [1000]
+    assert provider.upstream_stats["tail_topups"] == 0
+    assert provider.upstream_stats["full_fetches"] == 1
+
+
+def test_short_cache_whose_tail_gap_fills_it_is_topped_up(provider):
+    provider.cache.save_data(_bars(290, hours_behind=20), SYMBOL, EXCHANGE, Interval.in_1_hour.value)
+    data = provider.get_historical_data(SYMBOL, EXCHANGE, Interval.in_1_hour, 300)
+    assert len(data) == 300
+    assert len(provider.upstream_calls) == 1
+    assert provider.upstream_stats["tail_topups"] == 1
@@ -0,0 +1,173 @@
+# your_bot_project/tests/test_extremum_engine.py
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import DEFAULT_END, generate_ohlcv
+from config import NEW_YORK_TIMEZONE
+from services.statistics import StreamingStats, calculate_daily_stats, calculate_weekly_stats
+
+# The reference's to_period('W-SUN') drops the timezone on purpose; the week start is a date.
+pytestmark = pytest.mark.filterwarnings("ignore:Converting to PeriodArray")
+
+
+# --- Reference: the original pandas implementation, with `now` made explicit ---
+
+def reference_daily_stats(data: pd.DataFrame, days_n: int, now: datetime):
+    data = data.copy()
+    if data.index.tz is None:
+        data.index = data.index.tz_localize('UTC')
+    data.index = data.index.tz_convert(NEW_YORK_TIMEZONE)
+    data_reset = data.reset_index()
+    data_reset.rename(columns={'datetime': 'Datetime'}, inplace=True)
+
+    end_date_filter = now.astimezone(NEW_YORK_TIMEZONE)
+    start_date_filter = end_date_filter - timedelta(days=days_n)
+    data_filtered = data_reset[
+        (data_reset['Datetime'] >= start_date_filter) &
+        (data_reset['Datetime'] <= end_date_filter)
+    ].copy()
+    if data_filtered.empty:
+        return None
+
+    data_filtered['DateOnly'] = data_filtered['Datetime'].dt.date
+    high_counts = [0] * 24
+    low_counts = [0] * 24
+    for _, daily_data in data_filtered.groupby('DateOnly'):
+        high_hour = daily_data[daily_data['high'] == daily_data['high'].max()]['Datetime'].min().hour
+        low_hour = daily_data[daily_data['low'] == daily_data['low'].min()]['Datetime'].min().hour
+        high_counts[high_hour] += 1
+        low_counts[low_hour] += 1
+    return high_counts, low_counts, data_filtered['DateOnly'].nunique()
+
+
+def reference_weekly_stats(data: pd.DataFrame, weeks_n: int, now: datetime):
+    data = data.copy()
+    if data.index.tz is None:
+        data.index = data.index.tz_localize('UTC')
+    data.index = data.index.tz_convert(NEW_YORK_TIMEZONE)
+    data_reset = data.reset_index()
+    data_reset.rename(columns={'datetime': 'Datetime'}, inplace=True)
+
+    today = now.astimezone(NEW_YORK_TIMEZONE).date()
+    end_date = today - timedelta(days=(today.weekday() + 1) % 7)
+    end = datetime.combine(end_date, datetime.max.time()).replace(tzinfo=NEW_YORK_TIMEZONE)
+    start_date = end_date - timedelta(weeks=weeks_n - 1, days=6)
+    start = datetime.combine(start_date, datetime.min.time()).replace(tzinfo=NEW_YORK_TIMEZONE)
+    data_filtered = data_reset[(data_reset['Datetime'] >= start) & (data_reset['Datetime'] <= end)].copy()
+    if data_filtered.empty:
+        return None
+
+    data_filtered['WeekStart'] = data_filtered['Datetime'].dt.to_period('W-SUN').apply(lambda r: r.start_time).dt.date
+    high_counts = [0] * 7
+    low_counts = [0] * 7
+    for _, weekly_data in data_filtered.groupby('WeekStart'):
+        high_day = weekly_data[weekly_data['high'] == weekly_data['high'].max()]['Datetime'].min()
+        low_day = weekly_data[weekly_data['low'] == weekly_data['low'].min()]['Datetime'].min()
+        high_counts[high_day.weekday()] += 1
+        low_counts[low_day.weekday()] += 1
+    return high_counts, low_counts, data_filtered['WeekStart'].nunique()
+
+
+# --- Fixtures ---
+
+# Mid-session reference times: after both 2025 DST changes, and one on a Sunday evening.
+NOW_VALUES = [
+    datetime(2026, 1, 1, 15, 30, tzinfo=NEW_YORK_TIMEZONE),
+    datetime(2025, 11, 9, 20, 0, tzinfo=NEW_YORK_TIMEZONE),
+]
+DAILY_AND_WEEKLY = [
+    (calculate_daily_stats, reference_daily_stats, 300),
+    (calculate_weekly_stats, reference_weekly_stats, 40),
+]
+
+
+def _series(profile: str) -> pd.DataFrame:
+    data = generate_ohlcv("TEST", 400, profile=profile, end=DEFAULT_END)
+    return data.drop(columns="symbol")
+
+
+def _with_ties(data: pd.DataFrame) -> pd.DataFrame:
+    """Rounds prices so sessions have repeated highs and lows; the first occurrence must win."""
+    data = data.copy()
+    data[["high", "low"]] = data[["high", "low"]].round(0)
+    return data
+
+
+def _with_nan_rows(data: pd.DataFrame) -> pd.DataFrame:
+    """Blanks a few bars' prices without emptying a whole session."""
+    data = data.copy()
+    rng = np.random.default_rng(7)
+    rows = rng.choice(len(data), size=len(data) // 30, replace=False)
+    data.iloc[rows, data.columns.get_loc("high")] = np.nan
+    data.iloc[rng.permutation(rows)[: len(rows) // 2], data.columns.get_loc("low")] = np.nan
+    return data
+
+
+def _tz_aware(data: pd.DataFrame) -> pd.DataFrame:
+    data = data.copy()
+    data.index = data.index.tz_localize("UTC").tz_convert("Asia/Tokyo")
+    return data
+
+
+def _shuffled(data: pd.DataFrame) -> pd.DataFrame:
+    return data.sample(frac=1.0, random_state=3)
+
+
+VARIANTS = {
+    "plain": lambda data: data,
+    "ties": _with_ties,
+    "nan_rows": _with_nan_rows,
+    "tz_aware": _tz_aware,
+    "unsorted": _shuffled,
+}
+
+
+@pytest.fixture(scope="module", params=["crypto", "cme_futures"])
+def series(request):
+    return _series(request.param)
+
+
+# --- Equivalence ---
+
+@pytest.mark.parametrize("variant", VARIANTS)
+@pytest.mark.parametrize("now", NOW_VALUES, ids=["new_year", "sunday_evening"])
+@pytest.mark.parametrize("calculate, reference, n_value", DAILY_AND_WEEKLY, ids=["daily", "weekly"])
+def test_engine_matches_reference(series, variant, now, calculate, reference, n_value):
+    data = VARIANTS[variant](series)
+    expected = reference(data, n_value, now)
+    assert expected is not None
+    assert calculate(data.copy(), n_value, now) == expected
+
+
+@pytest.mark.parametrize("calculate, reference, n_value", DAILY_AND_WEEKLY, ids=["daily", "weekly"])
+def test_engine_does_not_modify_input(series, calculate, reference, n_value):
+    data = _tz_aware(series)
+    before = data.copy()
+    calculate(data, n_value, NOW_VALUES[0])
+    pd.testing.assert_frame_equal(data, before)
+
+
+@pytest.mark.parametrize("calculate, reference, n_value", DAILY_AND_WEEKLY, ids=["daily", "weekly"])
+def test_no_bars_in_period_returns_none(series, calculate, reference, n_value):
+    now = datetime(2020, 1, 1, tzinfo=NEW_YORK_TIMEZONE)
+    assert reference(series, n_value, now) is None
+    assert calculate(series.copy(), n_value, now) is None
+    assert calculate(series.iloc[:0], n_value, now) is None
+
+
+@pytest.mark.parametrize("stats_type, reference, n_value", [
+    ("daily", reference_daily_stats, 300),
+    ("weekly", reference_weekly_stats, 40),
+], ids=["daily", "weekly"])
+@pytest.mark.parametrize("chunk_bars", [7, 97, 5000])
+def test_streaming_stats_match_reference(series, stats_type, reference, n_value, chunk_bars):
+    data = _with_ties(series)
+    now = NOW_VALUES[0]
+    stats = StreamingStats(stats_type, n_value, now)
+    for start in range(0, len(data), chunk_bars):
+        stats.add(data.iloc[start:start + chunk_bars])
+    assert stats.result() == reference(data, n_value, now)
@@ -0,0 +1,100 @@
+# your_bot_project/tests/test_handlers.py
+
+import asyncio
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bot.handlers import BotHandlers
+from bot.state_manager import StateManager
+from config import ASSET_EXCHANGE_MAP
+from services.data_cache import DataCache
+from services.executor import TaskExecutor
+
+
+class FakeMessage:
+    """Records the texts a handler sends and edits."""
+    def __init__(self):
+        self.texts = []
+
+    async def reply_text(self, text, **kwargs):
+        self.texts.append(text)
+        return self
+
+    async def edit_text(self, text, **kwargs):
+        self.texts.append(text)
+        return self
+
+
+def _handlers() -> BotHandlers:
+    return BotHandlers(StateManager(), data_provider=object(), executor=None)
+
+
+def test_compare_keeps_streaming_when_one_asset_fails(monkeypatch):
+    handlers = _handlers()
+    assets = list(ASSET_EXCHANGE_MAP)
+    failing = assets[1]
+
+    async def fetch_bars(stats_type, asset_symbol, exchange, n_value, priority=None):
+        if asset_symbol == failing:
+            raise ValueError("odd data")
+        return asset_symbol
+
+    async def compute_stats(stats_type, asset_symbol, exchange, n_value, raw_data, now, on_progress=None):
+        return [0] * 23 + [1], [1] + [0] * 23, n_value
+
+    monkeypatch.setattr(handlers, "_fetch_bars", fetch_bars)
+    monkeypatch.setattr(handlers, "_compute_stats", compute_stats)
+    message = FakeMessage()
+    asyncio.run(handlers._run_compare(message, "daily", 5))
+
+    final = message.texts[-1]
+    assert f"進度: {len(assets)}/{len(assets)}" in final
+    assert "計算中" not in final
+    assert f"{failing}: ⚠️ 無法獲取或分析數據" in final
+    for asset in assets:
+        if asset != failing:
+            assert f"{asset} (5 天)" in final
+
+
+class CacheOnlyProvider:
+    """Answers every fetch from whatever the cache holds, like a cold cache with upstream capped."""
+    def __init__(self, cache):
+        self.cache = cache
+
+    def get_historical_data(self, symbol, exchange, interval, n_bars, priority=None):
+        return self.cache.get_data(symbol, exchange, interval.value, n_bars)
+
+    def freshness(self, symbol, exchange, interval, data):
+        return {"latest_bar": None, "missing_bars": 0, "refreshing": False, "degraded": False}
+
+
+@pytest.fixture
+def short_cache_handlers(tmp_path):
+    pytest.importorskip("tvDatafeed")
+    cache = DataCache(str(tmp_path / "cache.db"), read_connections=1)
+    end = pd.Timestamp.now(tz="UTC").tz_localize(None).floor("h")
+    index = pd.date_range(end=end, periods=24 * 7 * 10, freq="h", name="datetime")
+    close = 100 + np.sin(np.arange(len(index)) / 5)
+    bars = pd.DataFrame({"open": close, "high": close + 1, "low": close - 1, "close": close, "volume": 1.0}, index=index)
+    cache.save_data(bars, "NQ1!", "CME_MINI", "1H")
+    executor = TaskExecutor(io_workers=2, cpu_workers=0)
+    handlers = BotHandlers(StateManager(), data_provider=CacheOnlyProvider(cache), executor=executor)
+    yield handlers
+    executor.shutdown()
+    cache.close()
+
+
+@pytest.mark.parametrize("stats_type, n_value, unit", [("daily", 300, "天"), ("weekly", 52, "週")])
+def test_report_over_a_short_cache_says_it_is_truncated(short_cache_handlers, stats_type, n_value, unit):
+    report = asyncio.run(short_cache_handlers._build_report(stats_type, "NQ1!", "CME_MINI", n_value))
+    processed = int(re.search(f"統計{unit}數: (\\d+)", report).group(1))
+    assert processed < n_value
+    assert f"快取僅涵蓋 {processed}/{n_value} {unit}" in report
+
+
+def test_report_covering_the_period_has_no_notice(short_cache_handlers):
+    report = asyncio.run(short_cache_handlers._build_report("daily", "NQ1!", "CME_MINI", 30))
+    assert "快取僅涵蓋" not in report
@@ -0,0 +1,116 @@
+# your_bot_project/tests/test_rate_limiter.py
+
+import threading
+import time
+
+import pytest
+
+from services.rate_limiter import BACKGROUND, INTERACTIVE, UpstreamLimiter
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting for condition")
+        time.sleep(0.001)
+
+
+def test_burst_is_granted_without_waiting():
+    limiter = UpstreamLimiter(rate_per_second=0.001, burst=3, max_in_flight=10)
+    for _ in range(3):
+        assert limiter.acquire(timeout=1) < 0.1
+    assert limiter.status()["in_flight"] == 3
+    assert limiter.status()["tokens"] == 0
+
+
+def test_empty_bucket_times_out_and_leaves_the_queue():
+    limiter = UpstreamLimiter(rate_per_second=0.001, burst=1, max_in_flight=10)
+    limiter.acquire()
+    with pytest.raises(TimeoutError):
+        limiter.acquire(timeout=0.05)
+    status = limiter.status()
+    assert status["queue_depth"] == 0
+    assert status["priorities"]["interactive"]["timeouts"] == 1
+    assert status["priorities"]["interactive"]["granted"] == 1
+
+
+def test_bucket_refills_at_the_configured_rate():
+    limiter = UpstreamLimiter(rate_per_second=20, burst=1, max_in_flight=10)
+    limiter.acquire()
+    waited = limiter.acquire(timeout=2)
+    # One token takes 50ms to refill.
+    assert 0.03 <= waited < 1.0
+
+
+def test_cost_is_capped_at_burst():
+    limiter = UpstreamLimiter(rate_per_second=0.001, burst=2, max_in_flight=10)
+    assert limiter.acquire(cost=10, timeout=1) < 0.1
+    with pytest.raises(TimeoutError):
+        limiter.acquire(timeout=0.05)
+
+
+def test_larger_cost_takes_more_tokens():
+    limiter = UpstreamLimiter(rate_per_second=0.001, burst=3, max_in_flight=10)
+    limiter.acquire(cost=2)
+    limiter.acquire(cost=1)
+    with pytest.raises(TimeoutError):
+        limiter.acquire(cost=1, timeout=0.05)
+
+
+def test_max_in_flight_blocks_until_release():
+    limiter = UpstreamLimiter(rate_per_second=1000, burst=10, max_in_flight=1)
+    with limiter.slot():
+        with pytest.raises(TimeoutError):
+            limiter.acquire(timeout=0.05)
+    with limiter.slot(timeout=1):
+        assert limiter.status()["in_flight"] == 1
+    assert limiter.status()["in_flight"] == 0
+
+
+def test_interactive_request_overtakes_queued_background_requests():
+    limiter = UpstreamLimiter(rate_per_second=1000, burst=10, max_in_flight=1)
+    order = []
+
+    def worker(name, priority):
+        with limiter.slot(priority, timeout=5):
+            order.append(name)
+
+    limiter.acquire()
+    threads = []
+    for name, priority in [("background-1", BACKGROUND), ("background-2", BACKGROUND), ("interactive", INTERACTIVE)]:
+        thread = threading.Thread(target=worker, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        _wait_for(lambda: limiter.status()["queue_depth"] == len(threads))
+    limiter.release()
+    for thread in threads:
+        thread.join(5)
+
+    assert order == ["interactive", "background-1", "background-2"]
+    assert limiter.max_queue_depth == 3
+    priorities = limiter.status()["priorities"]
+    assert priorities["interactive"]["granted"] == 2
+    assert priorities["background"]["granted"] == 2
+
+
+def test_timed_out_head_does_not_block_the_queue():
+    limiter = UpstreamLimiter(rate_per_second=1000, burst=10, max_in_flight=1)
+    limiter.acquire()
+    granted = []
+
+    def background():
+        with limiter.slot(BACKGROUND, timeout=5):
+            granted.append(True)
+
+    waiter = threading.Thread(target=background)
+    waiter.start()
+    _wait_for(lambda: limiter.status()["queue_depth"] == 1)
+    # The interactive caller goes ahead of the background one, then gives up.
+    with pytest.raises(TimeoutError):
+        limiter.acquire(INTERACTIVE, timeout=0.05)
+    limiter.release()
+    waiter.join(5)
+
+    assert granted == [True]
+    assert limiter.status()["queue_depth"] == 0
@@ -0,0 +1,118 @@
+# your_bot_project/tests/test_resilience.py
+
+import types
+
+import pytest
+
+from services import resilience
+from services.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, RetryPolicy
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience, "time", types.SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def _open(breaker: CircuitBreaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.before_call()
+        breaker.record_failure()
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("TEST", failure_threshold=3, reset_seconds=30)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.stats["opened"] == 1
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker("TEST", failure_threshold=3, reset_seconds=30)
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.record_success()
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_open_breaker_rejects_calls_until_reset(clock):
+    breaker = CircuitBreaker("TEST", failure_threshold=2, reset_seconds=30)
+    _open(breaker)
+    clock.now += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.stats["rejected"] == 2
+    status = breaker.status()
+    assert status["state"] == OPEN
+    assert status["retry_in_seconds"] == 1.0
+
+
+def test_half_open_lets_a_single_trial_through(clock):
+    breaker = CircuitBreaker("TEST", failure_threshold=2, reset_seconds=30)
+    _open(breaker)
+    clock.now += 30
+    assert breaker.state == HALF_OPEN
+
+    breaker.before_call()
+    # Other callers are still rejected while the trial runs.
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.state == HALF_OPEN
+
+
+def test_successful_trial_closes_the_breaker(clock):
+    breaker = CircuitBreaker("TEST", failure_threshold=2, reset_seconds=30)
+    _open(breaker)
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_success()
+
+    assert breaker.state == CLOSED
+    breaker.before_call()
+    # A fresh run of failures is needed to open it again.
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_failed_trial_reopens_the_breaker(clock):
+    breaker = CircuitBreaker("TEST", failure_threshold=2, reset_seconds=30)
+    _open(breaker)
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    # The reset period starts over from the failed trial.
+    clock.now += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock.now += 1
+    breaker.before_call()
+    assert breaker.stats["opened"] == 1
+
+
+@pytest.mark.parametrize("attempt, cap", [(1, 0.5), (2, 1.0), (3, 2.0), (4, 4.0), (10, 4.0)])
+def test_backoff_is_jittered_below_the_exponential_cap(attempt, cap):
+    policy = RetryPolicy(base_delay=0.5, max_delay=4.0)
+    delays = [policy.backoff(attempt) for _ in range(200)]
+    assert all(0.0 <= delay <= cap for delay in delays)
+    assert max(delays) > cap / 2
@@ -0,0 +1,134 @@
+# your_bot_project/tests/test_singleflight.py
+
+import threading
+import time
+
+import pytest
+
+from services.singleflight import SingleFlight
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting for condition")
+        time.sleep(0.001)
+
+
+def _run(target, *args):
+    results = []
+    thread = threading.Thread(target=lambda: results.append(target(*args)))
+    thread.start()
+    return thread, results
+
+
+def test_concurrent_calls_for_same_key_share_one_upstream_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return "bars"
+
+    leader, leader_result = _run(flight.do, "BTC", 100, fetch)
+    _wait_for(lambda: calls)
+    followers = [_run(flight.do, "BTC", 50, fetch) for _ in range(3)]
+    _wait_for(lambda: flight.stats["coalesced_calls"] == 3)
+    release.set()
+    for thread, _ in [(leader, leader_result)] + followers:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert leader_result == [("bars", False)]
+    assert all(result == [("bars", True)] for _, result in followers)
+    assert flight.stats == {"upstream_calls": 1, "coalesced_calls": 3}
+    assert not flight._flights
+
+
+def test_larger_request_does_not_join_smaller_flight():
+    flight = SingleFlight()
+    release = threading.Event()
+    started = []
+
+    def fetch(size):
+        def call():
+            started.append(size)
+            release.wait(5)
+            return size
+        return call
+
+    small, small_result = _run(flight.do, "BTC", 100, fetch(100))
+    _wait_for(lambda: started)
+    large, large_result = _run(flight.do, "BTC", 500, fetch(500))
+    _wait_for(lambda: len(started) == 2)
+    release.set()
+    small.join(5)
+    large.join(5)
+
+    assert small_result == [(100, False)]
+    assert large_result == [(500, False)]
+    assert flight.stats == {"upstream_calls": 2, "coalesced_calls": 0}
+    assert not flight._flights
+
+
+def test_different_keys_are_not_coalesced():
+    flight = SingleFlight()
+    assert flight.do("BTC", 10, lambda: 1) == (1, False)
+    assert flight.do("ETH", 10, lambda: 2) == (2, False)
+    assert flight.stats["coalesced_calls"] == 0
+
+
+def test_leader_error_is_raised_to_waiters():
+    flight = SingleFlight()
+    release = threading.Event()
+    started = threading.Event()
+
+    def fetch():
+        started.set()
+        release.wait(5)
+        raise ConnectionError("upstream down")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("BTC", 10, fetch)
+        except ConnectionError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    _wait_for(lambda: flight.stats["coalesced_calls"] == 1)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert len(errors) == 2
+    assert errors[0] is errors[1]
+    assert not flight._flights
+    # The failed flight is gone, so the next call goes upstream again.
+    assert flight.do("BTC", 10, lambda: "ok") == ("ok", False)
+
+
+def test_sequential_calls_do_not_share_results():
+    flight = SingleFlight()
+    assert flight.do("BTC", 10, lambda: 1) == (1, False)
+    assert flight.do("BTC", 10, lambda: 2) == (2, False)
+    assert flight.stats == {"upstream_calls": 2, "coalesced_calls": 0}
+
+
+def test_leader_exception_propagates_without_waiters():
+    flight = SingleFlight()
+
+    def fetch():
+        raise ValueError("bad")
+
+    with pytest.raises(ValueError):
+        flight.do("BTC", 10, fetch)
+    assert not flight._flights
@@ -0,0 +1,49 @@
+# your_bot_project/tests/test_sqlite_store.py
+
+import sqlite3
+import threading
+
+import pytest
+
+from services.sqlite_store import SQLiteStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteStore(str(tmp_path / "store.db"), read_connections=1)
+    store.write(lambda conn: conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY)"))
+    store.write(lambda conn: conn.executemany("INSERT INTO items (id) VALUES (?)", [(1,), (2,)]))
+    yield store
+    store.close()
+
+
+def _count(conn):
+    return conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+
+def test_reads_see_committed_writes(store):
+    assert store.read(_count) == 2
+
+
+def test_failed_reader_connect_gives_its_slot_back(store, monkeypatch):
+    connect = store._connect
+    failures = [sqlite3.OperationalError("unable to open database file")] * 3
+
+    def flaky_connect(readonly):
+        if readonly and failures:
+            raise failures.pop()
+        return connect(readonly)
+
+    monkeypatch.setattr(store, "_connect", flaky_connect)
+    for _ in range(3):
+        with pytest.raises(sqlite3.OperationalError):
+            store.read(_count)
+        assert store._reader_count == 0
+
+    # With the single slot leaked this would wait forever for a connection.
+    result = []
+    reader = threading.Thread(target=lambda: result.append(store.read(_count)), daemon=True)
+    reader.start()
+    reader.join(5)
+    assert result == [2]
+    assert store._reader_count == 1
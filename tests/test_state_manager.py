@@ -0,0 +1,116 @@
+# your_bot_project/tests/test_state_manager.py
+
+import types
+
+import pytest
+
+from bot import state_manager as state_module
+from bot.state_manager import StateManager
+from config import State
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(state_module, "time", types.SimpleNamespace(time=clock.time))
+    return clock
+
+
+def test_least_recently_used_session_is_evicted(clock):
+    states = StateManager(max_sessions=3)
+    for user_id in (1, 2, 3):
+        states.set_state(user_id, State.DAILY_STATS_ASSET_SELECTION)
+        clock.now += 1
+    # Touching user 1 makes user 2 the least recently used.
+    assert states.get_state(1) == State.DAILY_STATS_ASSET_SELECTION
+    states.set_state(4, State.WEEKLY_STATS_ASSET_SELECTION)
+
+    assert len(states) == 3
+    assert states.get_state(2) == State.START
+    assert states.get_state(1) == State.DAILY_STATS_ASSET_SELECTION
+    assert states.get_state(4) == State.WEEKLY_STATS_ASSET_SELECTION
+    assert states.stats["evicted"] == 1
+
+
+def test_idle_sessions_expire(clock):
+    states = StateManager(idle_ttl_seconds=60)
+    states.set_state(1, State.DAILY_STATS_ASSET_SELECTION)
+    states.set_data(1, "asset_symbol", "NQ1!")
+    clock.now += 59
+    assert states.get_data(1) == {"asset_symbol": "NQ1!"}
+
+    clock.now += 61
+    assert states.get_state(1) == State.START
+    assert states.get_data(1) == {}
+    assert states.stats["expired"] == 1
+
+
+def test_expired_sessions_are_pruned_when_others_arrive(clock):
+    states = StateManager(idle_ttl_seconds=60)
+    states.set_state(1, State.DAILY_STATS_ASSET_SELECTION)
+    states.set_state(2, State.DAILY_STATS_ASSET_SELECTION)
+    clock.now += 120
+    states.set_state(3, State.DAILY_STATS_ASSET_SELECTION)
+    assert len(states) == 1
+    assert states.stats["expired"] == 2
+
+
+def test_sessions_survive_a_restart(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    states = StateManager(db_path=db_path)
+    states.set_state(1, State.WEEKLY_STATS_ASSET_SELECTION)
+    states.set_data(1, "asset_symbol", "ES1!")
+    states.set_state(2, State.DAILY_STATS_ASSET_SELECTION)
+    states.clear_state(2)
+    states.close()
+
+    restored = StateManager(db_path=db_path)
+    try:
+        assert len(restored) == 1
+        assert restored.get_state(1) == State.WEEKLY_STATS_ASSET_SELECTION
+        assert restored.get_data(1) == {"asset_symbol": "ES1!"}
+        assert restored.get_state(2) == State.START
+    finally:
+        restored.close()
+
+
+def test_restart_drops_sessions_past_the_cap(tmp_path, clock):
+    db_path = str(tmp_path / "sessions.db")
+    states = StateManager(db_path=db_path)
+    for user_id in range(5):
+        states.set_state(user_id, State.DAILY_STATS_ASSET_SELECTION)
+        clock.now += 1
+    states.close()
+
+    restored = StateManager(max_sessions=2, db_path=db_path)
+    try:
+        # The most recently seen sessions are kept.
+        assert sorted(restored._user_states) == [3, 4]
+    finally:
+        restored.close()
+
+
+def test_worker_restores_only_its_own_shard(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    states = StateManager(db_path=db_path)
+    for user_id in range(6):
+        states.set_data(user_id, "asset_symbol", f"asset-{user_id}")
+    states.close()
+
+    even = StateManager(db_path=db_path, shard=(0, 2))
+    odd = StateManager(db_path=db_path, shard=(1, 2))
+    try:
+        assert sorted(even._user_states) == [0, 2, 4]
+        assert sorted(odd._user_states) == [1, 3, 5]
+        assert odd.get_data(3) == {"asset_symbol": "asset-3"}
+    finally:
+        even.close()
+        odd.close()